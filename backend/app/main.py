@@ -1,17 +1,38 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from app.routers import workflows, execute
+from app.routers import workflows, execute, batch, jobs
+from app.services.claude_service import close_shared_client
+from app.services.encoding import FastJSONResponse
+from app.services.jobs import get_job_queue, stop_job_queue
+from app.services.message_batches import close_message_batcher
+from app.services.metrics import render_metrics
 
 # Load environment variables
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup and shutdown."""
+    # Pick up jobs a previous process left unfinished.
+    get_job_queue().start()
+    yield
+    await stop_job_queue()
+    await close_message_batcher()
+    await close_shared_client()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="AgentFlow API",
     description="Backend API for AgentFlow - Visual AI Workflow Builder",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS
@@ -30,6 +51,8 @@ app.add_middleware(
 # Include routers
 app.include_router(workflows.router, prefix="/api/v1/workflows", tags=["workflows"])
 app.include_router(execute.router, prefix="/api/v1/execute", tags=["execute"])
+app.include_router(batch.router, prefix="/api/v1/batch", tags=["batch"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
 
 
 @app.get("/health")
@@ -38,6 +61,13 @@ async def health_check():
     return {"status": "ok", "service": "agentflow-api"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API info."""
@@ -6,8 +6,13 @@ from .workflow import (
     WorkflowNode,
     WorkflowEdge,
     Workflow,
+    WorkflowSummary,
+    ExecutionOptions,
     ExecuteRequest,
+    ExecuteStoredRequest,
     NodeResult,
+    NodeDelta,
+    BatchItemResult,
     ExecuteResponse,
 )
 
@@ -17,7 +22,12 @@ __all__ = [
     "WorkflowNode",
     "WorkflowEdge",
     "Workflow",
+    "WorkflowSummary",
+    "ExecutionOptions",
     "ExecuteRequest",
+    "ExecuteStoredRequest",
     "NodeResult",
+    "NodeDelta",
+    "BatchItemResult",
     "ExecuteResponse",
 ]
@@ -17,6 +17,11 @@ class NodeData(BaseModel):
     """Base data for all node types."""
     label: str
     description: Optional[str] = None
+    # How prompt/template placeholders with no value render; None uses the server default
+    missingVariables: Optional[Literal["keep", "empty", "error"]] = None
+    # LLM/tool nodes: deadline in seconds (retries included) and attempts on transient errors
+    timeout: Optional[float] = Field(default=None, gt=0)
+    maxAttempts: Optional[int] = Field(default=None, ge=1, le=10)
     
     # Input node fields
     inputType: Optional[Literal["text", "file", "webhook"]] = None
@@ -27,6 +32,17 @@ class NodeData(BaseModel):
     prompt: Optional[str] = None
     temperature: Optional[float] = Field(default=0.7, ge=0, le=1)
     maxTokens: Optional[int] = None
+    systemPrompt: Optional[str] = None
+    # Long shared context sent ahead of the system prompt and cached by the provider;
+    # cacheSystemPrompt caches the system prompt too
+    context: Optional[str] = None
+    cacheSystemPrompt: bool = False
+    # Response cache policy; None follows the execution's useCache setting
+    cache: Optional[Literal["always", "never", "deterministic"]] = None
+    # Send a second request if the first is slower than the model's p95 and keep the faster
+    hedge: bool = False
+    # Share an identical request already in flight; None does so only when temperature is 0
+    coalesce: Optional[bool] = None
     
     # Tool node fields
     toolType: Optional[Literal["web-search", "calculator", "code-executor", "api-call"]] = None
@@ -40,6 +56,7 @@ class NodeData(BaseModel):
     # Loop node fields
     iteratorVariable: Optional[str] = None
     maxIterations: Optional[int] = None
+    maxConcurrency: Optional[int] = Field(default=None, ge=1)
     
     # Transform node fields
     transformType: Optional[Literal["json-parse", "extract-field", "format-text", "filter"]] = None
@@ -81,21 +98,73 @@ class Workflow(BaseModel):
     edges: list[WorkflowEdge]
 
 
-class ExecuteRequest(BaseModel):
+class WorkflowSummary(BaseModel):
+    """Workflow listing entry, without nodes and edges."""
+    id: str
+    name: str
+    description: Optional[str] = None
+    createdAt: float
+    updatedAt: float
+
+
+class ExecutionOptions(BaseModel):
+    """Settings shared by every way of starting an execution."""
+    maxConcurrency: Optional[int] = Field(default=None, ge=1, le=64)
+    useCache: bool = False
+    # Leave NodeResult.input empty instead of repeating upstream outputs
+    includeInputs: bool = True
+    # Replace larger inputs/outputs in NodeResult with a truncated preview
+    maxPayloadChars: Optional[int] = Field(default=None, ge=1)
+    # Free each node's output once every node consuming it has finished
+    releaseOutputs: bool = False
+    # Checkpoint node outputs under this id; with resume, continue that run
+    executionId: Optional[str] = Field(default=None, min_length=1, max_length=128)
+    resume: bool = False
+    # Reuse the stored output of every node whose definition and inputs are unchanged
+    memoize: bool = False
+    # Let LLM nodes join identical requests already in flight
+    coalesce: bool = True
+    # Fail whatever has not finished after this many seconds
+    timeout: Optional[float] = Field(default=None, gt=0)
+
+
+class ExecuteRequest(ExecutionOptions):
     """Request to execute a workflow."""
     nodes: list[WorkflowNode]
     edges: list[WorkflowEdge]
     input: Any
 
 
+class ExecuteStoredRequest(ExecutionOptions):
+    """Request to execute a saved workflow by id."""
+    input: Any
+
+
 class NodeResult(BaseModel):
     """Result of executing a single node."""
     nodeId: str
-    status: Literal["success", "error", "running"]
+    status: Literal["success", "error", "running", "skipped"]
     input: Optional[Any] = None
     output: Optional[Any] = None
     error: Optional[str] = None
-    duration: Optional[int] = None  # milliseconds
+    duration: Optional[float] = None  # milliseconds
+    metadata: Optional[dict[str, Any]] = None
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of running one input of a batch."""
+    index: int
+    success: bool
+    finalOutput: Optional[Any] = None
+    error: Optional[str] = None
+    totalDuration: float  # milliseconds
+
+
+class NodeDelta(BaseModel):
+    """Partial output streamed from a node while it is still running."""
+    type: Literal["delta"] = "delta"
+    nodeId: str
+    delta: str
 
 
 class ExecuteResponse(BaseModel):
@@ -103,4 +172,5 @@ class ExecuteResponse(BaseModel):
     success: bool
     results: list[NodeResult]
     finalOutput: Optional[Any] = None
-    totalDuration: int  # milliseconds
+    totalDuration: float  # milliseconds
+    metadata: Optional[dict[str, Any]] = None
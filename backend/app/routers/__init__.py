@@ -1,2 +1,2 @@
 """API routers."""
-from . import workflows, execute
+from . import workflows, execute, batch, jobs
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from app.services.batch import BatchRun, BatchStore, get_batch_store, iter_batch_inputs
+from app.services.execution_plan import get_stored_plan
+from app.services.message_batches import get_message_batcher
+from app.services.rate_limiter import get_rate_limiter
+from app.services.workflow_store import WorkflowStore, get_workflow_store
+
+router = APIRouter()
+
+
+class BatchStreamingResponse(StreamingResponse):
+    """Streams results while the request body is still arriving.
+    
+    StreamingResponse listens for a disconnect from the start, taking body
+    chunks off the connection as it does, so here it only begins once the
+    input has been read.
+    """
+    
+    def __init__(self, content: AsyncIterator[str], input_done: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.input_done = input_done
+    
+    async def listen_for_disconnect(self, receive) -> None:
+        await self.input_done.wait()
+        await super().listen_for_disconnect(receive)
+
+
+@router.post("/workflows/{workflow_id}")
+async def run_batch(
+    workflow_id: str,
+    request: Request,
+    batchId: Optional[str] = None,
+    useCache: bool = False,
+    messageBatches: bool = False,
+    store: WorkflowStore = Depends(get_workflow_store),
+    batches: BatchStore = Depends(get_batch_store),
+) -> StreamingResponse:
+    """Run a saved workflow once per input line and stream results as NDJSON.
+    
+    The body is JSONL (one input per line) or CSV with a header row when
+    sent as ``text/csv``. Results stream back while the body is still being
+    read; a malformed line ends the stream with an ``{"error": ...}`` line.
+    Resubmit with the same ``batchId`` to resume: items that already
+    finished with the same content are replayed instead of executed again.
+    
+    With ``messageBatches`` the LLM calls of all running items are collected
+    into provider Message Batches submissions: slower, but cheaper and not
+    bound by per-minute request limits. Meant for large offline runs.
+    """
+    try:
+        plan = await asyncio.to_thread(get_stored_plan, store, workflow_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    batch_id = batchId or str(uuid4())
+    if await asyncio.to_thread(batches.start, batch_id, workflow_id) != workflow_id:
+        raise HTTPException(status_code=409, detail="Batch id belongs to a different workflow")
+    
+    run = BatchRun(
+        batch_id,
+        plan,
+        batches,
+        rate_limiter=get_rate_limiter(),
+        use_cache=useCache,
+        message_batcher=get_message_batcher() if messageBatches else None,
+    )
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "jsonl"
+    return BatchStreamingResponse(
+        run.stream(iter_batch_inputs(request.stream(), fmt)),
+        run.input_done,
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id},
+    )
+
+
+@router.get("/{batch_id}")
+async def get_batch_progress(
+    batch_id: str,
+    batches: BatchStore = Depends(get_batch_store),
+) -> dict:
+    """Progress of a batch: how many inputs finished and how many failed."""
+    progress = await asyncio.to_thread(batches.progress, batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return progress
@@ -1,84 +1,164 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException
 import asyncio
-import json
 import time
+from typing import Any, Optional
 
-from app.models.workflow import ExecuteRequest, ExecuteResponse, NodeResult
+from app.models.workflow import (
+    ExecuteRequest, ExecuteStoredRequest, ExecuteResponse, ExecutionOptions, NodeResult,
+)
+from app.services.checkpoints import CheckpointStore, get_checkpoint_store, prepare_execution
+from app.services.encoding import FastJSONResponse, sse_event, sse_response
+from app.services.execution_plan import ExecutionPlan, get_plan_cache, get_stored_plan
+from app.services.expressions import ExpressionError, compile_condition
+from app.services.graph_validator import validate_graph
+from app.services.metrics import record_execution
+from app.services.rate_limiter import get_rate_limiter
 from app.services.workflow_executor import WorkflowExecutor
+from app.services.workflow_store import WorkflowStore, get_workflow_store
 
 router = APIRouter()
 
 
-@router.post("/")
-async def execute_workflow(request: ExecuteRequest) -> ExecuteResponse:
+def _metadata(executor: WorkflowExecutor, completed: dict[str, Any]) -> dict:
+    metadata: dict[str, Any] = {"cache": executor.cache_stats}
+    if executor.execution_id is not None:
+        metadata["executionId"] = executor.execution_id
+        metadata["restored"] = len(completed)
+    if executor.fingerprints is not None:
+        metadata["memoized"] = len(executor.memo_hits)
+    return metadata
+
+
+async def _run_to_response(
+    plan: ExecutionPlan,
+    initial_input: Any,
+    options: ExecutionOptions,
+    checkpoints: CheckpointStore,
+    start_time: float,
+) -> ExecuteResponse:
+    executor, initial_input, completed = await prepare_execution(
+        plan, options, initial_input, checkpoints, rate_limiter=get_rate_limiter()
+    )
+    results = await executor.execute(initial_input, completed=completed, report_completed=True)
+    
+    success = all(r.status != "error" for r in results)
+    total_duration = record_execution("sync", start_time, success)
+    
+    return ExecuteResponse(
+        success=success,
+        results=results,
+        finalOutput=executor.final_output(results),
+        totalDuration=total_duration,
+        metadata=_metadata(executor, completed),
+    )
+
+
+def _error_response(error: Exception, start_time: float) -> ExecuteResponse:
+    total_duration = record_execution("sync", start_time, False)
+    return ExecuteResponse(
+        success=False,
+        results=[
+            NodeResult(
+                nodeId="error",
+                status="error",
+                error=str(error),
+            )
+        ],
+        finalOutput=None,
+        totalDuration=total_duration,
+    )
+
+
+@router.post("/", response_model=ExecuteResponse)
+async def execute_workflow(
+    request: ExecuteRequest,
+    checkpoints: CheckpointStore = Depends(get_checkpoint_store),
+    accept_encoding: Optional[str] = Header(default=None),
+) -> FastJSONResponse:
     """Execute a workflow and return results."""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
-        executor = WorkflowExecutor(request.nodes, request.edges)
-        results = await executor.execute(request.input)
-        
-        total_duration = int((time.time() - start_time) * 1000)
-        
-        # Get final output from last output node
-        final_output = None
-        for result in reversed(results):
-            if result.status == "success" and result.output is not None:
-                final_output = result.output
-                break
-        
-        return ExecuteResponse(
-            success=all(r.status == "success" for r in results),
-            results=results,
-            finalOutput=final_output,
-            totalDuration=total_duration,
-        )
-        
+        plan = await asyncio.to_thread(get_plan_cache().get_or_compile, request.nodes, request.edges)
+        response = await _run_to_response(plan, request.input, request, checkpoints, start_time)
     except Exception as e:
-        total_duration = int((time.time() - start_time) * 1000)
-        return ExecuteResponse(
-            success=False,
-            results=[
-                NodeResult(
-                    nodeId="error",
-                    status="error",
-                    error=str(e),
-                )
-            ],
-            finalOutput=None,
-            totalDuration=total_duration,
-        )
+        response = _error_response(e, start_time)
+    return FastJSONResponse(response, accept_encoding=accept_encoding)
+
+
+@router.post("/workflows/{workflow_id}", response_model=ExecuteResponse)
+async def execute_stored_workflow(
+    workflow_id: str,
+    request: ExecuteStoredRequest,
+    store: WorkflowStore = Depends(get_workflow_store),
+    checkpoints: CheckpointStore = Depends(get_checkpoint_store),
+    accept_encoding: Optional[str] = Header(default=None),
+) -> FastJSONResponse:
+    """Execute a saved workflow, reusing its compiled plan while it is unchanged."""
+    start_time = time.perf_counter()
+    
+    try:
+        plan = await asyncio.to_thread(get_stored_plan, store, workflow_id)
+    except Exception as e:
+        return FastJSONResponse(_error_response(e, start_time), accept_encoding=accept_encoding)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    try:
+        response = await _run_to_response(plan, request.input, request, checkpoints, start_time)
+    except Exception as e:
+        response = _error_response(e, start_time)
+    return FastJSONResponse(response, accept_encoding=accept_encoding)
 
 
 @router.post("/stream")
-async def execute_workflow_stream(request: ExecuteRequest):
-    """Execute a workflow with streaming results."""
+async def execute_workflow_stream(
+    request: ExecuteRequest,
+    checkpoints: CheckpointStore = Depends(get_checkpoint_store),
+    accept_encoding: Optional[str] = Header(default=None),
+):
+    """Execute a workflow with streaming results.
+    
+    Events ready at the same time are sent in one write, and the stream is
+    gzipped for clients that accept it.
+    """
     
     async def generate():
+        start_time = time.perf_counter()
+        success = True
         try:
-            executor = WorkflowExecutor(request.nodes, request.edges)
+            plan = await asyncio.to_thread(get_plan_cache().get_or_compile, request.nodes, request.edges)
+            executor, initial_input, completed = await prepare_execution(
+                plan,
+                request,
+                request.input,
+                checkpoints,
+                rate_limiter=get_rate_limiter(),
+                priority="interactive",
+            )
             
-            async for result in executor.execute_stream(request.input):
-                yield f"data: {json.dumps(result.model_dump())}\n\n"
-                
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            events = executor.execute_stream(
+                initial_input, include_deltas=True, completed=completed, report_completed=True
+            )
+            async for event in events:
+                if getattr(event, "status", None) == "error":
+                    success = False
+                yield sse_event(event)
             
+            complete = {"type": "complete", "metadata": _metadata(executor, completed)}
+            yield sse_event(complete)
+        
         except Exception as e:
+            success = False
             error_data = {
                 "type": "error",
                 "error": str(e),
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
-    
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        },
-    )
+            yield sse_event(error_data)
+        finally:
+            record_execution("stream", start_time, success)
+    
+    return sse_response(generate(), accept_encoding)
 
 
 @router.post("/validate")
@@ -114,11 +194,25 @@ async def validate_workflow(request: ExecuteRequest) -> dict:
         if node.type == "llm" and not node.data.prompt:
             errors.append(f"LLM node '{node.data.label}' has no prompt configured")
     
-    # Check for cycles (basic check)
-    # TODO: Implement proper cycle detection
+    # Check router conditions compile in the expression sandbox
+    for node in request.nodes:
+        if node.type == "router" and node.data.condition:
+            try:
+                compile_condition(node.data.condition)
+            except ExpressionError as e:
+                errors.append(f"Router node '{node.data.label}' has an invalid condition: {e}")
+    
+    # Structural checks: duplicate ids, dangling edges, cycles, reachability
+    report = validate_graph(request.nodes, request.edges)
+    errors.extend(report.errors)
+    for node_id in report.unreachable:
+        if node_id in connected_nodes:
+            warnings.append(f"Node '{nodes_by_id[node_id].data.label}' is not reachable from an Input node")
     
     return {
         "valid": len(errors) == 0,
         "errors": errors,
         "warnings": warnings,
+        "cycles": report.cycles,
+        "unreachable": report.unreachable,
     }
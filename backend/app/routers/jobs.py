@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+from typing import Optional
+
+from app.models.workflow import ExecuteRequest, ExecuteStoredRequest
+from app.services.encoding import sse_event, sse_response
+from app.services.jobs import JobQueue, JobStore, get_job_queue, get_job_store
+from app.services.workflow_store import WorkflowStore, get_workflow_store
+
+router = APIRouter()
+
+
+async def job_queue(store: JobStore = Depends(get_job_store)) -> JobQueue:
+    return get_job_queue(store)
+
+
+@router.post("/", status_code=202)
+async def submit_job(request: ExecuteRequest, jobs: JobQueue = Depends(job_queue)) -> dict:
+    """Queue a workflow execution and return its job id immediately."""
+    job_id = await jobs.submit(request)
+    return {"jobId": job_id, "status": "queued"}
+
+
+@router.post("/workflows/{workflow_id}", status_code=202)
+async def submit_stored_job(
+    workflow_id: str,
+    request: ExecuteStoredRequest,
+    store: WorkflowStore = Depends(get_workflow_store),
+    jobs: JobQueue = Depends(job_queue),
+) -> dict:
+    """Queue an execution of a saved workflow as it is now."""
+    workflow = await asyncio.to_thread(store.get, workflow_id)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    execute_request = ExecuteRequest(
+        nodes=workflow.nodes,
+        edges=workflow.edges,
+        **request.model_dump(),
+    )
+    job_id = await jobs.submit(execute_request, workflow_id=workflow_id)
+    return {"jobId": job_id, "status": "queued"}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, store: JobStore = Depends(get_job_store)) -> dict:
+    """Job status, with the full execution response once it has finished."""
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    last_event_id: Optional[int] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    store: JobStore = Depends(get_job_store),
+    jobs: JobQueue = Depends(job_queue),
+) -> StreamingResponse:
+    """Replay a job's events so far, then follow it live until it completes.
+    
+    Node results and the final ``complete`` event carry SSE ids; reconnect
+    with ``Last-Event-ID`` to receive only what was missed.
+    """
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def generate():
+        after = last_event_id if last_event_id is not None else -1
+        async for seq, event in jobs.subscribe(job_id, after):
+            yield sse_event(event, seq)
+    
+    return sse_response(generate(), accept_encoding)
@@ -1,82 +1,108 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+import asyncio
 from typing import Optional
 from uuid import uuid4
 
 from app.models.workflow import Workflow
+from app.services.workflow_store import WorkflowStore, get_workflow_store
 
 router = APIRouter()
 
-# In-memory storage (replace with database in production)
-workflows_db: dict[str, Workflow] = {}
-
 
 @router.get("/")
 async def list_workflows(
-    limit: int = 10,
-    offset: int = 0,
+    limit: int = Query(default=10, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = None,
+    name: Optional[str] = None,
+    store: WorkflowStore = Depends(get_workflow_store),
 ) -> dict:
-    """List all workflows with pagination."""
-    all_workflows = list(workflows_db.values())
-    total = len(all_workflows)
-    workflows = all_workflows[offset:offset + limit]
+    """List workflows with pagination.
+    
+    Pass the returned ``nextCursor`` as ``cursor`` to page through large
+    collections without an offset scan.
+    """
+    try:
+        workflows, next_cursor = await asyncio.to_thread(
+            store.list_summaries, limit, offset=offset, after=cursor, name=name
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = await asyncio.to_thread(store.count, name=name)
     
     return {
         "workflows": workflows,
         "total": total,
         "limit": limit,
         "offset": offset,
+        "nextCursor": next_cursor,
     }
 
 
 @router.get("/{workflow_id}")
-async def get_workflow(workflow_id: str) -> Workflow:
+async def get_workflow(
+    workflow_id: str,
+    store: WorkflowStore = Depends(get_workflow_store),
+) -> Workflow:
     """Get a specific workflow by ID."""
-    if workflow_id not in workflows_db:
+    workflow = await asyncio.to_thread(store.get, workflow_id)
+    if workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    return workflows_db[workflow_id]
+    return workflow
 
 
 @router.post("/")
-async def create_workflow(workflow: Workflow) -> Workflow:
+async def create_workflow(
+    workflow: Workflow,
+    store: WorkflowStore = Depends(get_workflow_store),
+) -> Workflow:
     """Create a new workflow."""
     workflow_id = str(uuid4())
     workflow.id = workflow_id
-    workflows_db[workflow_id] = workflow
+    await asyncio.to_thread(store.save, workflow)
     
     return workflow
 
 
 @router.put("/{workflow_id}")
-async def update_workflow(workflow_id: str, workflow: Workflow) -> Workflow:
+async def update_workflow(
+    workflow_id: str,
+    workflow: Workflow,
+    store: WorkflowStore = Depends(get_workflow_store),
+) -> Workflow:
     """Update an existing workflow."""
-    if workflow_id not in workflows_db:
+    if await asyncio.to_thread(store.version, workflow_id) is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
     workflow.id = workflow_id
-    workflows_db[workflow_id] = workflow
+    await asyncio.to_thread(store.save, workflow)
     
     return workflow
 
 
 @router.delete("/{workflow_id}")
-async def delete_workflow(workflow_id: str) -> dict:
+async def delete_workflow(
+    workflow_id: str,
+    store: WorkflowStore = Depends(get_workflow_store),
+) -> dict:
     """Delete a workflow."""
-    if workflow_id not in workflows_db:
+    if not await asyncio.to_thread(store.delete, workflow_id):
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    del workflows_db[workflow_id]
-    
     return {"deleted": True, "id": workflow_id}
 
 
 @router.post("/{workflow_id}/duplicate")
-async def duplicate_workflow(workflow_id: str) -> Workflow:
+async def duplicate_workflow(
+    workflow_id: str,
+    store: WorkflowStore = Depends(get_workflow_store),
+) -> Workflow:
     """Duplicate an existing workflow."""
-    if workflow_id not in workflows_db:
+    original = await asyncio.to_thread(store.get, workflow_id)
+    if original is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    original = workflows_db[workflow_id]
     new_id = str(uuid4())
     
     duplicate = Workflow(
@@ -87,6 +113,6 @@ async def duplicate_workflow(workflow_id: str) -> Workflow:
         edges=original.edges,
     )
     
-    workflows_db[new_id] = duplicate
+    await asyncio.to_thread(store.save, duplicate)
     
     return duplicate
@@ -2,5 +2,6 @@
 
 from .workflow_executor import WorkflowExecutor
 from .claude_service import ClaudeService
+from .llm_cache import LLMCache
 
-__all__ = ["WorkflowExecutor", "ClaudeService"]
+__all__ = ["WorkflowExecutor", "ClaudeService", "LLMCache"]
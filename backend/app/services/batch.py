@@ -0,0 +1,319 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, AsyncGenerator, AsyncIterator, Optional
+
+from app.models.workflow import BatchItemResult
+from app.services.execution_plan import ExecutionPlan
+from app.services.message_batches import MessageBatcher
+from app.services.metrics import SERIALIZATION_DURATION, record_execution
+from app.services.rate_limiter import RateLimiter
+from app.services.state import DB_PATH, connect_sqlite, process_singleton
+from app.services.workflow_executor import WorkflowExecutor
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("AGENTFLOW_BATCH_CONCURRENCY", "16"))
+# Items one batch run reads ahead of its results; reading stops until the client catches up.
+BATCH_MAX_PENDING = int(os.getenv("AGENTFLOW_BATCH_PENDING", "64"))
+
+
+class BatchStore:
+    """SQLite record of finished batch items, used to resume interrupted batches."""
+    
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                workflow_id TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS batch_items (
+                batch_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                success INTEGER NOT NULL,
+                line TEXT NOT NULL,
+                item_hash TEXT,
+                PRIMARY KEY (batch_id, idx)
+            );
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(batch_items)")}
+        if "item_hash" not in columns:
+            self._conn.execute("ALTER TABLE batch_items ADD COLUMN item_hash TEXT")
+        self._conn.commit()
+    
+    def start(self, batch_id: str, workflow_id: str) -> Optional[str]:
+        """Register a batch, returning the workflow id it was first started with."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, workflow_id, created_at) VALUES (?, ?, ?)",
+                (batch_id, workflow_id, time.time()),
+            )
+            self._conn.commit()
+            row = self._conn.execute(
+                "SELECT workflow_id FROM batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()
+        return row[0]
+    
+    def record(self, batch_id: str, item: BatchItemResult, line: str, item_hash: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_items (batch_id, idx, success, line, item_hash)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (batch_id, item.index, int(item.success), line, item_hash),
+            )
+            self._conn.commit()
+    
+    def completed(self, batch_id: str) -> dict[int, tuple[Optional[str], str]]:
+        """``(item_hash, line)`` of the items that already finished, by index."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, item_hash, line FROM batch_items WHERE batch_id = ?", (batch_id,)
+            ).fetchall()
+        return {idx: (item_hash, line) for idx, item_hash, line in rows}
+    
+    def progress(self, batch_id: str) -> Optional[dict]:
+        with self._lock:
+            batch = self._conn.execute(
+                "SELECT workflow_id, created_at FROM batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()
+            if batch is None:
+                return None
+            completed, succeeded = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(success), 0) FROM batch_items WHERE batch_id = ?",
+                (batch_id,),
+            ).fetchone()
+        return {
+            "batchId": batch_id,
+            "workflowId": batch[0],
+            "createdAt": batch[1],
+            "completed": completed,
+            "succeeded": succeeded,
+            "failed": completed - succeeded,
+        }
+
+
+@process_singleton
+def get_batch_store() -> BatchStore:
+    """Return the process-wide batch store."""
+    return BatchStore(DB_PATH)
+
+
+# Bounds batch executions across every batch running in the process (per event loop).
+_batch_slots: Optional[asyncio.Semaphore] = None
+_batch_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_batch_slots() -> asyncio.Semaphore:
+    global _batch_slots, _batch_loop
+    loop = asyncio.get_running_loop()
+    if _batch_slots is None or _batch_loop is not loop:
+        _batch_slots = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+        _batch_loop = loop
+    return _batch_slots
+
+
+async def iter_batch_inputs(chunks: AsyncIterator[bytes], fmt: str = "jsonl") -> AsyncGenerator[Any, None]:
+    """Parse a streamed request body into batch inputs as the bytes arrive.
+    
+    ``jsonl`` yields one JSON value per non-empty line. ``csv`` treats the
+    first row as a header and yields one dict per following row; quoted
+    fields may span lines. Raises ValueError on a malformed line.
+    """
+    lines = _iter_lines(chunks)
+    if fmt == "csv":
+        async for row in _iter_csv_rows(lines):
+            yield row
+        return
+    async for line_number, raw in lines:
+        text = raw.decode("utf-8").strip()
+        if not text:
+            continue
+        try:
+            yield json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e.msg}")
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncGenerator[tuple[int, bytes], None]:
+    """Numbered physical lines of a streamed body, without their ``\\n``."""
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_number += 1
+            yield line_number, raw
+    if buffer:
+        yield line_number + 1, buffer
+
+
+async def _iter_csv_rows(lines: AsyncIterator[tuple[int, bytes]]) -> AsyncGenerator[dict[str, str], None]:
+    """Rows of a CSV body, read by one ``csv.reader`` so quoted newlines are kept.
+    
+    Lines are handed to the reader only once they complete a row, which is
+    when the quotes seen since the row started are balanced.
+    """
+    pending: deque[str] = deque()
+    reader = csv.reader(iter(pending.popleft, None))
+    header: Optional[list[str]] = None
+    quotes = 0
+    row_start = 0
+    async for line_number, raw in lines:
+        if not pending:
+            row_start = line_number
+        pending.append(raw.decode("utf-8") + "\n")
+        quotes += raw.count(b'"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        row = next(reader)
+        if not row or (len(row) == 1 and not row[0].strip()):
+            continue
+        if header is None:
+            header = row
+        else:
+            yield dict(zip(header, row))
+    if pending:
+        raise ValueError(f"Unterminated quoted field in the CSV row starting on line {row_start}")
+
+
+def item_hash(item: Any) -> str:
+    """Content hash of a batch input, which a resumed batch must match to replay a result."""
+    canonical = json.dumps(item, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class BatchRun:
+    """Runs one workflow over many inputs and streams results as NDJSON.
+    
+    Items already recorded for ``batch_id`` with the same content are
+    replayed from the store instead of being executed again, so a dropped
+    batch can be resumed by resubmitting it with the same id.
+    """
+    
+    def __init__(
+        self,
+        batch_id: str,
+        plan: ExecutionPlan,
+        store: BatchStore,
+        rate_limiter: Optional[RateLimiter] = None,
+        use_cache: bool = False,
+        message_batcher: Optional[MessageBatcher] = None,
+    ):
+        self.batch_id = batch_id
+        self.plan = plan
+        self.store = store
+        self.rate_limiter = rate_limiter
+        self.use_cache = use_cache
+        self.message_batcher = message_batcher
+        # In message-batch mode enough items must be running to fill a provider batch.
+        self.max_pending = message_batcher.max_requests if message_batcher is not None else BATCH_MAX_PENDING
+        # Set once the input is read to the end, or reading it failed.
+        self.input_done = asyncio.Event()
+        self._lines: asyncio.Queue = asyncio.Queue(self.max_pending)
+        self._tasks: set[asyncio.Task] = set()
+    
+    async def stream(self, items: AsyncIterator[Any]) -> AsyncGenerator[str, None]:
+        """Run each of ``items`` and yield one NDJSON line per item, in completion order.
+        
+        Items are read while results are produced, never more than
+        ``max_pending`` ahead of the lines taken from here. Unreadable input
+        ends the batch with an ``{"error": ...}`` line after the items
+        already read.
+        """
+        feeder = asyncio.create_task(self._feed(items))
+        try:
+            while (line := await self._lines.get()) is not None:
+                yield line + "\n"
+        finally:
+            feeder.cancel()
+            self.cancel()
+    
+    async def _feed(self, items: AsyncIterator[Any]) -> None:
+        pending = asyncio.Semaphore(self.max_pending)
+        error: Optional[str] = None
+        try:
+            completed = await asyncio.to_thread(self.store.completed, self.batch_id)
+            index = 0
+            async for item in items:
+                key = item_hash(item)
+                saved = completed.get(index)
+                if saved is not None and saved[0] == key:
+                    await self._lines.put(saved[1])
+                else:
+                    await pending.acquire()
+                    task = asyncio.create_task(self._run(index, item, key, pending))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                index += 1
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.input_done.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if error is not None:
+            await self._lines.put(json.dumps({"error": error}))
+        await self._lines.put(None)
+    
+    async def _run(self, index: int, item: Any, key: str, pending: asyncio.Semaphore) -> None:
+        try:
+            result = await self._execute(index, item)
+            with SERIALIZATION_DURATION.labels("ndjson").time():
+                line = result.model_dump_json()
+            try:
+                await asyncio.to_thread(self.store.record, self.batch_id, result, line, key)
+            finally:
+                await self._lines.put(line)
+        finally:
+            pending.release()
+    
+    async def _execute(self, index: int, item: Any) -> BatchItemResult:
+        # Executions in message-batch mode mostly wait on the provider and are
+        # bounded by its batch size rather than by the batch slots.
+        slots = nullcontext() if self.message_batcher is not None else get_batch_slots()
+        async with slots:
+            start_time = time.perf_counter()
+            executor = WorkflowExecutor(
+                plan=self.plan,
+                rate_limiter=self.rate_limiter,
+                use_cache=self.use_cache,
+                include_inputs=False,
+                release_outputs=True,
+                priority="batch",
+                # All items of a batch share one fair-queueing flow.
+                flow=self.batch_id,
+                message_batcher=self.message_batcher,
+            )
+            try:
+                results = await executor.execute(item)
+                errors = [r.error for r in results if r.status == "error"]
+                result = BatchItemResult(
+                    index=index,
+                    success=not errors,
+                    finalOutput=executor.final_output(results),
+                    error=errors[0] if errors else None,
+                    totalDuration=record_execution("batch", start_time, not errors),
+                )
+            except Exception as e:
+                result = BatchItemResult(
+                    index=index,
+                    success=False,
+                    error=str(e),
+                    totalDuration=record_execution("batch", start_time, False),
+                )
+        return result
+    
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
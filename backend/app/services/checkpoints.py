@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from app.models.workflow import ExecutionOptions
+from app.services.execution_plan import ExecutionPlan
+from app.services.state import DB_PATH, connect_sqlite, process_singleton
+from app.services.workflow_executor import WorkflowExecutor
+
+# How long a memoized node output stays reusable after it was last written or reused.
+MEMO_TTL_SECONDS = float(os.getenv("AGENTFLOW_MEMO_TTL", str(7 * 24 * 3600)))
+# How long an execution's input and checkpoints are kept for resuming it.
+CHECKPOINT_RETENTION_SECONDS = float(os.getenv("AGENTFLOW_CHECKPOINT_RETENTION", str(7 * 24 * 3600)))
+# Fingerprints looked up per query, below SQLite's bound-parameter limit.
+MEMO_LOOKUP_CHUNK = 500
+
+
+class CheckpointStore:
+    """SQLite record of node outputs per execution id, used to resume failed runs.
+    
+    It also memoizes outputs by node fingerprint, across executions, for
+    incremental re-execution.
+    """
+    
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS executions (
+                execution_id TEXT PRIMARY KEY,
+                input TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                execution_id TEXT NOT NULL,
+                node_id TEXT NOT NULL,
+                node_hash TEXT NOT NULL,
+                output TEXT NOT NULL,
+                PRIMARY KEY (execution_id, node_id)
+            );
+            CREATE TABLE IF NOT EXISTS node_memos (
+                fingerprint TEXT PRIMARY KEY,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS executions_created ON executions (created_at);
+            CREATE INDEX IF NOT EXISTS node_memos_created ON node_memos (created_at);
+            """
+        )
+        self._conn.commit()
+    
+    def start(self, execution_id: str, initial_input: Any) -> None:
+        """Begin a fresh run under ``execution_id``, dropping any earlier checkpoints.
+        
+        Executions started more than ``CHECKPOINT_RETENTION_SECONDS`` ago are
+        pruned with their checkpoints.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE execution_id = ?", (execution_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO executions (execution_id, input, created_at) VALUES (?, ?, ?)",
+                (execution_id, json.dumps(initial_input, default=str), now),
+            )
+            expired = now - CHECKPOINT_RETENTION_SECONDS
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE execution_id IN "
+                "(SELECT execution_id FROM executions WHERE created_at < ?)",
+                (expired,),
+            )
+            self._conn.execute("DELETE FROM executions WHERE created_at < ?", (expired,))
+            self._conn.commit()
+    
+    def save(self, execution_id: str, node_id: str, node_hash: str, output: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (execution_id, node_id, node_hash, output) "
+                "VALUES (?, ?, ?, ?)",
+                (execution_id, node_id, node_hash, json.dumps(output, default=str)),
+            )
+            self._conn.commit()
+    
+    def load(self, execution_id: str) -> Optional[tuple[Any, dict[str, tuple[str, Any]]]]:
+        """The execution's input and ``{node_id: (node_hash, output)}``, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input FROM executions WHERE execution_id = ?", (execution_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT node_id, node_hash, output FROM checkpoints WHERE execution_id = ?",
+                (execution_id,),
+            ).fetchall()
+        return json.loads(row[0]), {
+            node_id: (node_hash, json.loads(output)) for node_id, node_hash, output in rows
+        }
+    
+    def save_memo(self, fingerprint: str, output: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO node_memos (fingerprint, output, created_at) VALUES (?, ?, ?)",
+                (fingerprint, json.dumps(output, default=str), now),
+            )
+            self._conn.execute("DELETE FROM node_memos WHERE created_at < ?", (now - MEMO_TTL_SECONDS,))
+            self._conn.commit()
+    
+    def memos(self, fingerprints: list[str]) -> dict[str, Any]:
+        """Memoized outputs for the given fingerprints that have not expired.
+        
+        Each output found is touched, so one that keeps being reused does not expire.
+        """
+        found: dict[str, Any] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(fingerprints), MEMO_LOOKUP_CHUNK):
+                chunk = fingerprints[start:start + MEMO_LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT fingerprint, output FROM node_memos WHERE created_at >= ? AND fingerprint IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    (now - MEMO_TTL_SECONDS, *chunk),
+                ).fetchall()
+                found.update((fingerprint, json.loads(output)) for fingerprint, output in rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE node_memos SET created_at = ? WHERE fingerprint = ?",
+                    [(now, fingerprint) for fingerprint in found],
+                )
+                self._conn.commit()
+        return found
+
+
+@process_singleton
+def get_checkpoint_store() -> CheckpointStore:
+    """Return the process-wide checkpoint store."""
+    return CheckpointStore(DB_PATH)
+
+
+def restorable_outputs(plan: ExecutionPlan, saved: dict[str, tuple[str, Any]]) -> dict[str, Any]:
+    """Checkpointed outputs that are still valid for ``plan``.
+    
+    A checkpoint is dropped when its node no longer exists or was changed,
+    and so is every checkpoint downstream of a dropped one.
+    """
+    restored: dict[str, Any] = {}
+    invalid: set[int] = set()
+    for index, node_id in enumerate(plan.node_ids):
+        if node_id in plan.loop_owner:
+            continue
+        checkpoint = saved.get(node_id)
+        stale = any(p in invalid for p in plan.schedule_predecessors[index])
+        if checkpoint is not None and (stale or checkpoint[0] != plan.node_hashes[node_id]):
+            stale = True
+        if stale:
+            invalid.add(index)
+        elif checkpoint is not None:
+            restored[node_id] = checkpoint[1]
+    return restored
+
+
+def node_fingerprints(plan: ExecutionPlan, initial_input: Any) -> dict[str, str]:
+    """Fingerprint of each scheduled node, for reusing its output across executions.
+    
+    It combines the node's hash (definition, type and incoming edges), the
+    hashes of a loop's body, and the fingerprints of the nodes it reads from,
+    down to the execution input for start nodes. Equal fingerprints mean the
+    node would run the same way on the same inputs.
+    """
+    input_hash = hashlib.sha256(json.dumps(initial_input, sort_keys=True, default=str).encode()).hexdigest()
+    fingerprints: dict[str, str] = {}
+    for index, node_id in enumerate(plan.node_ids):
+        if node_id in plan.loop_owner:
+            continue
+        digest = hashlib.sha256(plan.node_hashes[node_id].encode())
+        body = plan.loops.get(node_id)
+        if body is not None:
+            for body_id, body_hash in sorted(body.plan.node_hashes.items()):
+                digest.update(f"\0{body_id}\0{body_hash}".encode())
+        predecessors = plan.schedule_predecessors[index]
+        if not predecessors:
+            digest.update(f"\0input\0{input_hash}".encode())
+        for source in sorted(plan.node_ids[p] for p in predecessors):
+            digest.update(f"\0{source}\0{fingerprints[source]}".encode())
+        fingerprints[node_id] = digest.hexdigest()
+    return fingerprints
+
+
+def memoized_outputs(
+    plan: ExecutionPlan,
+    fingerprints: dict[str, str],
+    memos: dict[str, Any],
+    completed: dict[str, Any],
+) -> dict[str, Any]:
+    """Memoized outputs to reuse, besides those already in ``completed``.
+    
+    A node is reused only if every node it reads from is reused or
+    completed too, so a node that has to run again is never bypassed.
+    """
+    reused: dict[str, Any] = {}
+    for index, node_id in enumerate(plan.node_ids):
+        if node_id not in fingerprints or node_id in completed or fingerprints[node_id] not in memos:
+            continue
+        sources = (plan.node_ids[p] for p in plan.schedule_predecessors[index])
+        if all(source in completed or source in reused for source in sources):
+            reused[node_id] = memos[fingerprints[node_id]]
+    return reused
+
+
+async def prepare_execution(
+    plan: ExecutionPlan,
+    options: ExecutionOptions,
+    initial_input: Any,
+    store: CheckpointStore,
+    execution_id: Optional[str] = None,
+    **kwargs: Any,
+) -> tuple[WorkflowExecutor, Any, dict[str, Any]]:
+    """Executor, input and already-completed outputs for a (possibly resumed) run.
+    
+    Without an execution id this is a plain run. With one, node outputs are
+    checkpointed as they finish; with ``options.resume`` the input and still
+    valid outputs of the earlier run are loaded so only the rest is executed.
+    With ``options.memoize`` nodes whose fingerprint matches a memoized output
+    reuse it, and new outputs are memoized. Extra keyword arguments are
+    passed to the executor.
+    """
+    execution_id = execution_id or options.executionId
+    if execution_id is None and not options.memoize:
+        return WorkflowExecutor.from_options(plan, options, **kwargs), initial_input, {}
+    
+    completed: dict[str, Any] = {}
+    if execution_id is not None:
+        saved = await asyncio.to_thread(store.load, execution_id) if options.resume else None
+        if saved is not None:
+            initial_input, checkpoints = saved
+            completed = restorable_outputs(plan, checkpoints)
+        elif options.resume:
+            raise ValueError(f"No checkpoints for execution '{execution_id}'")
+        else:
+            await asyncio.to_thread(store.start, execution_id, initial_input)
+    
+    fingerprints = None
+    reused: dict[str, Any] = {}
+    if options.memoize:
+        fingerprints = node_fingerprints(plan, initial_input)
+        memos = await asyncio.to_thread(store.memos, list(fingerprints.values()))
+        reused = memoized_outputs(plan, fingerprints, memos, completed)
+        completed.update(reused)
+    
+    executor = WorkflowExecutor.from_options(
+        plan,
+        options,
+        checkpoints=store,
+        execution_id=execution_id,
+        fingerprints=fingerprints,
+        **kwargs,
+    )
+    executor.memo_hits.update(reused)
+    return executor, initial_input, completed
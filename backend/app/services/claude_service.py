@@ -1,5 +1,6 @@
+import asyncio
 import os
-from typing import Optional
+from typing import Any, Callable, Optional
 
 MODEL_MAP = {
     "claude-4-opus": "claude-opus-4-5-20251101",
@@ -7,17 +8,97 @@ MODEL_MAP = {
     "claude-4-haiku": "claude-haiku-4-5-20251001",
 }
 
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+# Marks the end of a prompt prefix the provider may cache and reuse.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and overload (529).
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+MAX_CONNECTIONS = int(os.getenv("AGENTFLOW_CLAUDE_MAX_CONNECTIONS", "200"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AGENTFLOW_CLAUDE_MAX_KEEPALIVE", "50"))
+KEEPALIVE_EXPIRY = float(os.getenv("AGENTFLOW_CLAUDE_KEEPALIVE_EXPIRY", "60"))
+
+# One pooled client per event loop, shared by every ClaudeService in the process.
+_shared_client: Optional[Any] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_shared_client() -> Optional[Any]:
+    """Return the process-wide async Anthropic client, creating it on first use."""
+    global _shared_client, _shared_loop
+    
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        return None
+    
+    loop = asyncio.get_running_loop()
+    if _shared_client is None or _shared_loop is not loop:
+        import httpx
+        from anthropic import AsyncAnthropic
+        
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        # Retries are applied per node by the executor, not inside the SDK.
+        _shared_client = AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+        _shared_loop = loop
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    """Close the pooled client and its keep-alive connections."""
+    global _shared_client, _shared_loop
+    
+    if _shared_client is not None:
+        await _shared_client.close()
+    _shared_client = None
+    _shared_loop = None
+
+
+class ClaudeAPIError(RuntimeError):
+    """A failed Claude request; ``retryable`` marks transient failures."""
+    
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+    
+    @classmethod
+    def from_exception(cls, error: Exception) -> "ClaudeAPIError":
+        import anthropic
+        
+        status_code = getattr(error, "status_code", None)
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        retryable = status_code in RETRYABLE_STATUS or isinstance(error, anthropic.APIConnectionError)
+        return cls(f"Claude API error: {error}", status_code, retryable, retry_after)
+
 
 class ClaudeService:
     """Service for interacting with Claude API."""
     
-    def __init__(self):
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.client = None
-        
-        if self.api_key:
-            from anthropic import Anthropic
-            self.client = Anthropic(api_key=self.api_key)
+    @property
+    def client(self) -> Optional[Any]:
+        return get_shared_client()
     
     async def complete(
         self,
@@ -26,26 +107,104 @@ class ClaudeService:
         temperature: float = 0.7,
         max_tokens: int = 1024,
         system: Optional[str] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+        context: Optional[str] = None,
+        cache_system: bool = False,
+        on_usage: Optional[Callable[[dict[str, int]], None]] = None,
     ) -> str:
-        """Generate a completion from Claude."""
+        """Generate a completion from Claude.
+        
+        If ``on_delta`` is given the response is streamed and the callback
+        receives each text fragment as it arrives; the full text is still
+        returned once the message is complete. Failures raise ClaudeAPIError.
         
-        if not self.client:
-            return "[Claude API not configured - add ANTHROPIC_API_KEY to enable AI features]"
+        ``context`` is a long shared prefix (a document, a policy) sent ahead
+        of the system prompt and marked for provider-side prompt caching, as
+        is the system prompt itself with ``cache_system``. ``on_usage``
+        receives the token counts of the response, cached input included.
+        """
         
-        model_id = MODEL_MAP.get(model, MODEL_MAP["claude-4-sonnet"])
+        client = self.client
+        if not client:
+            raise ClaudeAPIError("Claude API not configured - add ANTHROPIC_API_KEY to enable AI features")
+        
+        request = build_request(prompt, model, temperature, max_tokens, system, context, cache_system)
         
         try:
-            message = self.client.messages.create(
-                model=model_id,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system=system or "You are a helpful AI assistant.",
-                messages=[{"role": "user", "content": prompt}],
-            )
+            if on_delta is not None:
+                return await self._stream(client, request, on_delta, on_usage)
+            
+            message = await client.messages.create(**request)
+            if on_usage is not None:
+                on_usage(usage_counts(message.usage))
             
             if message.content and len(message.content) > 0:
                 return message.content[0].text
             return ""
-            
+        
         except Exception as e:
-            return f"[Claude API error: {str(e)}]"
+            raise ClaudeAPIError.from_exception(e) from e
+    
+    async def _stream(
+        self,
+        client: Any,
+        request: dict,
+        on_delta: Callable[[str], None],
+        on_usage: Optional[Callable[[dict[str, int]], None]] = None,
+    ) -> str:
+        parts = []
+        async with client.messages.stream(**request) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                on_delta(text)
+            if on_usage is not None:
+                message = await stream.get_final_message()
+                on_usage(usage_counts(message.usage))
+        return "".join(parts)
+
+
+def build_request(
+    prompt: str,
+    model: str = "claude-4-sonnet",
+    temperature: float = 0.7,
+    max_tokens: int = 1024,
+    system: Optional[str] = None,
+    context: Optional[str] = None,
+    cache_system: bool = False,
+) -> dict[str, Any]:
+    """Messages API parameters for a single-turn completion."""
+    return {
+        "model": MODEL_MAP.get(model, MODEL_MAP["claude-4-sonnet"]),
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "system": system_blocks(system or DEFAULT_SYSTEM_PROMPT, context, cache_system),
+        "messages": [{"role": "user", "content": prompt}],
+    }
+
+
+def system_blocks(system: str, context: Optional[str] = None, cache_system: bool = False) -> Any:
+    """The ``system`` request parameter, with cache breakpoints where asked.
+    
+    The context comes first so that nodes with different system prompts
+    still share its cached prefix.
+    """
+    if not context and not cache_system:
+        return system
+    blocks = []
+    if context:
+        blocks.append({"type": "text", "text": context, "cache_control": CACHE_CONTROL})
+    block = {"type": "text", "text": system}
+    if cache_system:
+        block["cache_control"] = CACHE_CONTROL
+    blocks.append(block)
+    return blocks
+
+
+def usage_counts(usage: Any) -> dict[str, int]:
+    """Token counts of a response; ``inputTokens`` excludes input read from or written to the cache."""
+    return {
+        "inputTokens": getattr(usage, "input_tokens", None) or 0,
+        "cachedInputTokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        "cacheWriteTokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "outputTokens": getattr(usage, "output_tokens", None) or 0,
+    }
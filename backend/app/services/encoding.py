@@ -0,0 +1,151 @@
+import asyncio
+import gzip
+import os
+import time
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Optional
+
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_core import to_json
+
+from app.services.metrics import SERIALIZATION_DURATION
+
+# Smallest JSON body worth gzipping for clients that accept it.
+COMPRESS_MIN_BYTES = int(os.getenv("AGENTFLOW_COMPRESS_MIN_BYTES", "1024"))
+# Upper bound on events joined into one write of a stream.
+SSE_BATCH_BYTES = int(os.getenv("AGENTFLOW_SSE_BATCH_BYTES", "65536"))
+# Encoded events a stream may hold while the client is slower than the producer.
+SSE_BUFFER_EVENTS = 256
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+}
+
+_END = object()
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode ``payload`` as JSON bytes; Pydantic models are written directly, without a dict copy."""
+    return to_json(payload, serialize_unknown=True)
+
+
+def sse_event(payload: Any, event_id: Optional[int] = None) -> bytes:
+    """Encode one server-sent event. ``payload`` may already be encoded JSON."""
+    start = time.perf_counter()
+    if isinstance(payload, str):
+        data = payload.encode()
+    elif isinstance(payload, bytes):
+        data = payload
+    else:
+        data = dumps(payload)
+    event = b"data: " + data + b"\n\n"
+    if event_id is not None:
+        event = b"id: %d\n" % event_id + event
+    SERIALIZATION_DURATION.labels("sse").observe(time.perf_counter() - start)
+    return event
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an ``Accept-Encoding`` header allows gzip."""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+async def coalesce(chunks: AsyncIterable[bytes], max_bytes: int = SSE_BATCH_BYTES) -> AsyncIterator[bytes]:
+    """Join chunks produced while the previous write was in progress into one write.
+    
+    A chunk is never held back waiting for more: whatever is buffered when
+    the client is ready is sent together, up to ``max_bytes``.
+    """
+    queue: asyncio.Queue = asyncio.Queue(SSE_BUFFER_EVENTS)
+    
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_END)
+    
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            batch: list[bytes] = []
+            size = 0
+            while item is not _END:
+                if isinstance(item, Exception):
+                    raise item
+                batch.append(item)
+                size += len(item)
+                if size >= max_bytes or queue.empty():
+                    break
+                item = queue.get_nowait()
+            if batch:
+                yield b"".join(batch)
+            if item is _END:
+                return
+    finally:
+        # The client went away or the stream ended: stop and close the source.
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+async def gzip_stream(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Gzip a stream, flushing after every chunk so no event is delayed."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def sse_response(events: AsyncIterable[bytes], accept_encoding: Optional[str] = None) -> StreamingResponse:
+    """Stream encoded events, batching small ones and gzipping when the client accepts it."""
+    headers = dict(SSE_HEADERS)
+    body: AsyncIterable[bytes] = coalesce(events)
+    if accepts_gzip(accept_encoding):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(body, media_type="text/event-stream", headers=headers)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded straight to bytes by pydantic-core.
+    
+    Models can be returned as they are, skipping FastAPI's dict conversion.
+    Bodies of at least ``COMPRESS_MIN_BYTES`` are gzipped for clients that
+    accept it.
+    """
+    
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[dict[str, str]] = None,
+        accept_encoding: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        self.accept_encoding = accept_encoding
+        self.gzipped = False
+        super().__init__(content, status_code, headers, **kwargs)
+        if self.gzipped:
+            self.headers["Content-Encoding"] = "gzip"
+            self.headers["Vary"] = "Accept-Encoding"
+    
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        body = dumps(content)
+        SERIALIZATION_DURATION.labels("json").observe(time.perf_counter() - start)
+        if len(body) >= COMPRESS_MIN_BYTES and accepts_gzip(self.accept_encoding):
+            self.gzipped = True
+            return gzip.compress(body, compresslevel=5)
+        return body
+
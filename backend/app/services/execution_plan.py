@@ -0,0 +1,352 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, Optional
+
+from pydantic import TypeAdapter
+
+from app.models.workflow import WorkflowNode, WorkflowEdge, NodeType
+from app.services.expressions import CompiledExpression, ExpressionError, compile_condition
+from app.services.graph_validator import (
+    LOOP_DONE_HANDLE,
+    WorkflowValidationError,
+    ensure_executable,
+    loop_owners,
+    topological_order,
+)
+from app.services.state import process_singleton
+from app.services.templates import Template, compile_template
+
+if TYPE_CHECKING:
+    from app.services.workflow_store import WorkflowStore
+
+PLAN_CACHE_SIZE = int(os.getenv("AGENTFLOW_PLAN_CACHE_SIZE", "256"))
+# Deepest nesting of loops inside loop bodies a plan may have.
+MAX_LOOP_DEPTH = int(os.getenv("AGENTFLOW_MAX_LOOP_DEPTH", "16"))
+
+_nodes_adapter = TypeAdapter(list[WorkflowNode])
+_edges_adapter = TypeAdapter(list[WorkflowEdge])
+
+
+@dataclass(frozen=True)
+class LoopBody:
+    """The subgraph a loop node runs once per element of its input."""
+    plan: "ExecutionPlan"
+    node_ids: tuple[str, ...]
+    sinks: tuple[str, ...]
+    external: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """Immutable, pre-processed form of a workflow graph.
+    
+    Nodes are numbered in topological order; ``successors``,
+    ``predecessors`` and ``in_degree`` are indexed by that number.
+    
+    ``successors``, ``in_degree``, ``start``, ``schedule_predecessors`` and
+    ``consumer_counts`` describe the scheduling graph, in which every loop
+    stands in for its whole body: body nodes are run by the loop and never
+    scheduled on their own.
+    """
+    key: str
+    node_ids: tuple[str, ...]
+    nodes: tuple[WorkflowNode, ...]
+    index: Mapping[str, int]
+    successors: tuple[tuple[int, ...], ...]
+    successor_handles: tuple[tuple[Optional[str], ...], ...]
+    predecessors: tuple[tuple[int, ...], ...]
+    in_degree: tuple[int, ...]
+    schedule_predecessors: tuple[tuple[int, ...], ...]
+    consumer_counts: tuple[int, ...]
+    start: tuple[int, ...]
+    edges: tuple[WorkflowEdge, ...]
+    conditions: Mapping[str, CompiledExpression]
+    templates: Mapping[str, Template]
+    node_hashes: Mapping[str, str]
+    node_map: Mapping[str, WorkflowNode]
+    incoming: Mapping[str, tuple[str, ...]]
+    outgoing: Mapping[str, tuple[str, ...]]
+    loops: Mapping[str, LoopBody]
+    loop_owner: Mapping[str, str]
+
+
+def structure_hash(nodes: list[WorkflowNode], edges: list[WorkflowEdge]) -> str:
+    """Hash of everything that affects execution (canvas positions excluded)."""
+    digest = hashlib.sha256()
+    digest.update(_nodes_adapter.dump_json(nodes, exclude={"__all__": {"position"}}))
+    digest.update(b"\0")
+    digest.update(_edges_adapter.dump_json(edges))
+    return digest.hexdigest()
+
+
+def compile_plan(
+    nodes: list[WorkflowNode],
+    edges: list[WorkflowEdge],
+    key: Optional[str] = None,
+    depth: int = 0,
+    known_hashes: Optional[Mapping[str, str]] = None,
+) -> ExecutionPlan:
+    """Turn a workflow graph into an ``ExecutionPlan``.
+    
+    Raises ``WorkflowValidationError`` for graphs that cannot run, such as
+    ones with cycles, duplicate node ids or edges to unknown nodes. Loop
+    bodies are compiled with their nesting ``depth`` and are not validated
+    again, being parts of a graph that already was; ``known_hashes`` are
+    node hashes carried over from the enclosing plan.
+    """
+    if depth == 0:
+        ensure_executable(nodes, edges)
+    by_id = {node.id: node for node in nodes}
+    successors: dict[str, list[str]] = {node_id: [] for node_id in by_id}
+    predecessors: dict[str, list[str]] = {node_id: [] for node_id in by_id}
+    for edge in edges:
+        successors[edge.source].append(edge.target)
+        predecessors[edge.target].append(edge.source)
+    
+    # Validation has already ruled out cycles.
+    order = topological_order(successors)
+    index = {node_id: i for i, node_id in enumerate(order)}
+    plan_key = key or structure_hash(nodes, edges)
+    node_hashes = _node_hashes(nodes, edges, known_hashes or {})
+    loops, loop_owner = _compile_loops(by_id, edges, order, plan_key, depth, node_hashes)
+    
+    # Scheduling graph: loop bodies are contracted into their loop node.
+    schedule: dict[str, list[tuple[str, Optional[str]]]] = {node_id: [] for node_id in by_id}
+    schedule_sources: dict[str, list[str]] = {node_id: [] for node_id in by_id}
+    in_degree = {node_id: 0 for node_id in by_id}
+    for edge in edges:
+        source = loop_owner.get(edge.source, edge.source)
+        target = loop_owner.get(edge.target, edge.target)
+        if source != target:
+            handle = edge.sourceHandle if source == edge.source else None
+            schedule[source].append((target, handle))
+            schedule_sources[target].append(source)
+            in_degree[target] += 1
+    
+    conditions = {}
+    templates = {}
+    for node in nodes:
+        source = _template_source(node)
+        if source and "{{" in source:
+            templates[node.id] = compile_template(source)
+        if node.type == NodeType.ROUTER:
+            try:
+                conditions[node.id] = compile_condition(node.data.condition or "true")
+            except ExpressionError:
+                pass
+    
+    return ExecutionPlan(
+        key=plan_key,
+        node_ids=tuple(order),
+        nodes=tuple(by_id[node_id] for node_id in order),
+        index=MappingProxyType(index),
+        successors=tuple(tuple(index[t] for t, _ in schedule[node_id]) for node_id in order),
+        successor_handles=tuple(tuple(h for _, h in schedule[node_id]) for node_id in order),
+        predecessors=tuple(tuple(index[s] for s in predecessors[node_id]) for node_id in order),
+        in_degree=tuple(in_degree[node_id] for node_id in order),
+        schedule_predecessors=tuple(
+            tuple(index[s] for s in dict.fromkeys(schedule_sources[node_id])) for node_id in order
+        ),
+        consumer_counts=tuple(len({t for t, _ in schedule[node_id]}) for node_id in order),
+        start=tuple(
+            i for i, node_id in enumerate(order)
+            if in_degree[node_id] == 0 and node_id not in loop_owner
+        ),
+        edges=tuple(edges),
+        conditions=MappingProxyType(conditions),
+        templates=MappingProxyType(templates),
+        node_hashes=MappingProxyType(node_hashes),
+        node_map=MappingProxyType(by_id),
+        incoming=MappingProxyType({k: tuple(v) for k, v in predecessors.items()}),
+        outgoing=MappingProxyType({k: tuple(v) for k, v in successors.items()}),
+        loops=MappingProxyType(loops),
+        loop_owner=MappingProxyType(loop_owner),
+    )
+
+
+def _node_hashes(
+    nodes: list[WorkflowNode],
+    edges: list[WorkflowEdge],
+    known: Mapping[str, str],
+) -> dict[str, str]:
+    """Hash of each node's own definition and the edges feeding it.
+    
+    Two plans that give a node the same hash run it the same way on the
+    same inputs, so its checkpointed output can be reused.
+    """
+    incoming: dict[str, list[tuple[str, str]]] = {node.id: [] for node in nodes}
+    for edge in edges:
+        incoming[edge.target].append((edge.source, edge.sourceHandle or ""))
+    hashes = {}
+    for node in nodes:
+        if node.id in known:
+            hashes[node.id] = known[node.id]
+            continue
+        digest = hashlib.sha256(node.model_dump_json(exclude={"position"}).encode())
+        for source, handle in sorted(incoming[node.id]):
+            digest.update(f"\0{source}\0{handle}".encode())
+        hashes[node.id] = digest.hexdigest()
+    return hashes
+
+
+def _template_source(node: WorkflowNode) -> Optional[str]:
+    """The text a node renders with variable substitution, if any."""
+    data = node.data
+    if node.type == NodeType.LLM:
+        return data.prompt
+    if node.type == NodeType.TRANSFORM and data.transformType == "format-text":
+        return data.config.get("template") if data.config else "{{input}}"
+    return None
+
+
+def _compile_loops(
+    by_id: dict[str, WorkflowNode],
+    edges: list[WorkflowEdge],
+    order: list[str],
+    key: str,
+    depth: int,
+    node_hashes: Mapping[str, str],
+) -> tuple[dict[str, LoopBody], dict[str, str]]:
+    """Find the body of every outermost loop and compile it into its own plan.
+    
+    Nested loops are handled by the body plan, so each level costs O(V + E)
+    and the nesting depth is capped at ``MAX_LOOP_DEPTH``.
+    """
+    loop_ids = {node_id for node_id, node in by_id.items() if node.type == NodeType.LOOP}
+    if not loop_ids:
+        return {}, {}
+    if depth >= MAX_LOOP_DEPTH:
+        raise WorkflowValidationError([f"Loops are nested more than {MAX_LOOP_DEPTH} deep"])
+    out_edges: dict[str, list[WorkflowEdge]] = {node_id: [] for node_id in by_id}
+    for edge in edges:
+        out_edges[edge.source].append(edge)
+    loop_owner, conflicts = loop_owners(loop_ids, order, out_edges)
+    if conflicts:
+        # Only reachable for loops nested in a body; the top level was validated.
+        raise WorkflowValidationError(conflicts)
+    
+    position = {node_id: i for i, node_id in enumerate(by_id)}
+    members: dict[str, list[str]] = {}
+    for node_id in by_id:
+        if node_id in loop_owner:
+            members.setdefault(loop_owner[node_id], []).append(node_id)
+    incoming: dict[str, list[WorkflowEdge]] = {}
+    for edge in edges:
+        if edge.target in loop_owner:
+            incoming.setdefault(loop_owner[edge.target], []).append(edge)
+    
+    loops = {}
+    for loop_id, body_ids in members.items():
+        body = set(body_ids)
+        external = list(dict.fromkeys(
+            e.source for e in incoming[loop_id]
+            if e.source not in body and e.source != loop_id
+        ))
+        seeds = {loop_id, *external}
+        body_edges = []
+        # Body nodes keep their definition and incoming edges, hence their
+        # hash, unless the loop's done handle also feeds them.
+        rehash = set(seeds)
+        for e in incoming[loop_id]:
+            if e.source == loop_id and e.sourceHandle == LOOP_DONE_HANDLE:
+                rehash.add(e.target)
+            else:
+                body_edges.append(e)
+        # Seed nodes are filled in by the loop, so they must not be loops themselves.
+        body_nodes = [
+            by_id[node_id].model_copy(update={"type": NodeType.INPUT}) if node_id in seeds else by_id[node_id]
+            for node_id in sorted(body | seeds, key=position.__getitem__)
+        ]
+        loops[loop_id] = LoopBody(
+            plan=compile_plan(
+                body_nodes,
+                body_edges,
+                key=f"{key}:{loop_id}",
+                depth=depth + 1,
+                known_hashes={node_id: node_hashes[node_id] for node_id in body_ids if node_id not in rehash},
+            ),
+            node_ids=tuple(body_ids),
+            sinks=tuple(
+                node_id for node_id in body_ids
+                if not any(e.target in body for e in out_edges[node_id])
+            ),
+            external=tuple(external),
+        )
+    return loops, loop_owner
+
+
+class PlanCache:
+    """LRU cache of compiled plans, keyed by structure hash or stored workflow version."""
+    
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._plans: OrderedDict[str, ExecutionPlan] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_or_compile(self, nodes: list[WorkflowNode], edges: list[WorkflowEdge]) -> ExecutionPlan:
+        key = structure_hash(nodes, edges)
+        plan = self._get(key)
+        if plan is None:
+            plan = self._put(key, compile_plan(nodes, edges, key=key))
+        return plan
+    
+    def get_for_workflow(self, workflow_id: str, version: float) -> Optional[ExecutionPlan]:
+        """Plan for a stored workflow, if it was compiled for this exact version."""
+        return self._get(f"workflow:{workflow_id}:{version!r}")
+    
+    def put_for_workflow(self, workflow_id: str, version: float, plan: ExecutionPlan) -> ExecutionPlan:
+        return self._put(f"workflow:{workflow_id}:{version!r}", plan)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+    
+    def __len__(self) -> int:
+        return len(self._plans)
+    
+    def _get(self, key: str) -> Optional[ExecutionPlan]:
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+            return plan
+    
+    def _put(self, key: str, plan: ExecutionPlan) -> ExecutionPlan:
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+
+@process_singleton
+def get_plan_cache() -> PlanCache:
+    """Return the process-wide plan cache."""
+    return PlanCache()
+
+
+def get_stored_plan(store: "WorkflowStore", workflow_id: str) -> Optional[ExecutionPlan]:
+    """Compiled plan for a stored workflow, or None if it does not exist.
+    
+    The plan is cached per stored version, so an unchanged workflow is
+    neither loaded nor compiled again.
+    """
+    plans = get_plan_cache()
+    version = store.version(workflow_id)
+    if version is None:
+        return None
+    
+    plan = plans.get_for_workflow(workflow_id, version)
+    if plan is None:
+        workflow = store.get(workflow_id)
+        if workflow is None:
+            return None
+        plan = plans.put_for_workflow(
+            workflow_id, version, compile_plan(workflow.nodes, workflow.edges)
+        )
+    return plan
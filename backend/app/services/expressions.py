@@ -0,0 +1,266 @@
+import ast
+import operator
+import os
+import re
+from functools import lru_cache
+from types import CodeType
+from typing import Any, Mapping, Optional
+
+from app.services.templates import Template, resolve
+
+EXPRESSION_CACHE_SIZE = int(os.getenv("AGENTFLOW_EXPRESSION_CACHE_SIZE", "1024"))
+
+# Largest exponent and sequence repetition an expression may ask for.
+MAX_EXPONENT = 1000
+MAX_REPEAT = 100_000
+# Largest integer a product or power may produce (about 3000 digits).
+MAX_INT_BITS = 10_000
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+_QUOTED = re.compile(r"'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\"")
+_NUMBER = re.compile(r"^\s*-?\d+(\.\d+)?\s*$")
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression is not valid in the sandboxed language."""
+
+
+def _pow(base: Any, exponent: Any) -> Any:
+    if isinstance(exponent, (int, float)) and abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError("Exponent too large")
+    # The exponent cap alone does not stop chains such as (10**1000)**1000.
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if abs(base).bit_length() * exponent > MAX_INT_BITS:
+            raise ExpressionError("Result too large")
+    return operator.pow(base, exponent)
+
+
+def _size(value: Any, seen: Optional[dict[int, int]] = None) -> int:
+    """Elements in ``value``, counting nested ones once per reference to them.
+    
+    Repetition makes aliases, e.g. ``[[0] * 1000] * 1000``; each counts in
+    full since that is what printing or comparing the value costs.
+    """
+    if isinstance(value, str):
+        return len(value)
+    if not isinstance(value, (list, tuple, set, dict)):
+        return 1
+    seen = {} if seen is None else seen
+    key = id(value)
+    if key not in seen:
+        items = [*value.keys(), *value.values()] if isinstance(value, dict) else value
+        seen[key] = len(value) + sum(_size(item, seen) for item in items)
+    return seen[key]
+
+
+def _mul(left: Any, right: Any) -> Any:
+    for sequence, count in ((left, right), (right, left)):
+        if isinstance(sequence, (str, list, tuple)) and isinstance(count, int):
+            if _size(sequence) * count > MAX_REPEAT:
+                raise ExpressionError("Result too large")
+    if isinstance(left, int) and isinstance(right, int):
+        if abs(left).bit_length() + abs(right).bit_length() > MAX_INT_BITS:
+            raise ExpressionError("Result too large")
+    return operator.mul(left, right)
+
+
+def _replace(target: Any, *args: Any) -> Any:
+    if isinstance(target, str) and len(args) >= 2 and isinstance(args[0], str) and isinstance(args[1], str):
+        old, new = args[0], args[1]
+        count = target.count(old)
+        if len(args) > 2 and isinstance(args[2], int) and args[2] >= 0:
+            count = min(count, args[2])
+        # A replacement may not grow a string past MAX_REPEAT, so chains of
+        # growing replacements stay bounded.
+        size = len(target) + count * (len(new) - len(old))
+        if size > max(len(target), MAX_REPEAT):
+            raise ExpressionError("Result too large")
+    return target.replace(*args)
+
+
+def _str(value: Any = "") -> str:
+    # Values built from literals can still nest aliases, e.g. [a, a, a] of a large a.
+    if _size(value) > MAX_REPEAT:
+        raise ExpressionError("Result too large")
+    return str(value)
+
+
+def _round(number: Any, ndigits: Optional[int] = None) -> Any:
+    # round(5, -10**7) computes 10**(10**7) before returning 0.
+    if isinstance(ndigits, int) and abs(ndigits) > MAX_EXPONENT:
+        raise ExpressionError("Too many digits to round to")
+    return round(number, ndigits)
+
+
+FUNCTIONS = {
+    "len": len, "str": _str, "int": int, "float": float, "bool": bool,
+    "abs": abs, "min": min, "max": max, "round": _round,
+    "true": True, "false": False, "null": None,
+    "_pow": _pow, "_mul": _mul, "_replace": _replace,
+}
+
+METHODS = {
+    "lower", "upper", "strip", "lstrip", "rstrip", "startswith", "endswith",
+    "split", "count", "find", "replace", "get", "keys", "values", "items",
+}
+
+_COMPARISONS = (
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.In, ast.NotIn, ast.Is, ast.IsNot,
+)
+_ARITHMETIC = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd,
+)
+_CONDITION = _ARITHMETIC + _COMPARISONS + (
+    ast.BoolOp, ast.And, ast.Or, ast.Not, ast.Compare, ast.IfExp,
+    ast.Name, ast.Load, ast.Subscript, ast.Slice, ast.Call, ast.Attribute,
+    ast.List, ast.Tuple, ast.Set, ast.Dict,
+)
+
+
+class _SafeOperators(ast.NodeTransformer):
+    """Route ``**``, ``*`` and ``.replace()`` through size-checked helpers."""
+    
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == "replace":
+            return ast.copy_location(
+                ast.Call(func=ast.Name(id="_replace", ctx=ast.Load()), args=[func.value, *node.args], keywords=[]),
+                node,
+            )
+        return node
+    
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        helper = {ast.Pow: "_pow", ast.Mult: "_mul"}.get(type(node.op))
+        if helper is None:
+            return node
+        return ast.copy_location(
+            ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=[node.left, node.right], keywords=[]),
+            node,
+        )
+
+
+class CompiledExpression:
+    """An expression validated against a whitelist and compiled once.
+    
+    Evaluation only sees the names passed to ``evaluate`` plus a few safe
+    functions; there are no builtins, imports or attribute access other than
+    calls to a short list of string and dict methods. Values are never
+    spliced into the source, so the same compiled code serves every input.
+    """
+    __slots__ = ("source", "_code", "_bindings")
+    
+    def __init__(self, source: str, code: CodeType, bindings: Mapping[str, Any]):
+        self.source = source
+        self._code = code
+        self._bindings = bindings
+    
+    def evaluate(self, names: Optional[Mapping[str, Any]] = None) -> Any:
+        scope = dict(names or {})
+        input_data = scope.get("input")
+        for name, binding in self._bindings.items():
+            if isinstance(binding, Template):
+                scope[name] = binding.render(input_data, names)
+            else:
+                scope[name] = _placeholder_value(binding, input_data, names or {})
+        return eval(self._code, {"__builtins__": {}, **FUNCTIONS}, scope)
+
+
+def _placeholder_value(name: str, input_data: Any, names: Mapping[str, Any]) -> Any:
+    value = resolve(name, input_data, names)
+    if isinstance(value, str) and _NUMBER.match(value):
+        return float(value) if "." in value else int(value)
+    return value
+
+
+def _bind_placeholders(source: str) -> tuple[str, dict[str, Any]]:
+    """Replace ``{{...}}`` placeholders with variables bound at evaluation time.
+    
+    A quoted string containing placeholders becomes a template rendered to a
+    string; a bare placeholder becomes the referenced value itself.
+    """
+    bindings: dict[str, Any] = {}
+    
+    def quoted(match: re.Match) -> str:
+        literal = match.group(0)
+        if "{{" not in literal:
+            return literal
+        name = f"_b{len(bindings)}"
+        try:
+            bindings[name] = Template(ast.literal_eval(literal))
+        except (SyntaxError, ValueError) as e:
+            raise ExpressionError(f"Invalid string {literal}: {e}") from None
+        return name
+    
+    def bare(match: re.Match) -> str:
+        name = f"_b{len(bindings)}"
+        bindings[name] = match.group(1)
+        return name
+    
+    source = _QUOTED.sub(quoted, source)
+    return _PLACEHOLDER.sub(bare, source), bindings
+
+
+def _check(tree: ast.AST, allowed: tuple[type, ...], bindings: Mapping[str, Any]) -> None:
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed):
+            raise ExpressionError(f"'{type(node).__name__}' is not allowed in expressions")
+        if isinstance(node, ast.Constant) and allowed is _ARITHMETIC and (
+            isinstance(node.value, bool) or not isinstance(node.value, (int, float))
+        ):
+            raise ExpressionError("Only numbers are allowed in arithmetic expressions")
+        if isinstance(node, ast.Name) and node.id.startswith("_") and node.id not in bindings:
+            raise ExpressionError(f"Name '{node.id}' is not allowed in expressions")
+        if isinstance(node, ast.Attribute) and node.attr not in METHODS:
+            raise ExpressionError(f"Attribute '{node.attr}' is not allowed in expressions")
+        if isinstance(node, ast.Call):
+            func = node.func
+            if node.keywords or not isinstance(func, (ast.Name, ast.Attribute)):
+                raise ExpressionError("Only plain calls to known functions are allowed")
+            if isinstance(func, ast.Name) and func.id not in FUNCTIONS:
+                raise ExpressionError(f"Function '{func.id}' is not allowed in expressions")
+    for node in ast.walk(tree):
+        # Attributes may only be called, never read as values.
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Attribute) and not (isinstance(node, ast.Call) and node.func is child):
+                raise ExpressionError(f"Attribute '{child.attr}' can only be called")
+
+
+def _compile(
+    source: str,
+    text: str,
+    allowed: tuple[type, ...],
+    bindings: Mapping[str, Any],
+) -> CompiledExpression:
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+        _check(tree, allowed, bindings)
+        tree = ast.fix_missing_locations(_SafeOperators().visit(tree))
+        code = compile(tree, "<expression>", "eval")
+    except ExpressionError:
+        raise
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {e.msg}") from None
+    except ValueError as e:
+        # e.g. a null byte in the source
+        raise ExpressionError(f"Invalid expression: {e}") from None
+    except (MemoryError, RecursionError):
+        raise ExpressionError("Expression is nested too deeply") from None
+    return CompiledExpression(source, code, bindings)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_condition(source: str) -> CompiledExpression:
+    """Compile a router condition such as ``'urgent' in input.lower()``."""
+    text, bindings = _bind_placeholders(source)
+    return _compile(source, text, _CONDITION, bindings)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_arithmetic(source: str) -> CompiledExpression:
+    """Compile a purely numeric expression for the calculator tool."""
+    return _compile(source, source, _ARITHMETIC, {})
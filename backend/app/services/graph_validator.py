@@ -0,0 +1,185 @@
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+from app.models.workflow import WorkflowNode, WorkflowEdge, NodeType
+
+# Loop edges with this source handle continue after the loop instead of
+# belonging to its body.
+LOOP_DONE_HANDLE = "done"
+
+
+class WorkflowValidationError(ValueError):
+    """Raised when a workflow graph cannot be executed."""
+    
+    def __init__(self, errors: list[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class GraphReport:
+    """Structural problems found in a workflow graph."""
+    duplicate_ids: list[str] = field(default_factory=list)
+    dangling_edges: list[str] = field(default_factory=list)
+    cycles: list[list[str]] = field(default_factory=list)
+    unreachable: list[str] = field(default_factory=list)
+    loop_conflicts: list[str] = field(default_factory=list)
+    
+    @property
+    def errors(self) -> list[str]:
+        """Problems that make the graph impossible to execute."""
+        errors = [f"Duplicate node id '{node_id}'" for node_id in self.duplicate_ids]
+        errors += self.dangling_edges
+        errors += [f"Cycle detected between nodes: {', '.join(cycle)}" for cycle in self.cycles]
+        errors += self.loop_conflicts
+        return errors
+
+
+def validate_graph(nodes: list[WorkflowNode], edges: list[WorkflowEdge]) -> GraphReport:
+    """Check a workflow graph in O(V + E).
+    
+    Cycles are the strongly connected components with more than one node,
+    plus self-loops. Unreachable nodes are those no Input node leads to; they
+    are only reported when the graph has an Input node.
+    """
+    report = GraphReport()
+    counts = Counter(node.id for node in nodes)
+    report.duplicate_ids = [node_id for node_id, count in counts.items() if count > 1]
+    
+    successors: dict[str, list[str]] = {node_id: [] for node_id in counts}
+    known_edges = []
+    for edge in edges:
+        missing = [endpoint for endpoint in (edge.source, edge.target) if endpoint not in counts]
+        if missing:
+            report.dangling_edges += [
+                f"Edge '{edge.id}' references unknown node '{endpoint}'" for endpoint in missing
+            ]
+            continue
+        successors[edge.source].append(edge.target)
+        known_edges.append(edge)
+    
+    report.cycles = _find_cycles(successors)
+    loop_ids = {node.id for node in nodes if node.type == NodeType.LOOP}
+    if loop_ids and not report.cycles:
+        out_edges: dict[str, list[WorkflowEdge]] = {node_id: [] for node_id in counts}
+        for edge in known_edges:
+            out_edges[edge.source].append(edge)
+        _, report.loop_conflicts = loop_owners(loop_ids, topological_order(successors), out_edges)
+    
+    inputs = [node.id for node in nodes if node.type == NodeType.INPUT]
+    if inputs:
+        seen = set(inputs)
+        stack = list(inputs)
+        while stack:
+            for target in successors[stack.pop()]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        report.unreachable = [node_id for node_id in counts if node_id not in seen]
+    return report
+
+
+def topological_order(successors: dict[str, list[str]]) -> list[str]:
+    """Kahn's algorithm, ties broken by insertion order; nodes on a cycle are left out."""
+    remaining = {node_id: 0 for node_id in successors}
+    for targets in successors.values():
+        for target in targets:
+            remaining[target] += 1
+    ready = deque(node_id for node_id, count in remaining.items() if count == 0)
+    order: list[str] = []
+    while ready:
+        node_id = ready.popleft()
+        order.append(node_id)
+        for target in successors[node_id]:
+            remaining[target] -= 1
+            if remaining[target] == 0:
+                ready.append(target)
+    return order
+
+
+def loop_owners(
+    loop_ids: set[str],
+    order: list[str],
+    out_edges: dict[str, list[WorkflowEdge]],
+) -> tuple[dict[str, str], list[str]]:
+    """Map each node inside a loop body to its outermost loop, in one O(V + E) pass.
+    
+    A loop's body is everything reachable from it, except through edges
+    leaving it on the ``done`` handle. Loops are visited in topological
+    ``order``, so a loop inside another's body is claimed by the outer loop
+    before its own turn. Also returns errors for nodes reached from two
+    loops neither of which contains the other.
+    """
+    owner: dict[str, str] = {}
+    conflicts: dict[str, str] = {}
+    for loop_id in order:
+        if loop_id not in loop_ids or loop_id in owner:
+            continue
+        stack = [e.target for e in out_edges[loop_id] if e.sourceHandle != LOOP_DONE_HANDLE]
+        while stack:
+            current = stack.pop()
+            other = owner.get(current)
+            if other == loop_id:
+                continue
+            if other is not None:
+                conflicts.setdefault(current, f"Node '{current}' is inside both loop '{other}' and loop '{loop_id}'")
+                continue
+            owner[current] = loop_id
+            stack.extend(e.target for e in out_edges[current])
+    return owner, list(conflicts.values())
+
+
+def ensure_executable(nodes: list[WorkflowNode], edges: list[WorkflowEdge]) -> None:
+    """Raise ``WorkflowValidationError`` if the graph cannot be executed."""
+    errors = validate_graph(nodes, edges).errors
+    if errors:
+        raise WorkflowValidationError(errors)
+
+
+def _find_cycles(successors: dict[str, list[str]]) -> list[list[str]]:
+    """Tarjan's strongly connected components, iterative so deep graphs cannot overflow the stack."""
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    cycles: list[list[str]] = []
+    position = {node_id: i for i, node_id in enumerate(successors)}
+    
+    for root in successors:
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node_id, targets = work[-1]
+            advanced = False
+            for target in targets:
+                if target not in index:
+                    index[target] = lowlink[target] = len(index)
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(successors[target])))
+                    advanced = True
+                    break
+                if target in on_stack:
+                    lowlink[node_id] = min(lowlink[node_id], index[target])
+            if advanced:
+                continue
+            
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node_id])
+            if lowlink[node_id] == index[node_id]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node_id:
+                        break
+                if len(component) > 1 or node_id in successors[node_id]:
+                    cycles.append(sorted(component, key=position.__getitem__))
+    return cycles
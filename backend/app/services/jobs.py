@@ -0,0 +1,388 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import AsyncGenerator, Optional
+from uuid import uuid4
+
+from app.models.workflow import ExecuteRequest, ExecuteResponse, NodeResult
+from app.services.checkpoints import CheckpointStore, prepare_execution
+from app.services.execution_plan import get_plan_cache
+from app.services.metrics import record_execution
+from app.services.rate_limiter import get_rate_limiter
+from app.services.state import DB_PATH, connect_sqlite, process_singleton
+
+JOB_WORKERS = int(os.getenv("AGENTFLOW_JOB_WORKERS", "4"))
+# A running job whose worker has not renewed its lease for this long is
+# assumed lost with its process and is queued again.
+JOB_LEASE_SECONDS = float(os.getenv("AGENTFLOW_JOB_LEASE", "30"))
+# How often a subscriber checks the store for events of a job running elsewhere.
+JOB_EVENT_POLL_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """SQLite record of submitted jobs, their events and their final responses."""
+    
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                workflow_id TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                response TEXT,
+                worker TEXT,
+                heartbeat REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("worker", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.commit()
+    
+    def create(self, job_id: str, request: ExecuteRequest, workflow_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, request, workflow_id, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, request.model_dump_json(), workflow_id, time.time()),
+            )
+            self._conn.commit()
+    
+    def request(self, job_id: str) -> Optional[ExecuteRequest]:
+        with self._lock:
+            row = self._conn.execute("SELECT request FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return ExecuteRequest.model_validate_json(row[0]) if row else None
+    
+    def claim(self, job_id: str, worker: Optional[str] = None) -> bool:
+        """Move a queued job to running, discarding events from an interrupted attempt.
+        
+        Returns False if the job is not queued, e.g. another worker picked it up.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, worker = ?, heartbeat = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (now, worker, now, job_id),
+            )
+            if cursor.rowcount:
+                self._conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+        return bool(cursor.rowcount)
+    
+    def add_event(self, job_id: str, seq: int, event: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                (job_id, seq, event),
+            )
+            self._conn.commit()
+    
+    def finish(self, job_id: str, status: str, response: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, response = ? WHERE job_id = ?",
+                (status, time.time(), response, job_id),
+            )
+            self._conn.commit()
+    
+    def events(self, job_id: str, after: int = -1) -> list[tuple[int, str]]:
+        """Recorded events with a sequence number greater than ``after``."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+    
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, workflow_id, created_at, started_at, finished_at, response "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, workflow_id, created_at, started_at, finished_at, response = row
+        return {
+            "jobId": job_id,
+            "status": status,
+            "workflowId": workflow_id,
+            "createdAt": created_at,
+            "startedAt": started_at,
+            "finishedAt": finished_at,
+            "response": json.loads(response) if response else None,
+        }
+    
+    def heartbeat(self, worker: str, job_ids: list[str]) -> None:
+        """Renew the lease on jobs ``worker`` is running."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET heartbeat = ? WHERE job_id = ? AND worker = ? AND status = 'running'",
+                [(time.time(), job_id, worker) for job_id in job_ids],
+            )
+            self._conn.commit()
+    
+    def requeue_unfinished(self, lease: float = 0) -> list[str]:
+        """Queue again running jobs whose lease is older than ``lease`` seconds.
+        
+        Returns every queued job, oldest first.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL "
+                "WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat <= ?)",
+                (time.time() - lease,),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+@process_singleton
+def get_job_store() -> JobStore:
+    """Return the process-wide job store."""
+    return JobStore(DB_PATH)
+
+
+class JobQueue:
+    """Runs submitted jobs on a fixed pool of worker tasks.
+    
+    Submitting only records the job and queues its id, so request handlers
+    return immediately however many jobs arrive. Node results are persisted
+    as numbered events while the job runs and are also pushed to live
+    subscribers; LLM deltas are only pushed live.
+    
+    Several app processes can share one store. Each holds a lease on the jobs
+    it runs and renews it periodically; a job whose lease expired because its
+    process died is queued again by whichever process notices first, and
+    resumes from the node outputs checkpointed under its job id. Subscribers
+    of a job running in another process follow it by polling the store.
+    """
+    
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = JOB_WORKERS,
+        checkpoints: Optional[CheckpointStore] = None,
+        lease: float = JOB_LEASE_SECONDS,
+    ):
+        self.store = store
+        self.checkpoints = checkpoints or CheckpointStore(store.path)
+        self.workers = max(1, workers)
+        self.lease = lease
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Job ids waiting in the local queue or running here.
+        self._queued: set[str] = set()
+        self._running: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+    
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def submit(self, request: ExecuteRequest, workflow_id: Optional[str] = None) -> str:
+        self.start()
+        job_id = str(uuid4())
+        await asyncio.to_thread(self.store.create, job_id, request, workflow_id)
+        self._enqueue([job_id])
+        return job_id
+    
+    def _enqueue(self, job_ids: list[str]) -> None:
+        for job_id in job_ids:
+            if job_id not in self._queued and job_id not in self._running:
+                self._queued.add(job_id)
+                self._queue.put_nowait(job_id)
+    
+    async def subscribe(self, job_id: str, after: int = -1) -> AsyncGenerator[tuple[Optional[int], str], None]:
+        """Yield ``(seq, event)`` pairs: recorded events first, then live ones.
+        
+        Deltas have no sequence number. Ends after the job's ``complete`` event.
+        """
+        live: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(live)
+        try:
+            last = after
+            for seq, event in await asyncio.to_thread(self.store.events, job_id, after):
+                yield seq, event
+                last = seq
+                if _is_complete(event):
+                    return
+            while True:
+                try:
+                    seq, event = await asyncio.wait_for(live.get(), JOB_EVENT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # Nothing live: the job may be running in another process.
+                    for seq, event in await asyncio.to_thread(self.store.events, job_id, last):
+                        yield seq, event
+                        last = seq
+                        if _is_complete(event):
+                            return
+                    continue
+                if seq is not None and seq <= last:
+                    continue
+                yield seq, event
+                if seq is not None:
+                    last = seq
+                    if _is_complete(event):
+                        return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(live)
+                if not subscribers:
+                    del self._subscribers[job_id]
+    
+    def _publish(self, job_id: str, seq: Optional[int], event: str) -> None:
+        for live in self._subscribers.get(job_id, ()):
+            live.put_nowait((seq, event))
+    
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            self._running.add(job_id)
+            try:
+                await self._run(job_id)
+            except Exception:
+                # Failing to record the outcome must not take the worker down with it.
+                logger.exception("Job %s could not be run to completion", job_id)
+            finally:
+                self._running.discard(job_id)
+    
+    async def _sweep(self) -> None:
+        """Renew the leases of jobs running here and pick up queued jobs and jobs whose lease expired."""
+        while True:
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.worker_id, list(self._running))
+                self._enqueue(await asyncio.to_thread(self.store.requeue_unfinished, self.lease))
+            except Exception:
+                # The database may be busy with another process; try again next round.
+                logger.warning("Job sweep failed", exc_info=True)
+            await asyncio.sleep(self.lease / 3)
+    
+    async def _run(self, job_id: str) -> None:
+        if not await asyncio.to_thread(self.store.claim, job_id, self.worker_id):
+            return
+        start_time = time.perf_counter()
+        seq = 0
+        results: list[NodeResult] = []
+        try:
+            # A request that no longer loads fails its job like any other error.
+            request = await asyncio.to_thread(self.store.request, job_id)
+            if request is None:
+                raise ValueError(f"Job {job_id} has no request")
+            plan = await asyncio.to_thread(get_plan_cache().get_or_compile, request.nodes, request.edges)
+            execution_id = request.executionId or job_id
+            if not request.resume and execution_id == job_id:
+                # Checkpoints under the job's own id come from an interrupted attempt.
+                interrupted = await asyncio.to_thread(self.checkpoints.load, job_id)
+                request = request.model_copy(update={"resume": interrupted is not None})
+            executor, initial_input, completed = await prepare_execution(
+                plan,
+                request,
+                request.input,
+                self.checkpoints,
+                execution_id=execution_id,
+                rate_limiter=get_rate_limiter(),
+                priority="batch",
+            )
+            events = executor.execute_stream(
+                initial_input, include_deltas=True, completed=completed, report_completed=True
+            )
+            async for event in events:
+                line = event.model_dump_json()
+                if isinstance(event, NodeResult):
+                    results.append(event)
+                    await asyncio.to_thread(self.store.add_event, job_id, seq, line)
+                    self._publish(job_id, seq, line)
+                    seq += 1
+                else:
+                    self._publish(job_id, None, line)
+            success = all(r.status != "error" for r in results)
+            response = ExecuteResponse(
+                success=success,
+                results=results,
+                finalOutput=executor.final_output(results),
+                totalDuration=record_execution("job", start_time, success),
+                metadata={
+                    "cache": executor.cache_stats,
+                    "executionId": execution_id,
+                    "restored": len(completed),
+                },
+            )
+            if executor.fingerprints is not None:
+                response.metadata["memoized"] = len(executor.memo_hits)
+        except Exception as e:
+            response = ExecuteResponse(
+                success=False,
+                results=results + [NodeResult(nodeId="error", status="error", error=str(e))],
+                totalDuration=record_execution("job", start_time, False),
+            )
+        
+        complete = json.dumps({"type": "complete", "success": response.success})
+        await asyncio.to_thread(self.store.add_event, job_id, seq, complete)
+        await asyncio.to_thread(
+            self.store.finish,
+            job_id,
+            "succeeded" if response.success else "failed",
+            response.model_dump_json(),
+        )
+        self._publish(job_id, seq, complete)
+
+
+def _is_complete(event: str) -> bool:
+    return event.startswith('{"type":') and json.loads(event).get("type") == "complete"
+
+
+_job_queue: Optional[JobQueue] = None
+_job_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_job_queue(store: Optional[JobStore] = None) -> JobQueue:
+    """Return the job queue for the running event loop."""
+    global _job_queue, _job_loop
+    store = store or get_job_store()
+    loop = asyncio.get_running_loop()
+    if _job_queue is None or _job_loop is not loop or _job_queue.store is not store:
+        _job_queue = JobQueue(store)
+        _job_loop = loop
+    return _job_queue
+
+
+async def stop_job_queue() -> None:
+    if _job_queue is not None:
+        await _job_queue.stop()
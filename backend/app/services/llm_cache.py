@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.services.state import connect_sqlite, get_shared_state, process_singleton
+
+CACHE_MAX_ENTRIES = int(os.getenv("AGENTFLOW_LLM_CACHE_SIZE", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("AGENTFLOW_LLM_CACHE_TTL", "3600"))
+CACHE_DB_PATH = os.getenv("AGENTFLOW_LLM_CACHE_PATH")
+
+
+def make_cache_key(
+    prompt: str,
+    model_id: str,
+    temperature: float,
+    max_tokens: int,
+    system: Optional[str],
+    context: Optional[str] = None,
+) -> str:
+    """Content-addressed key for a completion request."""
+    parts = [prompt, model_id, temperature, max_tokens, system]
+    if context:
+        parts.append(context)
+    payload = json.dumps(
+        parts,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheTier:
+    """On-disk cache tier that survives restarts."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0], row[1]
+    
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._conn.commit()
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMCache:
+    """Two-tier LLM response cache: an in-memory LRU with TTL, plus optional SQLite."""
+    
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL_SECONDS,
+        db_path: Optional[str] = None,
+        disk: Optional[SQLiteCacheTier] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.disk = disk or (SQLiteCacheTier(db_path) if db_path else None)
+    
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                return value
+            del self._memory[key]
+        
+        if self.disk is None:
+            return None
+        
+        entry = await asyncio.to_thread(self.disk.get, key)
+        if entry is None:
+            return None
+        self._remember(key, *entry)
+        return entry[0]
+    
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, expires_at)
+    
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+    
+    def __len__(self) -> int:
+        return len(self._memory)
+    
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+@process_singleton
+def get_llm_cache() -> LLMCache:
+    """Return the process-wide LLM response cache.
+    
+    Without ``AGENTFLOW_LLM_CACHE_PATH`` the second tier is the shared
+    state's, if it has one, so workers see each other's entries.
+    """
+    disk = None if CACHE_DB_PATH else get_shared_state().cache_tier
+    return LLMCache(db_path=CACHE_DB_PATH, disk=disk)
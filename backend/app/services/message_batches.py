@@ -0,0 +1,250 @@
+import asyncio
+import itertools
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Optional
+
+import httpx
+
+from app.services.claude_service import ClaudeAPIError, build_request, get_shared_client, usage_counts
+
+# Requests arriving within this many seconds of the first pending one share a submission.
+MESSAGE_BATCH_WINDOW = float(os.getenv("AGENTFLOW_MESSAGE_BATCH_WINDOW", "5"))
+MESSAGE_BATCH_MAX_REQUESTS = int(os.getenv("AGENTFLOW_MESSAGE_BATCH_SIZE", "10000"))
+MESSAGE_BATCH_POLL_SECONDS = float(os.getenv("AGENTFLOW_MESSAGE_BATCH_POLL", "30"))
+# The provider finishes a batch within 24 hours, so nodes waiting on one may take that long.
+MESSAGE_BATCH_TIMEOUT = float(os.getenv("AGENTFLOW_MESSAGE_BATCH_TIMEOUT", str(24 * 3600)))
+
+# Per-request error types worth submitting again in a later batch.
+RETRYABLE_BATCH_ERRORS = {"api_error", "overloaded_error", "rate_limit_error"}
+
+
+@dataclass
+class BatchOutcome:
+    """Result of one request of a provider batch."""
+    text: str = ""
+    usage: Optional[dict[str, int]] = None
+    error: Optional[ClaudeAPIError] = None
+
+
+class MessageBatchAPI(ABC):
+    """Where batches are submitted; the Anthropic API, or a local stand-in in tests."""
+    
+    @abstractmethod
+    async def create(self, requests: list[dict[str, Any]]) -> str:
+        """Submit ``{"custom_id", "params"}`` requests and return the batch id."""
+    
+    @abstractmethod
+    async def ended(self, batch_id: str) -> bool:
+        """Whether every request of the batch has finished."""
+    
+    @abstractmethod
+    def results(self, batch_id: str) -> AsyncIterator[tuple[str, BatchOutcome]]:
+        """``(custom_id, outcome)`` for each request of an ended batch."""
+
+
+class AnthropicBatchAPI(MessageBatchAPI):
+    """The Anthropic Message Batches API, through the shared client.
+    
+    The pinned SDK predates ``client.messages.batches``, so the endpoints are
+    called through the client's own request methods, which still supply
+    authentication, retries and error types.
+    """
+    
+    PATH = "/v1/messages/batches"
+    
+    def _client(self) -> Any:
+        client = get_shared_client()
+        if client is None:
+            raise ClaudeAPIError("Claude API not configured - add ANTHROPIC_API_KEY to enable AI features")
+        return client
+    
+    async def create(self, requests: list[dict[str, Any]]) -> str:
+        client = self._client()
+        try:
+            response = await client.post(self.PATH, cast_to=httpx.Response, body={"requests": requests})
+        except Exception as e:
+            raise ClaudeAPIError.from_exception(e) from e
+        return response.json()["id"]
+    
+    async def ended(self, batch_id: str) -> bool:
+        client = self._client()
+        try:
+            response = await client.get(f"{self.PATH}/{batch_id}", cast_to=httpx.Response)
+        except Exception as e:
+            raise ClaudeAPIError.from_exception(e) from e
+        return response.json()["processing_status"] == "ended"
+    
+    async def results(self, batch_id: str) -> AsyncIterator[tuple[str, BatchOutcome]]:
+        client = self._client()
+        try:
+            # Results are JSONL, one line per request, and read as they arrive.
+            response = await client.get(f"{self.PATH}/{batch_id}/results", cast_to=httpx.Response, stream=True)
+        except Exception as e:
+            raise ClaudeAPIError.from_exception(e) from e
+        try:
+            async for line in response.aiter_lines():
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["custom_id"], _outcome(entry["result"])
+        finally:
+            await response.aclose()
+
+
+def _outcome(result: dict[str, Any]) -> BatchOutcome:
+    if result["type"] == "succeeded":
+        message = result["message"]
+        text = "".join(block.get("text", "") for block in message.get("content", []) if block.get("type") == "text")
+        return BatchOutcome(text=text, usage=usage_counts(SimpleNamespace(**message.get("usage", {}))))
+    if result["type"] == "errored":
+        # The error response wraps the error itself.
+        error = result["error"].get("error", result["error"])
+        return BatchOutcome(error=ClaudeAPIError(
+            f"Claude API error: {error.get('message')}",
+            retryable=error.get("type") in RETRYABLE_BATCH_ERRORS,
+        ))
+    # Canceled, or expired before the provider got to it.
+    return BatchOutcome(error=ClaudeAPIError(f"Batch request {result['type']}", retryable=result["type"] == "expired"))
+
+
+class MessageBatcher:
+    """Stands in for ClaudeService, sending completions as provider batch submissions.
+    
+    Requests made within ``window`` seconds of the first pending one, by any
+    execution, go into one submission of up to ``max_requests``, so the LLM
+    nodes many executions reach at the same level of their graphs are sent
+    together. Each caller waits while the batch is polled for completion and
+    its execution then carries on in WorkflowExecutor as after a direct call.
+    """
+    
+    def __init__(
+        self,
+        api: Optional[MessageBatchAPI] = None,
+        window: float = MESSAGE_BATCH_WINDOW,
+        max_requests: int = MESSAGE_BATCH_MAX_REQUESTS,
+        poll_interval: float = MESSAGE_BATCH_POLL_SECONDS,
+    ):
+        self.api = api or AnthropicBatchAPI()
+        self.window = window
+        self.max_requests = max(1, max_requests)
+        self.poll_interval = poll_interval
+        self._pending: list[tuple[str, dict[str, Any], asyncio.Future]] = []
+        self._ids = itertools.count()
+        self._flusher: Optional[asyncio.Task] = None
+        self._batches: set[asyncio.Task] = set()
+    
+    async def complete(
+        self,
+        prompt: str,
+        model: str = "claude-4-sonnet",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+        context: Optional[str] = None,
+        cache_system: bool = False,
+        on_usage: Optional[Callable[[dict[str, int]], None]] = None,
+    ) -> str:
+        """Same contract as ClaudeService.complete; ``on_delta`` receives the whole text at once."""
+        future = asyncio.get_running_loop().create_future()
+        params = build_request(prompt, model, temperature, max_tokens, system, context, cache_system)
+        self._pending.append((f"req-{next(self._ids)}", params, future))
+        if len(self._pending) >= self.max_requests:
+            self._submit()
+        elif self._flusher is None:
+            self._flusher = asyncio.create_task(self._submit_after_window())
+        
+        outcome: BatchOutcome = await future
+        if outcome.error is not None:
+            raise outcome.error
+        if on_usage is not None and outcome.usage is not None:
+            on_usage(outcome.usage)
+        if on_delta is not None and outcome.text:
+            on_delta(outcome.text)
+        return outcome.text
+    
+    async def _submit_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._flusher = None
+        self._submit()
+    
+    def _submit(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.create_task(self._run_batch(pending))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+    
+    async def _run_batch(self, pending: list[tuple[str, dict[str, Any], asyncio.Future]]) -> None:
+        futures = {custom_id: future for custom_id, _, future in pending}
+        error: Exception = ClaudeAPIError("Message batch ended without a result for this request", retryable=True)
+        try:
+            batch_id = await self.api.create(
+                [{"custom_id": custom_id, "params": params} for custom_id, params, _ in pending]
+            )
+            while not await self._ended(batch_id):
+                await asyncio.sleep(self.poll_interval)
+            async for custom_id, outcome in self.api.results(batch_id):
+                future = futures.pop(custom_id, None)
+                if future is not None and not future.done():
+                    future.set_result(outcome)
+        except asyncio.CancelledError:
+            error = ClaudeAPIError("Message batching stopped before the batch ended")
+            raise
+        except Exception as e:
+            error = e if isinstance(e, ClaudeAPIError) else ClaudeAPIError(f"Message batch failed: {e}")
+        finally:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(error)
+    
+    async def _ended(self, batch_id: str) -> bool:
+        try:
+            return await self.api.ended(batch_id)
+        except ClaudeAPIError as e:
+            # A failed poll says nothing about the batch; ask again next time.
+            if e.retryable:
+                return False
+            raise
+    
+    async def close(self) -> None:
+        """Stop waiting on submitted batches and fail every caller still waiting."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        for task in self._batches:
+            task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+        pending, self._pending = self._pending, []
+        for _, _, future in pending:
+            if not future.done():
+                future.set_exception(ClaudeAPIError("Message batching stopped before the request was sent"))
+
+
+# Futures and tasks belong to one event loop, so the shared batcher is per loop.
+_message_batcher: Optional[MessageBatcher] = None
+_message_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_message_batcher() -> MessageBatcher:
+    """Return the process-wide batcher shared by every batch run in message-batch mode."""
+    global _message_batcher, _message_batcher_loop
+    loop = asyncio.get_running_loop()
+    if _message_batcher is None or _message_batcher_loop is not loop:
+        _message_batcher = MessageBatcher()
+        _message_batcher_loop = loop
+    return _message_batcher
+
+
+async def close_message_batcher() -> None:
+    global _message_batcher, _message_batcher_loop
+    if _message_batcher is not None:
+        await _message_batcher.close()
+    _message_batcher = None
+    _message_batcher_loop = None
@@ -0,0 +1,135 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# Buckets from 1ms to 2 minutes: most nodes are sub-millisecond transforms or
+# multi-second LLM calls, so both ends need resolution.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+# Scheduler-side phases are usually far below a millisecond.
+PHASE_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+) + LATENCY_BUCKETS
+
+NODE_LABELS = ("node_type", "model", "tool")
+
+NODE_DURATION = Histogram(
+    "agentflow_node_duration_seconds",
+    "Wall time of a node from start to result, excluding queue wait.",
+    NODE_LABELS + ("status",),
+    buckets=LATENCY_BUCKETS,
+)
+NODE_PHASE_DURATION = Histogram(
+    "agentflow_node_phase_seconds",
+    "Time spent in each phase of running a node.",
+    NODE_LABELS + ("phase",),
+    buckets=PHASE_BUCKETS,
+)
+NODE_ERRORS = Counter(
+    "agentflow_node_errors_total",
+    "Nodes that finished with an error.",
+    NODE_LABELS,
+)
+NODE_RETRIES = Counter(
+    "agentflow_node_retries_total",
+    "Retries of LLM and tool calls after a transient error.",
+    NODE_LABELS,
+)
+EXECUTION_DURATION = Histogram(
+    "agentflow_execution_duration_seconds",
+    "Wall time of a whole workflow execution.",
+    ("mode",),
+    buckets=LATENCY_BUCKETS,
+)
+EXECUTIONS = Counter(
+    "agentflow_executions_total",
+    "Workflow executions by outcome.",
+    ("mode", "status"),
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "agentflow_llm_cache_lookups_total",
+    "LLM response cache lookups by outcome.",
+    ("model", "outcome"),
+)
+LLM_COALESCED = Counter(
+    "agentflow_llm_coalesced_total",
+    "LLM requests that joined an identical request already in flight.",
+    ("model",),
+)
+LLM_TOKENS = Counter(
+    "agentflow_llm_tokens_total",
+    "Tokens billed by Claude, by kind; cache_read is input served from the prompt cache.",
+    ("model", "kind"),
+)
+# Usage reported by ClaudeService, mapped to the LLM_TOKENS kind label.
+USAGE_LABELS = {
+    "inputTokens": "input",
+    "cachedInputTokens": "cache_read",
+    "cacheWriteTokens": "cache_write",
+    "outputTokens": "output",
+}
+SERIALIZATION_DURATION = Histogram(
+    "agentflow_serialization_seconds",
+    "Time spent encoding results for the client.",
+    ("format",),
+    buckets=PHASE_BUCKETS,
+)
+
+
+class NodeTimer:
+    """Collects the phase timings of one node run and reports them on ``finish``."""
+    __slots__ = ("labels", "phases", "start")
+    
+    def __init__(self, node_type: str, model: Optional[str] = None, tool: Optional[str] = None):
+        self.labels = (node_type, model or "", tool or "")
+        self.phases: dict[str, float] = {}
+        self.start = time.perf_counter()
+    
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+    
+    def finish(self, status: str) -> float:
+        """Record the run and return its duration in milliseconds."""
+        seconds = time.perf_counter() - self.start
+        NODE_DURATION.labels(*self.labels, status).observe(seconds)
+        for phase, phase_seconds in self.phases.items():
+            NODE_PHASE_DURATION.labels(*self.labels, phase).observe(phase_seconds)
+        if status == "error":
+            NODE_ERRORS.labels(*self.labels).inc()
+        return round(seconds * 1000, 3)
+
+
+def record_execution(mode: str, start: float, success: bool) -> float:
+    """Record a finished execution and return its duration in milliseconds."""
+    seconds = time.perf_counter() - start
+    EXECUTION_DURATION.labels(mode).observe(seconds)
+    EXECUTIONS.labels(mode, "success" if success else "error").inc()
+    return round(seconds * 1000, 3)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type.
+    
+    With several workers, set ``PROMETHEUS_MULTIPROC_DIR`` so every process
+    records into it and any of them can report the combined values.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+from typing import Any, Optional
+
+from app.services.claude_service import MODEL_MAP
+from app.services.state import BucketTake, InMemorySharedState, SharedState, get_shared_state
+
+# Limits apply only once configured; 0 (the default) disables a budget.
+CLAUDE_REQUESTS_PER_MINUTE = float(
+    os.getenv("AGENTFLOW_CLAUDE_RPM", os.getenv("AGENTFLOW_BATCH_RPM", "0"))
+)
+CLAUDE_TOKENS_PER_MINUTE = float(os.getenv("AGENTFLOW_CLAUDE_TPM", "0"))
+# Per-model overrides, e.g. {"claude-4-haiku": {"rpm": 100, "tpm": 100000}};
+# keys may be MODEL_MAP names or model ids.
+CLAUDE_MODEL_LIMITS: dict[str, dict[str, float]] = json.loads(
+    os.getenv("AGENTFLOW_CLAUDE_LIMITS", "{}")
+)
+
+# Lower runs first; queued requests of a lower level always go ahead.
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(prompt: str, max_tokens: int, system: Optional[str] = None) -> int:
+    """Rough token cost of a request: the prompt's characters / 4 plus the output budget."""
+    chars = len(prompt) + len(system or "")
+    return math.ceil(chars / CHARS_PER_TOKEN) + max_tokens
+
+
+class ModelQueue:
+    """Admits requests for one model within its request and token budgets.
+    
+    The budgets are token buckets in the shared state, so with the SQLite
+    backend every worker draws from the same ones. Waiting requests are
+    ordered by priority, then by start-time fair queueing across flows: each
+    flow (an execution, or a whole batch) is charged for the tokens it used,
+    so one busy execution cannot starve the others at the same priority.
+    """
+    
+    def __init__(
+        self,
+        model_id: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        state: Optional[SharedState] = None,
+    ):
+        self.model_id = model_id
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state = state or InMemorySharedState()
+        self.virtual_time = 0.0
+        self._flow_finish: dict[Any, float] = {}
+        self._waiters: list[tuple[int, float, int, float, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._drainer: Optional[asyncio.Task] = None
+    
+    @property
+    def limited(self) -> bool:
+        return bool(self.requests_per_minute or self.tokens_per_minute)
+    
+    def _takes(self, tokens: float) -> list[BucketTake]:
+        # Both buckets hold a full minute, so bursts up to the budget go through at once.
+        takes = []
+        if self.requests_per_minute:
+            rpm = self.requests_per_minute
+            takes.append((f"rpm:{self.model_id}", 1, rpm, rpm))
+        if self.tokens_per_minute:
+            tpm = self.tokens_per_minute
+            takes.append((f"tpm:{self.model_id}", tokens, tpm, tpm))
+        return takes
+    
+    async def acquire(self, tokens: float = 0, priority: str = "normal", flow: Any = None) -> None:
+        """Wait for a slot and ``tokens`` tokens."""
+        if not self.limited:
+            return
+        start = max(self.virtual_time, self._flow_finish.get(flow, 0.0))
+        finish = start + max(tokens, 1)
+        if flow is not None:
+            self._flow_finish[flow] = finish
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters,
+            (PRIORITIES.get(priority, PRIORITIES["normal"]), start, next(self._order), tokens, future),
+        )
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        else:
+            self._wakeup.set()
+        await future
+    
+    async def _drain(self) -> None:
+        while self._waiters:
+            _, start, _, tokens, future = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting.
+                heapq.heappop(self._waiters)
+                continue
+            self._wakeup.clear()
+            wait = await self.state.take_tokens(self._takes(tokens))
+            if wait > 0:
+                # Sleep until the budget refills, or until a new request may
+                # have taken the head of the queue.
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._waiters)
+            self.virtual_time = max(self.virtual_time, start)
+            if not future.done():
+                future.set_result(None)
+        self._forget_idle_flows()
+    
+    def _forget_idle_flows(self) -> None:
+        # With nothing queued, flows that are not ahead of the clock carry no credit.
+        self._flow_finish = {
+            flow: finish for flow, finish in self._flow_finish.items() if finish > self.virtual_time
+        }
+
+
+class RateLimiter:
+    """Per-model request and token limits, one queue per model id."""
+    
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        model_limits: Optional[dict[str, dict[str, float]]] = None,
+        state: Optional[SharedState] = None,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = {
+            MODEL_MAP.get(model, model): limits for model, limits in (model_limits or {}).items()
+        }
+        self.state = state or InMemorySharedState()
+        self._queues: dict[str, ModelQueue] = {}
+    
+    @property
+    def configured(self) -> bool:
+        """Whether any budget is set, for all models or for one."""
+        return bool(self.requests_per_minute or self.tokens_per_minute or self.model_limits)
+    
+    def queue(self, model_id: str) -> ModelQueue:
+        if model_id not in self._queues:
+            limits = self.model_limits.get(model_id, {})
+            self._queues[model_id] = ModelQueue(
+                model_id,
+                limits.get("rpm", self.requests_per_minute),
+                limits.get("tpm", self.tokens_per_minute),
+                self.state,
+            )
+        return self._queues[model_id]
+    
+    async def acquire(
+        self,
+        model_id: str,
+        tokens: float = 0,
+        priority: str = "normal",
+        flow: Any = None,
+    ) -> None:
+        await self.queue(model_id).acquire(tokens, priority, flow)
+
+
+# asyncio primitives belong to one event loop, so the shared limiter is per loop.
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Return the process-wide limiter shared by every execution that calls Claude.
+    
+    None unless limits are configured, so executions are not throttled by default.
+    """
+    global _rate_limiter, _rate_limiter_loop
+    loop = asyncio.get_running_loop()
+    if _rate_limiter is None or _rate_limiter_loop is not loop:
+        _rate_limiter = RateLimiter(
+            CLAUDE_REQUESTS_PER_MINUTE,
+            CLAUDE_TOKENS_PER_MINUTE,
+            CLAUDE_MODEL_LIMITS,
+            state=get_shared_state(),
+        )
+        _rate_limiter_loop = loop
+    return _rate_limiter if _rate_limiter.configured else None
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRY_ATTEMPTS = int(os.getenv("AGENTFLOW_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("AGENTFLOW_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("AGENTFLOW_RETRY_MAX_DELAY", "20"))
+# Deadline for LLM and tool nodes, retries included, unless the node sets its own.
+NODE_TIMEOUT = float(os.getenv("AGENTFLOW_NODE_TIMEOUT", "300"))
+# Hedge delay used until enough latencies are recorded to estimate a p95.
+HEDGE_DELAY = float(os.getenv("AGENTFLOW_HEDGE_DELAY", "5"))
+HEDGE_MIN_SAMPLES = 20
+
+
+class DeadlineExceeded(TimeoutError):
+    """A node or execution ran past its deadline."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how patiently a failed call is repeated."""
+    attempts: int = RETRY_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY
+    max_delay: float = RETRY_MAX_DELAY
+    
+    def backoff(self, retry: int) -> float:
+        """Delay before retry number ``retry`` (0-based): exponential with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether ``error`` is transient, e.g. a 429, a 529 or a dropped connection."""
+    return bool(getattr(error, "retryable", False)) or isinstance(error, ConnectionError)
+
+
+async def with_deadline(awaitable: Awaitable[T], deadline: Optional[float]) -> T:
+    """Await ``awaitable``, giving up at the ``time.monotonic()`` reading ``deadline``."""
+    if deadline is None:
+        return await awaitable
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded after {remaining:.1f}s") from None
+
+
+async def call_with_retry(
+    call: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    deadline: Optional[float] = None,
+    can_retry: Optional[Callable[[BaseException], bool]] = None,
+    on_retry: Optional[Callable[[int, BaseException], None]] = None,
+) -> T:
+    """Run ``call`` until it succeeds, retrying retryable errors with backoff.
+    
+    Gives up after ``policy.attempts`` attempts, on a non-retryable error, or
+    when the next attempt could not start before ``deadline``. A
+    ``retry_after`` attribute on the error (seconds) raises the backoff.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await with_deadline(call(), deadline)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            attempt += 1
+            if attempt >= policy.attempts or not is_retryable(e):
+                raise
+            if can_retry is not None and not can_retry(e):
+                raise
+            delay = max(policy.backoff(attempt - 1), getattr(e, "retry_after", None) or 0)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e)
+            await asyncio.sleep(delay)
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float) -> tuple[T, bool]:
+    """Run ``call``, starting a second copy if the first has not answered after ``delay``.
+    
+    Returns the first successful result and whether it came from the hedge;
+    the slower request is cancelled. Fails only once every started copy has.
+    """
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.add(asyncio.ensure_future(call()))
+        error: Optional[BaseException] = None
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    return task.result(), task is not primary
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class LatencyTracker:
+    """Recent call latencies per key, for estimating when to hedge."""
+    
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+    
+    def record(self, key: str, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+    
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def hedge_delay(self, key: str) -> float:
+        """The key's p95 latency, or ``HEDGE_DELAY`` until there is enough history."""
+        p95 = self.percentile(key, 0.95)
+        return p95 if p95 is not None else HEDGE_DELAY
+
+
+_latency_tracker = LatencyTracker()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Return the process-wide LLM latency tracker."""
+    return _latency_tracker
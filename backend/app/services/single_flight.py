@@ -0,0 +1,78 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent callers with the same key.
+    
+    Unlike the response cache nothing is kept: once the call finishes, its
+    result or error goes to every caller that joined it and the next call
+    with that key starts afresh. The call runs in its own task, so a caller
+    that gives up does not cancel it for the others; it is cancelled only
+    when no caller is left.
+    """
+    
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+    
+    def __len__(self) -> int:
+        return len(self._flights)
+    
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Result of ``call()``, or of the identical call already in flight.
+        
+        The flag is True when the result came from another caller's call.
+        """
+        result, shared = self.join(key, call)
+        return await result, shared
+    
+    def join(self, key: str, call: Callable[[], Awaitable[Any]]) -> tuple[Awaitable[Any], bool]:
+        """Start ``call()`` or join the identical call in flight, without waiting.
+        
+        Returns an awaitable for the result and whether the call was joined.
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda task: self._land(key, flight))
+        flight.waiters += 1
+        return self._wait(flight), shared
+    
+    async def _wait(self, flight: _Flight) -> Any:
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+    
+    def _land(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the error retrieved even if every caller already gave up.
+            flight.task.exception()
+
+
+# Tasks belong to one event loop, so the shared instance is per loop.
+_single_flight: Optional[SingleFlight] = None
+_single_flight_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group for LLM calls."""
+    global _single_flight, _single_flight_loop
+    loop = asyncio.get_running_loop()
+    if _single_flight is None or _single_flight_loop is not loop:
+        _single_flight = SingleFlight()
+        _single_flight_loop = loop
+    return _single_flight
@@ -0,0 +1,181 @@
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+
+if TYPE_CHECKING:
+    from app.services.llm_cache import SQLiteCacheTier
+
+T = TypeVar("T")
+
+# SQLite file holding workflows, jobs, batches and checkpoints.
+DB_PATH = os.getenv("AGENTFLOW_DB_PATH", "agentflow.db")
+WORKER_COUNT = int(os.getenv("WEB_CONCURRENCY", "1"))
+# "memory" keeps coordination state inside the process; "sqlite" shares it
+# between the workers on one host. Several workers default to "sqlite".
+STATE_BACKEND = os.getenv("AGENTFLOW_STATE_BACKEND", "sqlite" if WORKER_COUNT > 1 else "memory")
+STATE_DB_PATH = os.getenv("AGENTFLOW_STATE_PATH", DB_PATH)
+
+def connect_sqlite(path: str, **kwargs: Any) -> sqlite3.Connection:
+    """Open ``path`` for the SQLite stores.
+    
+    The connection may be used from worker threads (callers serialize it
+    with a lock), runs in WAL mode, and waits up to 5 s for other processes
+    holding the database lock. Extra keyword arguments go to ``sqlite3.connect``.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def process_singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """Turn ``factory`` into a getter that builds its object once per process."""
+    instance: Optional[T] = None
+    
+    @functools.wraps(factory)
+    def get() -> T:
+        nonlocal instance
+        if instance is None:
+            instance = factory()
+        return instance
+    
+    return get
+
+
+# (key, amount, rate per minute, capacity)
+BucketTake = tuple[str, float, float, float]
+
+
+def _refill(tokens: float, updated_at: float, now: float, per_minute: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * per_minute / 60.0)
+
+
+def _take(levels: dict[str, float], takes: list[BucketTake]) -> tuple[float, dict[str, float]]:
+    """Seconds until every take fits (0 if they all do now) and the new token levels.
+    
+    ``levels`` holds each bucket's current tokens; the returned levels
+    include the takes only when they all fit.
+    """
+    wait = 0.0
+    for key, amount, per_minute, capacity in takes:
+        missing = min(amount, capacity) - levels[key]
+        if missing > 0:
+            wait = max(wait, missing / (per_minute / 60.0))
+    if wait > 0:
+        return wait, levels
+    return 0.0, {
+        key: levels[key] - min(amount, capacity) for key, amount, _, capacity in takes
+    }
+
+
+class SharedState(ABC):
+    """Coordination state that every worker of the app must agree on.
+    
+    Durable records (workflows, jobs, batches, checkpoints) live in their
+    own SQLite stores; this covers the rest: rate-limit token buckets and
+    the second tier of the LLM response cache.
+    """
+    
+    # Whether other processes see the same state.
+    shared = False
+    
+    @abstractmethod
+    async def take_tokens(self, takes: list[BucketTake]) -> float:
+        """Atomically take from several token buckets, all or nothing.
+        
+        Returns 0 when the tokens were taken, otherwise the seconds to wait
+        before they could be (nothing is taken then). Buckets start full.
+        """
+    
+    @property
+    def cache_tier(self) -> Optional["SQLiteCacheTier"]:
+        """Second LLM cache tier visible to every worker, if any."""
+        return None
+
+
+class InMemorySharedState(SharedState):
+    """Process-local state, for a single worker."""
+    
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+    
+    async def take_tokens(self, takes: list[BucketTake]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            for key, _, per_minute, capacity in takes:
+                tokens, updated_at = self._buckets.get(key, (capacity, now))
+                levels[key] = _refill(tokens, updated_at, now, per_minute, capacity)
+            wait, levels = _take(levels, takes)
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens, now)
+        return wait
+
+
+class SQLiteSharedState(SharedState):
+    """State in a SQLite file; writes hold the database lock, so it is safe across processes."""
+    
+    shared = True
+    
+    def __init__(self, path: str = STATE_DB_PATH):
+        from app.services.llm_cache import SQLiteCacheTier
+        
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode, so BEGIN IMMEDIATE below controls the transaction.
+        self._conn = connect_sqlite(path, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            " key TEXT PRIMARY KEY,"
+            " tokens REAL NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._cache_tier = SQLiteCacheTier(path)
+    
+    @property
+    def cache_tier(self) -> "SQLiteCacheTier":
+        return self._cache_tier
+    
+    async def take_tokens(self, takes: list[BucketTake]) -> float:
+        return await asyncio.to_thread(self._take_tokens, takes)
+    
+    def _take_tokens(self, takes: list[BucketTake]) -> float:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Wall-clock time, since the monotonic clock is not shared between processes.
+                now = time.time()
+                levels = {}
+                for key, _, per_minute, capacity in takes:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)
+                    ).fetchone()
+                    tokens, updated_at = row if row else (capacity, now)
+                    levels[key] = _refill(tokens, updated_at, now, per_minute, capacity)
+                wait, levels = _take(levels, takes)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(key, tokens, now) for key, tokens in levels.items()],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+
+@process_singleton
+def get_shared_state() -> SharedState:
+    """Return the process-wide shared state backend chosen by ``AGENTFLOW_STATE_BACKEND``."""
+    if STATE_BACKEND == "sqlite":
+        return SQLiteSharedState(STATE_DB_PATH)
+    if STATE_BACKEND == "memory":
+        return InMemorySharedState()
+    raise ValueError(f"Unknown AGENTFLOW_STATE_BACKEND: {STATE_BACKEND!r}")
@@ -0,0 +1,110 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Literal, Mapping, Optional
+
+MissingPolicy = Literal["keep", "empty", "error"]
+
+# What to render for a placeholder that resolves to nothing: leave the
+# ``{{name}}`` text in place, render an empty string, or fail the node.
+DEFAULT_MISSING_POLICY: MissingPolicy = os.getenv("AGENTFLOW_TEMPLATE_MISSING", "keep")  # type: ignore[assignment]
+
+TEMPLATE_CACHE_SIZE = int(os.getenv("AGENTFLOW_TEMPLATE_CACHE_SIZE", "1024"))
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+_MISSING = object()
+
+
+class TemplateError(ValueError):
+    """Raised when a template variable is missing under the ``error`` policy."""
+
+
+class Template:
+    """A template parsed once into literal text and placeholder segments.
+    
+    ``{{input}}`` is the node's whole input. Any other name is looked up in
+    the input (when it is a dict of upstream outputs) and then in the
+    execution variables. Dotted paths such as ``{{node_a.summary}}`` or
+    ``{{items.0}}`` walk into dicts and lists.
+    """
+    __slots__ = ("source", "_literals", "_placeholders")
+    
+    def __init__(self, source: str):
+        self.source = source
+        self._literals: list[str] = []
+        self._placeholders: list[tuple[str, str, tuple[str, ...]]] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(source):
+            self._literals.append(source[position:match.start()])
+            name = match.group(1)
+            self._placeholders.append((match.group(0), name, tuple(name.split("."))))
+            position = match.end()
+        self._literals.append(source[position:])
+    
+    @property
+    def names(self) -> list[str]:
+        """Placeholder names in the order they appear."""
+        return [name for _, name, _ in self._placeholders]
+    
+    def render(
+        self,
+        data: Any,
+        variables: Optional[Mapping[str, Any]] = None,
+        missing: Optional[MissingPolicy] = None,
+    ) -> str:
+        """Substitute every placeholder in a single pass."""
+        if not self._placeholders:
+            return self._literals[0]
+        variables = variables or {}
+        policy = missing or DEFAULT_MISSING_POLICY
+        parts = [self._literals[0]]
+        for (raw, name, path), literal in zip(self._placeholders, self._literals[1:]):
+            value = _resolve(name, path, data, variables)
+            if value is _MISSING:
+                if policy == "error":
+                    raise TemplateError(f"Template variable '{name}' is not defined")
+                parts.append(raw if policy == "keep" else "")
+            elif value is not None:
+                parts.append(value if isinstance(value, str) else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(source: str) -> Template:
+    """Parsed template for ``source``, shared by every caller using the same text."""
+    return Template(source)
+
+
+def resolve(name: str, data: Any, variables: Optional[Mapping[str, Any]] = None, default: Any = None) -> Any:
+    """Value a ``{{name}}`` placeholder refers to, or ``default`` if there is none."""
+    value = _resolve(name, tuple(name.split(".")), data, variables or {})
+    return default if value is _MISSING else value
+
+
+def _lookup(key: str, data: Any, variables: Mapping[str, Any]) -> Any:
+    if key == "input":
+        return data
+    if isinstance(data, dict) and key in data:
+        return data[key]
+    return variables.get(key, _MISSING)
+
+
+def _resolve(name: str, path: tuple[str, ...], data: Any, variables: Mapping[str, Any]) -> Any:
+    # Keys may themselves contain dots, so the full name wins over a path.
+    value = _lookup(name, data, variables)
+    if value is not _MISSING or len(path) == 1:
+        return value
+    
+    value = _lookup(path[0], data, variables)
+    for part in path[1:]:
+        if value is _MISSING:
+            break
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, (list, tuple)) and part.lstrip("-").isdigit():
+            index = int(part)
+            value = value[index] if -len(value) <= index < len(value) else _MISSING
+        else:
+            value = _MISSING
+    return value
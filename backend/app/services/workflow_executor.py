@@ -1,83 +1,341 @@
+import asyncio
+import hashlib
+import os
 import time
 import json
-import re
-from typing import Any, AsyncGenerator
-from collections import defaultdict
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Awaitable, Callable, Optional, Union
+from collections import deque
+from contextlib import nullcontext
 
-from app.models.workflow import WorkflowNode, WorkflowEdge, NodeResult, NodeType
-from app.services.claude_service import ClaudeService
+from app.models.workflow import (
+    WorkflowNode, WorkflowEdge, ExecutionOptions, NodeResult, NodeDelta, NodeType,
+)
+from app.services.claude_service import ClaudeService, MODEL_MAP
+from app.services.llm_cache import LLMCache, get_llm_cache, make_cache_key
+from app.services.execution_plan import ExecutionPlan, compile_plan
+from app.services.expressions import compile_arithmetic, compile_condition
+from app.services.message_batches import MESSAGE_BATCH_TIMEOUT, MessageBatcher
+from app.services.metrics import LLM_CACHE_LOOKUPS, LLM_COALESCED, LLM_TOKENS, NODE_RETRIES, USAGE_LABELS, NodeTimer
+from app.services.rate_limiter import RateLimiter, estimate_tokens
+from app.services.retry import (
+    NODE_TIMEOUT, DeadlineExceeded, RetryPolicy, call_with_retry, get_latency_tracker, hedged, with_deadline,
+)
+from app.services.single_flight import get_single_flight
+from app.services.templates import compile_template
+
+if TYPE_CHECKING:
+    from app.services.checkpoints import CheckpointStore
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("AGENTFLOW_MAX_CONCURRENCY", "8"))
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def select_final_output(results: list[NodeResult]) -> Any:
+    """Output of the last node that succeeded with a value."""
+    for result in reversed(results):
+        if result.status == "success" and result.output is not None:
+            return result.output
+    return None
 
 
 class WorkflowExecutor:
     """Executes workflow graphs."""
     
-    def __init__(self, nodes: list[WorkflowNode], edges: list[WorkflowEdge]):
-        self.nodes = {node.id: node for node in nodes}
-        self.edges = edges
+    def __init__(
+        self,
+        nodes: Optional[list[WorkflowNode]] = None,
+        edges: Optional[list[WorkflowEdge]] = None,
+        max_concurrency: Optional[int] = None,
+        use_cache: bool = False,
+        cache: Optional[LLMCache] = None,
+        plan: Optional[ExecutionPlan] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        variables: Optional[dict[str, Any]] = None,
+        include_inputs: bool = True,
+        max_payload_chars: Optional[int] = None,
+        release_outputs: bool = False,
+        checkpoints: Optional["CheckpointStore"] = None,
+        execution_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        priority: str = "normal",
+        flow: Any = None,
+        message_batcher: Optional[MessageBatcher] = None,
+        fingerprints: Optional[dict[str, str]] = None,
+        coalesce: bool = True,
+    ):
+        if plan is None:
+            plan = compile_plan(nodes or [], edges or [])
+        self.plan = plan
+        self.nodes = plan.node_map
+        self.edges = plan.edges
         self.results: dict[str, Any] = {}
+        self.max_concurrency = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
         
-        self.outgoing: dict[str, list[str]] = defaultdict(list)
-        self.incoming: dict[str, list[str]] = defaultdict(list)
-        
-        for edge in edges:
-            self.outgoing[edge.source].append(edge.target)
-            self.incoming[edge.target].append(edge.source)
-        
-        self.start_nodes = [
-            node_id for node_id in self.nodes
-            if not self.incoming[node_id]
-        ]
+        self.outgoing = plan.outgoing
+        self.incoming = plan.incoming
+        self.start_nodes = [plan.node_ids[i] for i in plan.start]
         
         self.claude = None
+        self.use_cache = use_cache
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.variables = variables or {}
+        self.include_inputs = include_inputs
+        self.max_payload_chars = max_payload_chars
+        self.release_outputs = release_outputs
+        self.checkpoints = checkpoints
+        self.execution_id = execution_id
+        # time.monotonic() reading after which unfinished nodes fail
+        self.deadline = deadline
+        # Rate limiter queueing: priority level, and the flow charged for this run's requests
+        self.priority = priority
+        self.flow = flow if flow is not None else self
+        # Send LLM requests as provider batch submissions instead of direct calls
+        self.message_batcher = message_batcher
+        # Let LLM requests join identical ones in flight (see _should_coalesce)
+        self.coalesce = coalesce
+        # Node fingerprints under which successful outputs are memoized in the
+        # checkpoint store, and the nodes whose memoized output was reused
+        self.fingerprints = fingerprints
+        self.memo_hits: set[str] = set()
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.node_metadata: dict[str, dict[str, Any]] = {}
+        self._timers: dict[str, NodeTimer] = {}
+        self._events: Optional[asyncio.Queue] = None
+        self._stream_deltas = False
+    
+    @classmethod
+    def from_options(cls, plan: ExecutionPlan, options: ExecutionOptions, **kwargs: Any) -> "WorkflowExecutor":
+        """Executor for ``plan`` configured from a request's execution options."""
+        return cls(
+            plan=plan,
+            max_concurrency=options.maxConcurrency,
+            use_cache=options.useCache,
+            include_inputs=options.includeInputs,
+            max_payload_chars=options.maxPayloadChars,
+            release_outputs=options.releaseOutputs,
+            deadline=time.monotonic() + options.timeout if options.timeout else None,
+            coalesce=options.coalesce,
+            **kwargs,
+        )
     
-    def _get_claude(self) -> ClaudeService:
+    def _get_claude(self) -> Union[ClaudeService, MessageBatcher]:
         if self.claude is None:
-            self.claude = ClaudeService()
+            self.claude = self.message_batcher or ClaudeService()
         return self.claude
     
-    async def execute(self, initial_input: Any) -> list[NodeResult]:
+    def _get_cache(self) -> LLMCache:
+        if self.cache is None:
+            self.cache = get_llm_cache()
+        return self.cache
+    
+    def final_output(self, results: list[NodeResult]) -> Any:
+        """Full output of the last node that succeeded with a value.
+        
+        Unlike ``select_final_output`` this is not affected by
+        ``max_payload_chars`` previews, since sink outputs are never released.
+        """
+        for result in reversed(results):
+            if result.status == "success" and result.output is not None:
+                return self.results.get(result.nodeId, result.output)
+        return None
+    
+    async def execute(
+        self,
+        initial_input: Any,
+        completed: Optional[dict[str, Any]] = None,
+        report_completed: bool = False,
+    ) -> list[NodeResult]:
         results = []
-        async for result in self.execute_stream(initial_input):
+        async for result in self.execute_stream(
+            initial_input, completed=completed, report_completed=report_completed
+        ):
             results.append(result)
         return results
     
-    async def execute_stream(self, initial_input: Any) -> AsyncGenerator[NodeResult, None]:
+    async def execute_stream(
+        self,
+        initial_input: Any,
+        include_deltas: bool = False,
+        completed: Optional[dict[str, Any]] = None,
+        report_completed: bool = False,
+    ) -> AsyncGenerator[Union[NodeResult, NodeDelta], None]:
+        """Run the graph, yielding node results in completion order.
+        
+        Nodes are launched as soon as all of their dependencies have finished,
+        up to ``max_concurrency`` at a time. With ``include_deltas`` LLM
+        nodes also stream ``NodeDelta`` events while they run. Nodes listed
+        in ``completed`` are treated as already finished with the given
+        output; ``report_completed`` yields a result for each of them first.
+        
+        With a checkpoint store and execution id, every successful output
+        that does not depend on a failed node is saved as soon as it exists;
+        with fingerprints it is also memoized for later executions.
+        """
         self.results["__input__"] = initial_input
-        executed = set()
-        queue = list(self.start_nodes)
-        
-        while queue:
-            node_id = queue.pop(0)
-            if node_id in executed:
-                continue
-            
-            deps = self.incoming[node_id]
-            if not all(dep in executed for dep in deps):
-                queue.append(node_id)
-                continue
-            
-            node = self.nodes[node_id]
-            result = await self._execute_node(node)
-            yield result
-            executed.add(node_id)
-            
-            if result.status == "success":
-                self.results[node_id] = result.output
-            
-            for next_node_id in self.outgoing[node_id]:
-                if next_node_id not in executed:
-                    queue.append(next_node_id)
-    
-    async def _execute_node(self, node: WorkflowNode) -> NodeResult:
-        start_time = time.time()
+        self._events = asyncio.Queue()
+        self._stream_deltas = include_deltas
+        plan = self.plan
+        completed = completed or {}
+        pending_deps = list(plan.in_degree)
+        live_deps = [0] * len(plan.nodes)
+        unfinished_consumers = list(plan.consumer_counts)
+        # Nodes that failed or ran on the output of one that did.
+        tainted: set[int] = set()
+        now = time.perf_counter()
+        # Ready nodes with the perf_counter() reading at which they became ready.
+        ready = deque((i, now) for i in plan.start if plan.node_ids[i] not in completed)
+        skipped: list[NodeResult] = []
+        
+        def finish(index: int, output: Any, status: str) -> None:
+            # Resolve the node's outgoing edges; successors left with no live
+            # incoming edge are skipped, and so on down the graph.
+            finished = deque([(index, output, status)])
+            while finished:
+                index, output, status = finished.popleft()
+                node = plan.nodes[index]
+                for predecessor in plan.schedule_predecessors[index]:
+                    unfinished_consumers[predecessor] -= 1
+                    if not unfinished_consumers[predecessor] and self.release_outputs:
+                        self.results.pop(plan.node_ids[predecessor], None)
+                for successor, handle in zip(plan.successors[index], plan.successor_handles[index]):
+                    pending_deps[successor] -= 1
+                    if self._edge_taken(node, handle, output, status):
+                        live_deps[successor] += 1
+                    if pending_deps[successor] or plan.node_ids[successor] in completed:
+                        continue
+                    if live_deps[successor]:
+                        ready.append((successor, time.perf_counter()))
+                    else:
+                        skipped.append(NodeResult(nodeId=plan.node_ids[successor], status="skipped"))
+                        finished.append((successor, None, "skipped"))
+        
+        if completed:
+            self.results.update(completed)
+            for node_id, output in completed.items():
+                if report_completed:
+                    reused = node_id in self.memo_hits
+                    yield NodeResult(
+                        nodeId=node_id,
+                        status="success",
+                        output=self._payload(output),
+                        metadata={"memo": "reused"} if reused else {"checkpoint": "restored"},
+                    )
+                finish(plan.index[node_id], output, "success")
+        tasks: set[asyncio.Task] = set()
+        in_flight = 0
+        
         try:
-            node_input = self._gather_inputs(node.id)
+            while ready or in_flight or skipped:
+                for result in skipped:
+                    yield result
+                skipped.clear()
+                if not (ready or in_flight):
+                    break
+                
+                while ready and in_flight < self.max_concurrency:
+                    index, queued_at = ready.popleft()
+                    task = asyncio.create_task(self._run_node(plan.nodes[index], queued_at))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    in_flight += 1
+                
+                event = await self._events.get()
+                # Loop body node results are reported by their loop and are
+                # not scheduled here.
+                if isinstance(event, NodeResult) and event.nodeId not in plan.loop_owner:
+                    in_flight -= 1
+                    index = plan.index[event.nodeId]
+                    if event.status == "error" or any(
+                        p in tainted for p in plan.schedule_predecessors[index]
+                    ):
+                        tainted.add(index)
+                    elif self.checkpoints is not None:
+                        await self._save_output(event.nodeId)
+                    finish(index, self.results.get(event.nodeId), event.status)
+                
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _save_output(self, node_id: str) -> None:
+        """Checkpoint and memoize an output that does not depend on a failed node."""
+        output = self.results.get(node_id)
+        if self.execution_id is not None:
+            await asyncio.to_thread(
+                self.checkpoints.save, self.execution_id, node_id, self.plan.node_hashes[node_id], output
+            )
+        if self.fingerprints is not None:
+            await asyncio.to_thread(self.checkpoints.save_memo, self.fingerprints[node_id], output)
+    
+    @staticmethod
+    def _edge_taken(node: WorkflowNode, handle: Optional[str], output: Any, status: str) -> bool:
+        """Whether a finished node's edge leaving on ``handle`` carries data."""
+        if status == "skipped":
+            return False
+        if node.type == NodeType.ROUTER and handle is not None and status == "success":
+            if isinstance(output, dict) and "branch" in output:
+                return handle == output["branch"]
+        return True
+    
+    async def _run_node(self, node: WorkflowNode, queued_at: Optional[float] = None) -> None:
+        result = await self._execute_node(node, queued_at)
+        self._events.put_nowait(result)
+    
+    def _emit_delta(self, node_id: str, text: str) -> None:
+        self._events.put_nowait(NodeDelta(nodeId=node_id, delta=text))
+    
+    async def _execute_node(self, node: WorkflowNode, queued_at: Optional[float] = None) -> NodeResult:
+        data = node.data
+        timer = NodeTimer(
+            node.type.value,
+            model=(data.model or "claude-4-sonnet") if node.type == NodeType.LLM else None,
+            tool=data.toolType if node.type == NodeType.TOOL else None,
+        )
+        if queued_at is not None:
+            timer.add("queue_wait", timer.start - queued_at)
+        self._timers[node.id] = timer
+        try:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise DeadlineExceeded("Execution deadline exceeded")
+            with timer.phase("inputs"):
+                node_input = self._gather_inputs(node.id)
             output = await self._process_node(node, node_input)
-            duration = int((time.time() - start_time) * 1000)
-            return NodeResult(nodeId=node.id, status="success", input=node_input, output=output, duration=duration)
+            self.results[node.id] = output
+            return NodeResult(
+                nodeId=node.id,
+                status="success",
+                input=self._payload(node_input) if self.include_inputs else None,
+                output=self._payload(output),
+                duration=timer.finish("success"),
+                metadata=self.node_metadata.get(node.id),
+            )
         except Exception as e:
-            duration = int((time.time() - start_time) * 1000)
-            return NodeResult(nodeId=node.id, status="error", error=str(e), duration=duration)
+            return NodeResult(
+                nodeId=node.id,
+                status="error",
+                error=str(e),
+                duration=timer.finish("error"),
+                metadata=self.node_metadata.get(node.id),
+            )
+        finally:
+            del self._timers[node.id]
+    
+    def _payload(self, value: Any) -> Any:
+        """Value to report in a NodeResult: itself, or a preview if it is too large."""
+        limit = self.max_payload_chars
+        if limit is None or value is None or isinstance(value, (bool, int, float)):
+            return value
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) <= limit:
+            return value
+        return {
+            "truncated": True,
+            "preview": text[:limit],
+            "size": len(text),
+            "sha256": hashlib.sha256(text.encode()).hexdigest(),
+        }
     
     def _gather_inputs(self, node_id: str) -> Any:
         deps = self.incoming[node_id]
@@ -94,31 +352,236 @@ class WorkflowExecutor:
         if node_type == NodeType.INPUT:
             return input_data
         elif node_type == NodeType.LLM:
-            return await self._process_llm(data, input_data)
+            return await self._process_llm(data, input_data, node_id=node.id)
         elif node_type == NodeType.TOOL:
-            return await self._process_tool(data, input_data)
+            return await call_with_retry(
+                lambda: self._process_tool(data, input_data),
+                self._retry_policy(data),
+                self._node_deadline(data),
+                on_retry=lambda attempt, error: self._record_retry(node.id, attempt),
+            )
         elif node_type == NodeType.ROUTER:
-            return self._process_router(data, input_data)
+            return self._process_router(data, input_data, node_id=node.id)
+        elif node_type == NodeType.LOOP:
+            return await self._process_loop(node, input_data)
         elif node_type == NodeType.TRANSFORM:
-            return self._process_transform(data, input_data)
+            return self._process_transform(data, input_data, node_id=node.id)
         elif node_type == NodeType.OUTPUT:
             return input_data
         else:
             raise ValueError(f"Unknown node type: {node_type}")
     
-    async def _process_llm(self, data: Any, input_data: Any) -> str:
-        prompt = data.prompt or ""
-        prompt = self._replace_variables(prompt, input_data)
+    async def _process_llm(self, data: Any, input_data: Any, node_id: Optional[str] = None) -> str:
+        prompt = self._replace_variables(data.prompt or "", input_data, data, node_id)
+        model = data.model or "claude-4-sonnet"
+        temperature = data.temperature if data.temperature is not None else 0.7
+        max_tokens = data.maxTokens or 1024
+        model_id = MODEL_MAP.get(model, MODEL_MAP["claude-4-sonnet"])
+        context = self._replace_variables(data.context, input_data, data, node_id) if data.context else None
         claude = self._get_claude()
-        return await claude.complete(prompt=prompt, model=data.model or "claude-4-sonnet", temperature=data.temperature or 0.7)
+        
+        cache_key = None
+        if self._should_cache(data, temperature):
+            cache_key = make_cache_key(
+                prompt,
+                model_id,
+                temperature,
+                max_tokens,
+                data.systemPrompt,
+                context,
+            )
+            with self._phase(node_id, "cache"):
+                cached = await self._get_cache().get(cache_key)
+            if cached is not None:
+                self._record_cache(node_id, model, "hit")
+                if self._stream_deltas and node_id is not None:
+                    self._emit_delta(node_id, cached)
+                return cached
+            self._record_cache(node_id, model, "miss")
+        
+        # Batched requests are not rate limited per minute, hedged or timed like direct calls.
+        batched = self.message_batcher is not None
+        hedge = data.hedge and not batched
+        # Hedged requests would interleave their deltas, so they are not streamed.
+        stream = self._stream_deltas and node_id is not None and not hedge
+        streamed = False
+        kwargs = {}
+        if stream:
+            def on_delta(text: str) -> None:
+                nonlocal streamed
+                streamed = True
+                self._emit_delta(node_id, text)
+            kwargs["on_delta"] = on_delta
+        if context or data.cacheSystemPrompt:
+            kwargs["context"] = context
+            kwargs["cache_system"] = data.cacheSystemPrompt
+        if node_id is not None:
+            kwargs["on_usage"] = lambda usage: self._record_usage(node_id, model, usage)
+        latencies = get_latency_tracker()
+        
+        async def attempt(waits: list[float]) -> str:
+            start = time.perf_counter()
+            if self.rate_limiter is not None and not batched:
+                await self.rate_limiter.acquire(
+                    model_id,
+                    estimate_tokens(prompt, max_tokens, (context or "") + (data.systemPrompt or "")),
+                    self.priority,
+                    self.flow,
+                )
+                waits.append(time.perf_counter() - start)
+                start = time.perf_counter()
+            text = await claude.complete(
+                prompt=prompt,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system=data.systemPrompt,
+                **kwargs,
+            )
+            if not batched:
+                latencies.record(model_id, time.perf_counter() - start)
+            return text
+        
+        async def request() -> str:
+            # Timed once per request, however many copies hedging starts: the
+            # first copy's rate-limit wait, then the rest as the LLM call.
+            waits: list[float] = []
+            start = time.perf_counter()
+            try:
+                if not hedge:
+                    return await attempt(waits)
+                text, from_hedge = await hedged(lambda: attempt(waits), latencies.hedge_delay(model_id))
+                if from_hedge and node_id is not None:
+                    self.node_metadata.setdefault(node_id, {})["hedge"] = "won"
+                return text
+            finally:
+                timer = self._timers.get(node_id)
+                if timer is not None:
+                    elapsed = time.perf_counter() - start
+                    if waits:
+                        timer.add("rate_limit", waits[0])
+                        elapsed -= waits[0]
+                    timer.add("llm", elapsed)
+        
+        deadline = self._node_deadline(data)
+        
+        def call() -> Awaitable[str]:
+            return call_with_retry(
+                request,
+                self._retry_policy(data),
+                deadline,
+                # Text already streamed to the client cannot be taken back.
+                can_retry=lambda error: not streamed,
+                on_retry=lambda attempt, error: self._record_retry(node_id, attempt),
+            )
+        
+        if self._should_coalesce(data, temperature):
+            output, shared = await self._coalesced(
+                call,
+                deadline,
+                # Only requests made the same way share a call: same mode,
+                # retries, timeout, hedging and streaming.
+                "|".join(map(str, (
+                    "batch" if batched else "direct",
+                    data.maxAttempts,
+                    data.timeout,
+                    hedge,
+                    stream,
+                    cache_key or make_cache_key(
+                        prompt, model_id, temperature, max_tokens, data.systemPrompt, context
+                    ),
+                ))),
+            )
+        else:
+            output, shared = await call(), False
+        if shared:
+            LLM_COALESCED.labels(model).inc()
+            if node_id is not None:
+                self.node_metadata.setdefault(node_id, {})["coalesced"] = True
+        if (hedge or shared) and self._stream_deltas and node_id is not None:
+            self._emit_delta(node_id, output)
+        
+        if cache_key is not None and not shared:
+            await self._get_cache().set(cache_key, output)
+        return output
+    
+    def _should_coalesce(self, data: Any, temperature: float) -> bool:
+        """Whether an LLM request may join an identical one already in flight.
+        
+        Off for the whole execution with ``coalesce=False``; per node,
+        ``coalesce`` forces it either way. By default only deterministic
+        requests that may use the cache are joined, since callers asking for
+        fresh or sampled output expect a completion of their own.
+        """
+        if not self.coalesce:
+            return False
+        if data.coalesce is not None:
+            return data.coalesce
+        return data.cache != "never" and temperature == 0
+    
+    async def _coalesced(
+        self,
+        call: Callable[[], Awaitable[str]],
+        deadline: float,
+        key: str,
+    ) -> tuple[str, bool]:
+        """Join an identical request in flight from any execution, or start one."""
+        result, joined = get_single_flight().join(key, call)
+        try:
+            # The caller's own deadline applies while it waits on another's call.
+            return await with_deadline(result, deadline), joined
+        except DeadlineExceeded:
+            if not joined or time.monotonic() >= deadline:
+                raise
+        # The call we joined ran out of its own time before ours did.
+        return await call(), False
+    
+    @staticmethod
+    def _retry_policy(data: Any) -> RetryPolicy:
+        if data.maxAttempts is None:
+            return DEFAULT_RETRY_POLICY
+        return RetryPolicy(attempts=data.maxAttempts)
+    
+    def _node_deadline(self, data: Any) -> float:
+        default = MESSAGE_BATCH_TIMEOUT if self.message_batcher is not None else NODE_TIMEOUT
+        deadline = time.monotonic() + (data.timeout or default)
+        if self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        return deadline
+    
+    def _record_retry(self, node_id: Optional[str], attempt: int) -> None:
+        timer = self._timers.get(node_id)
+        if timer is not None:
+            NODE_RETRIES.labels(*timer.labels).inc()
+        if node_id is not None:
+            self.node_metadata.setdefault(node_id, {})["attempts"] = attempt + 1
+    
+    def _record_usage(self, node_id: str, model: str, usage: dict[str, int]) -> None:
+        for kind, label in USAGE_LABELS.items():
+            if usage.get(kind):
+                LLM_TOKENS.labels(model, label).inc(usage[kind])
+        self.node_metadata.setdefault(node_id, {})["usage"] = usage
+    
+    def _should_cache(self, data: Any, temperature: float) -> bool:
+        policy = data.cache
+        if policy == "always":
+            return True
+        if policy == "never":
+            return False
+        if policy == "deterministic":
+            return temperature == 0
+        return self.use_cache
+    
+    def _record_cache(self, node_id: Optional[str], model: str, outcome: str) -> None:
+        self.cache_stats["hits" if outcome == "hit" else "misses"] += 1
+        LLM_CACHE_LOOKUPS.labels(model, outcome).inc()
+        if node_id is not None:
+            self.node_metadata.setdefault(node_id, {})["cache"] = outcome
     
     async def _process_tool(self, data: Any, input_data: Any) -> Any:
         tool_type = data.toolType
         if tool_type == "calculator":
-            expression = str(input_data)
-            if re.match(r'^[\d\s\+\-\*\/\.\(\)]+$', expression):
-                return eval(expression)
-            raise ValueError("Invalid expression")
+            return compile_arithmetic(str(input_data)).evaluate()
         elif tool_type == "web-search":
             return f"Search results for: {input_data}"
         elif tool_type == "api-call":
@@ -126,16 +589,99 @@ class WorkflowExecutor:
         else:
             raise ValueError(f"Unknown tool type: {tool_type}")
     
-    def _process_router(self, data: Any, input_data: Any) -> dict:
-        condition = data.condition or "true"
-        condition = self._replace_variables(condition, input_data)
+    def _process_router(self, data: Any, input_data: Any, node_id: Optional[str] = None) -> dict:
         try:
-            result = eval(condition, {"__builtins__": {}}, {"input": input_data})
+            condition = self.plan.conditions.get(node_id)
+            if condition is None:
+                condition = compile_condition(data.condition or "true")
+            result = condition.evaluate({**self.variables, "input": input_data})
             return {"branch": "true" if result else "false", "value": input_data}
         except Exception:
             return {"branch": "false", "value": input_data}
     
-    def _process_transform(self, data: Any, input_data: Any) -> Any:
+    async def _process_loop(self, node: WorkflowNode, input_data: Any) -> list:
+        """Run the loop body once per input element and collect the outputs in order."""
+        data = node.data
+        items = input_data
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except json.JSONDecodeError:
+                pass
+        if not isinstance(items, (list, tuple)):
+            raise ValueError("Loop node expects a list input")
+        if data.maxIterations is not None and len(items) > data.maxIterations:
+            raise ValueError(
+                f"Loop input has {len(items)} items, more than maxIterations ({data.maxIterations})"
+            )
+        
+        body = self.plan.loops.get(node.id)
+        if body is None:
+            return list(items)
+        
+        external = {dep: self.results.get(dep) for dep in body.external}
+        slots = asyncio.Semaphore(data.maxConcurrency or self.max_concurrency)
+        
+        async def run_iteration(item: Any) -> dict[str, NodeResult]:
+            async with slots:
+                variables = dict(self.variables)
+                if data.iteratorVariable:
+                    variables[data.iteratorVariable] = item
+                child = WorkflowExecutor(
+                    plan=body.plan,
+                    max_concurrency=self.max_concurrency,
+                    use_cache=self.use_cache,
+                    cache=self.cache,
+                    rate_limiter=self.rate_limiter,
+                    variables=variables,
+                    include_inputs=False,
+                    release_outputs=self.release_outputs,
+                    deadline=self.deadline,
+                    priority=self.priority,
+                    flow=self.flow,
+                    message_batcher=self.message_batcher,
+                    coalesce=self.coalesce,
+                )
+                child.claude = self._get_claude()
+                results = await child.execute(None, completed={node.id: item, **external})
+                for outcome, count in child.cache_stats.items():
+                    self.cache_stats[outcome] += count
+                return {result.nodeId: result for result in results}
+        
+        iterations = await asyncio.gather(*(run_iteration(item) for item in items))
+        
+        errors = []
+        for body_node_id in body.node_ids:
+            outputs = []
+            node_errors = []
+            ran = False
+            for i, results in enumerate(iterations):
+                result = results.get(body_node_id)
+                outputs.append(result.output if result else None)
+                if result and result.status == "error":
+                    node_errors.append(f"Iteration {i}: {result.error}")
+                ran = ran or (result is not None and result.status != "skipped")
+            status = "error" if node_errors else "success" if ran else "skipped"
+            if status == "success" and not self.release_outputs:
+                self.results[body_node_id] = outputs
+            self._events.put_nowait(NodeResult(
+                nodeId=body_node_id,
+                status=status,
+                output=self._payload(outputs),
+                error="; ".join(node_errors) if node_errors else None,
+            ))
+            errors.extend(node_errors)
+        
+        if errors:
+            raise ValueError(f"{len(errors)} loop body node run(s) failed; first error: {errors[0]}")
+        
+        collected = []
+        for results in iterations:
+            outputs = {sink: results[sink].output for sink in body.sinks if sink in results}
+            collected.append(next(iter(outputs.values())) if len(body.sinks) == 1 else outputs)
+        return collected
+    
+    def _process_transform(self, data: Any, input_data: Any, node_id: Optional[str] = None) -> Any:
         transform_type = data.transformType
         if transform_type == "json-parse":
             return json.loads(input_data) if isinstance(input_data, str) else input_data
@@ -144,14 +690,26 @@ class WorkflowExecutor:
             return input_data.get(field) if field and isinstance(input_data, dict) else input_data
         elif transform_type == "format-text":
             template = data.config.get("template") if data.config else "{{input}}"
-            return self._replace_variables(template, input_data)
+            return self._replace_variables(template, input_data, data, node_id)
         return input_data
     
-    def _replace_variables(self, template: str, data: Any) -> str:
+    def _replace_variables(
+        self,
+        template: str,
+        data: Any,
+        node_data: Any = None,
+        node_id: Optional[str] = None,
+    ) -> str:
         if not template:
             return ""
-        result = template.replace("{{input}}", str(data) if data else "")
-        if isinstance(data, dict):
-            for key, value in data.items():
-                result = result.replace(f"{{{{{key}}}}}", str(value) if value else "")
-        return result
+        compiled = self.plan.templates.get(node_id)
+        if compiled is None or compiled.source != template:
+            compiled = compile_template(template)
+        missing = node_data.missingVariables if node_data is not None else None
+        with self._phase(node_id, "template"):
+            return compiled.render(data, self.variables, missing)
+    
+    def _phase(self, node_id: Optional[str], name: str):
+        """Time a phase of a running node; a no-op outside ``_execute_node``."""
+        timer = self._timers.get(node_id)
+        return timer.phase(name) if timer is not None else nullcontext()
@@ -0,0 +1,275 @@
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from pydantic import TypeAdapter
+
+from app.models.workflow import Workflow, WorkflowNode, WorkflowEdge, WorkflowSummary
+from app.services.state import DB_PATH, connect_sqlite, process_singleton
+
+
+_nodes_adapter = TypeAdapter(list[WorkflowNode])
+_edges_adapter = TypeAdapter(list[WorkflowEdge])
+
+
+def parse_cursor(cursor: str) -> int:
+    """Position encoded in a ``nextCursor``; ValueError if it is not one."""
+    try:
+        position = int(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+    if position < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return position
+
+
+class WorkflowStore(ABC):
+    """Storage backend for saved workflows."""
+    
+    @abstractmethod
+    def get(self, workflow_id: str) -> Optional[Workflow]:
+        """Load one workflow, including its nodes and edges."""
+    
+    @abstractmethod
+    def version(self, workflow_id: str) -> Optional[float]:
+        """Last-modified timestamp of a workflow, without loading its graph."""
+    
+    @abstractmethod
+    def save(self, workflow: Workflow) -> Workflow:
+        """Insert or replace a workflow. ``workflow.id`` must be set."""
+    
+    @abstractmethod
+    def delete(self, workflow_id: str) -> bool:
+        """Delete a workflow, returning False if it did not exist."""
+    
+    @abstractmethod
+    def list_summaries(
+        self,
+        limit: int,
+        offset: int = 0,
+        after: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> tuple[list[WorkflowSummary], Optional[str]]:
+        """Return one page of summaries and the cursor for the next page.
+        
+        ``after`` is a cursor returned by a previous call; when given, the
+        page starts right after it and ``offset`` is ignored. Raises
+        ValueError for a malformed cursor.
+        """
+    
+    @abstractmethod
+    def count(self, name: Optional[str] = None) -> int:
+        """Number of stored workflows."""
+    
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every workflow."""
+
+
+class InMemoryWorkflowStore(WorkflowStore):
+    """Process-local store, mainly for tests and single-worker development."""
+    
+    def __init__(self):
+        self._workflows: dict[str, tuple[int, WorkflowSummary, Workflow]] = {}
+        self._seq = 0
+    
+    def get(self, workflow_id: str) -> Optional[Workflow]:
+        entry = self._workflows.get(workflow_id)
+        return entry[2] if entry else None
+    
+    def version(self, workflow_id: str) -> Optional[float]:
+        entry = self._workflows.get(workflow_id)
+        return entry[1].updatedAt if entry else None
+    
+    def save(self, workflow: Workflow) -> Workflow:
+        now = time.time()
+        existing = self._workflows.get(workflow.id)
+        if existing:
+            seq, created_at = existing[0], existing[1].createdAt
+        else:
+            self._seq += 1
+            seq, created_at = self._seq, now
+        summary = WorkflowSummary(
+            id=workflow.id,
+            name=workflow.name,
+            description=workflow.description,
+            createdAt=created_at,
+            updatedAt=now,
+        )
+        self._workflows[workflow.id] = (seq, summary, workflow)
+        return workflow
+    
+    def delete(self, workflow_id: str) -> bool:
+        return self._workflows.pop(workflow_id, None) is not None
+    
+    def list_summaries(
+        self,
+        limit: int,
+        offset: int = 0,
+        after: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> tuple[list[WorkflowSummary], Optional[str]]:
+        entries = [
+            (seq, summary) for seq, summary, _ in self._workflows.values()
+            if name is None or summary.name == name
+        ]
+        if after is not None:
+            position = parse_cursor(after)
+            entries = [e for e in entries if e[0] > position]
+            offset = 0
+        page = entries[offset:offset + limit]
+        next_cursor = str(page[-1][0]) if len(page) == limit else None
+        return [summary for _, summary in page], next_cursor
+    
+    def count(self, name: Optional[str] = None) -> int:
+        if name is None:
+            return len(self._workflows)
+        return sum(1 for _, s, _ in self._workflows.values() if s.name == name)
+    
+    def clear(self) -> None:
+        self._workflows.clear()
+
+
+class SQLiteWorkflowStore(WorkflowStore):
+    """SQLite-backed store; nodes and edges are kept as compact JSON blobs."""
+    
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS workflows (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                description TEXT,
+                nodes BLOB NOT NULL,
+                edges BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS workflows_name ON workflows (name, seq);
+            
+            CREATE TABLE IF NOT EXISTS workflow_count (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO workflow_count (id, total)
+                SELECT 0, COUNT(*) FROM workflows;
+            CREATE TRIGGER IF NOT EXISTS workflows_count_insert AFTER INSERT ON workflows
+                BEGIN UPDATE workflow_count SET total = total + 1 WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS workflows_count_delete AFTER DELETE ON workflows
+                BEGIN UPDATE workflow_count SET total = total - 1 WHERE id = 0; END;
+            """
+        )
+        self._conn.commit()
+    
+    def get(self, workflow_id: str) -> Optional[Workflow]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, description, nodes, edges FROM workflows WHERE id = ?",
+                (workflow_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Workflow(
+            id=row["id"],
+            name=row["name"],
+            description=row["description"],
+            nodes=_nodes_adapter.validate_json(row["nodes"]),
+            edges=_edges_adapter.validate_json(row["edges"]),
+        )
+    
+    def version(self, workflow_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM workflows WHERE id = ?", (workflow_id,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def save(self, workflow: Workflow) -> Workflow:
+        now = time.time()
+        nodes = _nodes_adapter.dump_json(workflow.nodes, exclude_defaults=True)
+        edges = _edges_adapter.dump_json(workflow.edges, exclude_defaults=True)
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO workflows (id, name, description, nodes, edges, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    name = excluded.name,
+                    description = excluded.description,
+                    nodes = excluded.nodes,
+                    edges = excluded.edges,
+                    updated_at = excluded.updated_at
+                """,
+                (workflow.id, workflow.name, workflow.description, nodes, edges, now, now),
+            )
+            self._conn.commit()
+        return workflow
+    
+    def delete(self, workflow_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM workflows WHERE id = ?", (workflow_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+    
+    def list_summaries(
+        self,
+        limit: int,
+        offset: int = 0,
+        after: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> tuple[list[WorkflowSummary], Optional[str]]:
+        clauses, params = [], []
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(parse_cursor(after))
+            offset = 0
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT seq, id, name, description, created_at, updated_at FROM workflows "
+                f"{where} ORDER BY seq LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        summaries = [
+            WorkflowSummary(
+                id=row["id"],
+                name=row["name"],
+                description=row["description"],
+                createdAt=row["created_at"],
+                updatedAt=row["updated_at"],
+            )
+            for row in rows
+        ]
+        next_cursor = str(rows[-1]["seq"]) if len(rows) == limit else None
+        return summaries, next_cursor
+    
+    def count(self, name: Optional[str] = None) -> int:
+        with self._lock:
+            if name is None:
+                row = self._conn.execute("SELECT total FROM workflow_count WHERE id = 0").fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) FROM workflows WHERE name = ?", (name,)
+                ).fetchone()
+        return row[0]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM workflows")
+            self._conn.commit()
+
+
+@process_singleton
+def get_workflow_store() -> WorkflowStore:
+    """Return the process-wide workflow store."""
+    return SQLiteWorkflowStore(DB_PATH)
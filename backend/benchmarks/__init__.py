@@ -0,0 +1,5 @@
+"""Execution benchmarks for the AgentFlow backend.
+
+Run with ``python -m benchmarks.run`` from the backend directory and compare
+two result files with ``python -m benchmarks.compare``.
+"""
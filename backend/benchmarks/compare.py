@@ -0,0 +1,71 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.1]
+
+Exits with status 1 if any metric regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# Metrics where a larger value is better; for every other metric smaller is better.
+HIGHER_IS_BETTER = {"throughput_per_s"}
+
+COMPARED_METRICS = [
+    "throughput_per_s",
+    "latency_p50_ms",
+    "latency_p99_ms",
+    "scheduler_overhead_us_per_node",
+    "sse_encode_us_per_event",
+    "peak_memory_kb_per_execution",
+]
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[dict]:
+    """Per-metric relative change for scenarios present in both reports."""
+    rows = []
+    for scenario, base in baseline["results"].items():
+        new = candidate["results"].get(scenario)
+        if new is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in base or metric not in new or not base[metric]:
+                continue
+            change = (new[metric] - base[metric]) / base[metric]
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append({
+                "scenario": scenario,
+                "metric": metric,
+                "baseline": base[metric],
+                "candidate": new[metric],
+                "change": change,
+                "regression": worse > threshold,
+            })
+    return rows
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['scenario']:>14} {row['metric']:<32} "
+            f"{row['baseline']:12.2f} -> {row['candidate']:12.2f} ({row['change']:+7.1%}) {flag}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
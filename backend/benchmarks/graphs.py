@@ -0,0 +1,102 @@
+import random
+
+from app.models.workflow import WorkflowNode, WorkflowEdge
+
+
+def _node(node_id: str, node_type: str, **data) -> WorkflowNode:
+    return WorkflowNode(
+        id=node_id,
+        type=node_type,
+        position={"x": 0, "y": 0},
+        data={"label": node_id, **data},
+    )
+
+
+def _edge(source: str, target: str) -> WorkflowEdge:
+    return WorkflowEdge(id=f"{source}->{target}", source=source, target=target)
+
+
+def _llm(node_id: str) -> WorkflowNode:
+    return _node(node_id, "llm", model="claude-4-haiku", prompt=f"{node_id}: {{{{input}}}}")
+
+
+def _join(node_id: str) -> WorkflowNode:
+    # Constant output keeps payload sizes flat however deep the graph is.
+    return _node(node_id, "transform", transformType="format-text", config={"template": f"{node_id} done"})
+
+
+def chain(length: int) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    """input -> llm-0 -> ... -> llm-(n-1) -> output"""
+    nodes = [_node("input", "input")]
+    edges = []
+    previous = "input"
+    for i in range(length):
+        node_id = f"llm-{i}"
+        nodes.append(_llm(node_id))
+        edges.append(_edge(previous, node_id))
+        previous = node_id
+    nodes.append(_node("output", "output"))
+    edges.append(_edge(previous, "output"))
+    return nodes, edges
+
+
+def fan_out(width: int) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    """input -> width parallel LLM nodes -> output"""
+    nodes = [_node("input", "input"), _node("output", "output")]
+    edges = []
+    for i in range(width):
+        node_id = f"llm-{i}"
+        nodes.append(_llm(node_id))
+        edges.append(_edge("input", node_id))
+        edges.append(_edge(node_id, "output"))
+    return nodes, edges
+
+
+def diamonds(count: int) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    """``count`` diamonds in series: split into two LLM nodes, then join."""
+    nodes = [_node("input", "input")]
+    edges = []
+    previous = "input"
+    for i in range(count):
+        left, right, join = f"left-{i}", f"right-{i}", f"join-{i}"
+        nodes += [_llm(left), _llm(right), _join(join)]
+        edges += [
+            _edge(previous, left),
+            _edge(previous, right),
+            _edge(left, join),
+            _edge(right, join),
+        ]
+        previous = join
+    nodes.append(_node("output", "output"))
+    edges.append(_edge(previous, "output"))
+    return nodes, edges
+
+
+def random_dag(size: int, max_fan_in: int = 3, seed: int = 0) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    """Layered random DAG with ``size`` inner nodes; every node feeds forward only."""
+    rng = random.Random(seed)
+    nodes = [_node("input", "input")]
+    edges = []
+    ids = ["input"]
+    for i in range(size):
+        node_id = f"n-{i}"
+        if rng.random() < 0.3:
+            nodes.append(_llm(node_id))
+        else:
+            nodes.append(_join(node_id))
+        window = ids[-50:]
+        for source in rng.sample(window, k=min(len(window), rng.randint(1, max_fan_in))):
+            edges.append(_edge(source, node_id))
+        ids.append(node_id)
+    sinks = set(ids) - {edge.source for edge in edges}
+    nodes.append(_node("output", "output"))
+    edges += [_edge(sink, "output") for sink in sorted(sinks)]
+    return nodes, edges
+
+
+SCENARIOS = {
+    "chain-10": lambda: chain(10),
+    "fan-out-20": lambda: fan_out(20),
+    "diamonds-10": lambda: diamonds(10),
+    "dag-1000": lambda: random_dag(1000),
+}
@@ -0,0 +1,51 @@
+import asyncio
+import random
+from typing import Callable, Optional
+
+
+class MockClaudeService:
+    """Deterministic local stand-in for ClaudeService.
+    
+    Each call sleeps for ``latency`` seconds plus up to ``jitter`` seconds
+    drawn from a seeded generator, then returns a response of
+    ``response_chars`` characters derived from the prompt.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        response_chars: int = 200,
+        seed: int = 0,
+        chunk_size: int = 16,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.response_chars = response_chars
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+    
+    async def complete(
+        self,
+        prompt: str,
+        model: str = "claude-4-sonnet",
+        temperature: float = 0.7,
+        max_tokens: int = 1024,
+        system: Optional[str] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+        **kwargs,
+    ) -> str:
+        self.calls += 1
+        delay = self.latency + self._random.random() * self.jitter
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        
+        seed_text = f"{model}:{prompt[:32]}:"
+        text = (seed_text * (self.response_chars // max(1, len(seed_text)) + 1))[:self.response_chars]
+        if on_delta is not None:
+            for i in range(0, len(text), self.chunk_size):
+                on_delta(text[i:i + self.chunk_size])
+        return text
@@ -0,0 +1,179 @@
+"""Benchmark the workflow executor against a mock Claude backend.
+
+Usage:
+    python -m benchmarks.run [--quick] [--output results.json] [--scenario NAME ...]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from app.services.encoding import sse_event
+from app.services.execution_plan import compile_plan
+from app.services.workflow_executor import WorkflowExecutor
+from benchmarks.graphs import SCENARIOS
+from benchmarks.mock_claude import MockClaudeService
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_executor(plan, claude: MockClaudeService, bounded: bool = False) -> WorkflowExecutor:
+    executor = WorkflowExecutor(
+        plan=plan,
+        max_concurrency=64,
+        include_inputs=not bounded,
+        max_payload_chars=1024 if bounded else None,
+        release_outputs=bounded,
+    )
+    executor.claude = claude
+    return executor
+
+
+async def run_scenario(
+    build: Callable[[], tuple[list, list]],
+    executions: int,
+    concurrency: int,
+    latency: float,
+    jitter: float,
+    bounded: bool = False,
+) -> dict[str, Any]:
+    nodes, edges = build()
+    plan = compile_plan(nodes, edges)
+    node_count = len(nodes)
+    
+    # Throughput and per-execution latency with simulated LLM latency.
+    claude = MockClaudeService(latency=latency, jitter=jitter)
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    
+    async def one(index: int) -> None:
+        async with slots:
+            start = time.perf_counter()
+            # Distinct inputs, so no execution joins another's LLM calls.
+            await make_executor(plan, claude, bounded).execute(f"benchmark input {index}")
+            latencies.append(time.perf_counter() - start)
+    
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(executions)))
+    wall = time.perf_counter() - wall_start
+    
+    # Scheduler overhead: zero-latency backend, so the time is all executor.
+    instant = MockClaudeService()
+    overhead_runs = max(3, executions // 10)
+    start = time.perf_counter()
+    for _ in range(overhead_runs):
+        await make_executor(plan, instant, bounded).execute("benchmark input")
+    overhead = (time.perf_counter() - start) / overhead_runs / node_count
+    
+    # SSE serialization cost over one execution's events.
+    executor = make_executor(plan, instant, bounded)
+    events = [e async for e in executor.execute_stream("benchmark input", include_deltas=True)]
+    rounds = 5
+    start = time.perf_counter()
+    encoded_bytes = 0
+    for _ in range(rounds):
+        for event in events:
+            encoded_bytes += len(sse_event(event))
+    sse_time = (time.perf_counter() - start) / (rounds * len(events))
+    
+    # Peak memory allocated during a single execution.
+    tracemalloc.start()
+    await make_executor(plan, instant, bounded).execute("benchmark input")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        "nodes": node_count,
+        "edges": len(edges),
+        "executions": executions,
+        "concurrency": concurrency,
+        "llm_latency_ms": latency * 1000,
+        "llm_jitter_ms": jitter * 1000,
+        "throughput_per_s": executions / wall,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000,
+        "scheduler_overhead_us_per_node": overhead * 1e6,
+        "sse_events": len(events),
+        "sse_encode_us_per_event": sse_time * 1e6,
+        "sse_bytes_per_execution": encoded_bytes // rounds,
+        "peak_memory_kb_per_execution": peak / 1024,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--executions", type=int, default=200, help="executions per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent executions")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mock LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="mock LLM jitter (uniform, added)")
+    parser.add_argument("--bounded", action="store_true", help="run with bounded-memory execution options")
+    parser.add_argument("--quick", action="store_true", help="small run for smoke testing")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+    
+    if args.quick:
+        args.executions, args.concurrency = 10, 5
+        args.latency_ms, args.jitter_ms = 1.0, 1.0
+    
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        executions = args.executions if not name.startswith("dag-") else max(1, args.executions // 20)
+        results[name] = await run_scenario(
+            SCENARIOS[name],
+            executions=executions,
+            concurrency=args.concurrency,
+            latency=args.latency_ms / 1000,
+            jitter=args.jitter_ms / 1000,
+            bounded=args.bounded,
+        )
+        summary = results[name]
+        print(
+            f"{name:>14}: {summary['throughput_per_s']:9.1f} exec/s  "
+            f"p50 {summary['latency_p50_ms']:8.2f} ms  p99 {summary['latency_p99_ms']:8.2f} ms  "
+            f"sched {summary['scheduler_overhead_us_per_node']:7.1f} us/node  "
+            f"sse {summary['sse_encode_us_per_event']:6.1f} us/event  "
+            f"mem {summary['peak_memory_kb_per_execution']:8.1f} KiB"
+        )
+    
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
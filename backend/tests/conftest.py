@@ -0,0 +1,13 @@
+import pytest
+
+from app.main import app
+from app.services.checkpoints import CheckpointStore, get_checkpoint_store
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_store():
+    """Use a fresh in-memory checkpoint store, so no test writes ./agentflow.db."""
+    store = CheckpointStore(":memory:")
+    app.dependency_overrides[get_checkpoint_store] = lambda: store
+    yield store
+    app.dependency_overrides.pop(get_checkpoint_store, None)
@@ -0,0 +1,39 @@
+"""Workflow builders and Claude mocks shared by the test modules."""
+import asyncio
+
+from unittest.mock import AsyncMock
+
+from app.models.workflow import WorkflowNode, WorkflowEdge
+
+
+def make_node(node_id: str, node_type: str, **data) -> WorkflowNode:
+    return WorkflowNode(
+        id=node_id,
+        type=node_type,
+        position={"x": 0, "y": 0},
+        data={"label": node_id, **data},
+    )
+
+
+def make_edge(source: str, target: str, **extra) -> WorkflowEdge:
+    return WorkflowEdge(id=f"{source}-{target}", source=source, target=target, **extra)
+
+
+def llm_workflow(**llm_data) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    """An Input node feeding one LLM node configured with ``llm_data``."""
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("llm-1", "llm", prompt="Summarize {{input}}", **llm_data),
+    ]
+    return nodes, [make_edge("input-1", "llm-1")]
+
+
+def slow_claude(delay: float) -> AsyncMock:
+    """A ClaudeService mock answering ``done: <prompt>`` after ``delay`` seconds."""
+    async def complete(prompt: str, **kwargs) -> str:
+        await asyncio.sleep(delay)
+        return f"done: {prompt}"
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    return mock_instance
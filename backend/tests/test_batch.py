@@ -0,0 +1,178 @@
+"""Tests for batch execution."""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.workflow import BatchItemResult, Workflow
+from app.services.batch import BatchRun, BatchStore, get_batch_store, item_hash
+from app.services.execution_plan import compile_plan
+from app.services.workflow_store import SQLiteWorkflowStore, get_workflow_store
+
+client = TestClient(app)
+
+
+ECHO_WORKFLOW = {
+    "name": "Echo",
+    "nodes": [
+        {
+            "id": "input-1",
+            "type": "input",
+            "position": {"x": 0, "y": 0},
+            "data": {"label": "Input", "inputType": "text"}
+        },
+        {
+            "id": "transform-1",
+            "type": "transform",
+            "position": {"x": 200, "y": 0},
+            "data": {
+                "label": "Format",
+                "transformType": "format-text",
+                "config": {"template": "Hello {{name}}"}
+            }
+        },
+        {
+            "id": "output-1",
+            "type": "output",
+            "position": {"x": 400, "y": 0},
+            "data": {"label": "Output", "outputType": "display"}
+        }
+    ],
+    "edges": [
+        {"id": "e1", "source": "input-1", "target": "transform-1"},
+        {"id": "e2", "source": "transform-1", "target": "output-1"}
+    ]
+}
+
+
+@pytest.fixture(autouse=True)
+def stores():
+    """Use fresh in-memory stores for each test."""
+    workflow_store = SQLiteWorkflowStore(":memory:")
+    batch_store = BatchStore(":memory:")
+    app.dependency_overrides[get_workflow_store] = lambda: workflow_store
+    app.dependency_overrides[get_batch_store] = lambda: batch_store
+    yield workflow_store, batch_store
+    app.dependency_overrides.pop(get_workflow_store, None)
+    app.dependency_overrides.pop(get_batch_store, None)
+
+
+def create_workflow() -> str:
+    return client.post("/api/v1/workflows/", json=ECHO_WORKFLOW).json()["id"]
+
+
+def parse_ndjson(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def test_batch_streams_one_result_per_input():
+    """Test that every JSONL input produces one NDJSON result line."""
+    workflow_id = create_workflow()
+    body = "\n".join(json.dumps({"name": f"user{i}"}) for i in range(20))
+    
+    response = client.post(f"/api/v1/batch/workflows/{workflow_id}", content=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    lines = parse_ndjson(response.text)
+    assert sorted(line["index"] for line in lines) == list(range(20))
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[7]["finalOutput"] == "Hello user7"
+    assert all(line["success"] for line in lines)
+    
+    progress = client.get(f"/api/v1/batch/{response.headers['x-batch-id']}").json()
+    assert progress["completed"] == 20
+    assert progress["failed"] == 0
+
+
+def test_batch_accepts_csv():
+    """Test that CSV bodies are read with their header row."""
+    workflow_id = create_workflow()
+    body = "name,age\nada,36\ngrace,45\n"
+    
+    response = client.post(
+        f"/api/v1/batch/workflows/{workflow_id}",
+        content=body,
+        headers={"content-type": "text/csv"},
+    )
+    outputs = sorted(line["finalOutput"] for line in parse_ndjson(response.text))
+    assert outputs == ["Hello ada", "Hello grace"]
+
+
+def test_batch_csv_fields_may_span_lines():
+    """Test that a quoted CSV field keeps its newlines and quotes, even split across chunks."""
+    workflow_id = create_workflow()
+    body = 'name,age\r\n"ada\nlovelace",36\r\n"grace ""amazing""\n\nhopper",45\r\n'
+    
+    response = client.post(
+        f"/api/v1/batch/workflows/{workflow_id}",
+        content=(body[i:i + 5].encode() for i in range(0, len(body), 5)),
+        headers={"content-type": "text/csv"},
+    )
+    outputs = sorted(line["finalOutput"] for line in parse_ndjson(response.text))
+    assert outputs == ["Hello ada\nlovelace", 'Hello grace "amazing"\n\nhopper']
+
+
+def test_batch_resumes_completed_items(stores):
+    """Test that items already recorded for a batch id are replayed, not rerun."""
+    _, batch_store = stores
+    workflow_id = create_workflow()
+    batch_store.start("batch-1", workflow_id)
+    for index, name in enumerate(["a", "b"]):
+        done = BatchItemResult(index=index, success=True, finalOutput="from earlier run", totalDuration=5)
+        batch_store.record("batch-1", done, done.model_dump_json(), item_hash({"name": name}))
+    
+    # The input at index 1 changed since the first run, so only index 0 is replayed.
+    body = "\n".join(json.dumps({"name": name}) for name in ["a", "c", "d"])
+    response = client.post(f"/api/v1/batch/workflows/{workflow_id}?batchId=batch-1", content=body)
+    
+    by_index = {line["index"]: line for line in parse_ndjson(response.text)}
+    assert by_index[0]["finalOutput"] == "from earlier run"
+    assert by_index[1]["finalOutput"] == "Hello c"
+    assert by_index[2]["finalOutput"] == "Hello d"
+    assert batch_store.progress("batch-1")["completed"] == 3
+
+
+def test_batch_reports_invalid_json_at_the_end():
+    """Test that a malformed line ends the stream with an error after the items before it."""
+    workflow_id = create_workflow()
+    response = client.post(f"/api/v1/batch/workflows/{workflow_id}", content='{"name": "a"}\n{oops\n{"name": "b"}')
+    assert response.status_code == 200
+    
+    lines = parse_ndjson(response.text)
+    assert lines[0]["finalOutput"] == "Hello a"
+    assert lines[-1]["error"].startswith("Invalid JSON on line 2")
+    assert len(lines) == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_reads_input_only_as_fast_as_results_are_taken(monkeypatch):
+    """Test that a reader that stops taking results stops the input being read."""
+    monkeypatch.setattr("app.services.batch.BATCH_MAX_PENDING", 2)
+    workflow = Workflow(**ECHO_WORKFLOW)
+    plan = compile_plan(workflow.nodes, workflow.edges)
+    run = BatchRun("b1", plan, BatchStore(":memory:"))
+    read = 0
+    
+    async def items():
+        nonlocal read
+        for i in range(100):
+            read += 1
+            yield {"name": f"user{i}"}
+    
+    lines = run.stream(items())
+    first = json.loads(await lines.__anext__())
+    await asyncio.sleep(0.05)
+    assert first["success"]
+    assert read <= 6
+    
+    rest = [json.loads(line) async for line in lines]
+    assert sorted(line["index"] for line in [first, *rest]) == list(range(100))
+
+
+def test_batch_unknown_workflow():
+    """Test that a batch for a missing workflow returns 404."""
+    response = client.post("/api/v1/batch/workflows/missing", content="{}")
+    assert response.status_code == 404
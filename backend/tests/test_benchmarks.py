@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.compare import compare
+from benchmarks.graphs import SCENARIOS
+from benchmarks.run import run_scenario
+
+
+@pytest.mark.asyncio
+async def test_benchmark_scenario_reports_metrics():
+    result = await run_scenario(SCENARIOS["diamonds-10"], executions=3, concurrency=2, latency=0, jitter=0)
+    
+    assert result["nodes"] == 32
+    assert result["throughput_per_s"] > 0
+    assert result["latency_p99_ms"] >= result["latency_p50_ms"]
+    assert result["sse_events"] > result["nodes"]
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"chain": {"throughput_per_s": 100.0, "latency_p50_ms": 10.0}}}
+    candidate = {"results": {"chain": {"throughput_per_s": 80.0, "latency_p50_ms": 10.5}}}
+    
+    rows = {row["metric"]: row for row in compare(baseline, candidate, threshold=0.1)}
+    
+    assert rows["throughput_per_s"]["regression"]
+    assert not rows["latency_p50_ms"]["regression"]
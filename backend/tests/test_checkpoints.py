@@ -0,0 +1,185 @@
+"""Tests for execution checkpoints and resume-from-failure."""
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.workflow import ExecutionOptions
+from app.services.checkpoints import (
+    CheckpointStore, node_fingerprints, prepare_execution, restorable_outputs,
+)
+from app.services.claude_service import ClaudeAPIError
+from app.services.execution_plan import compile_plan
+from tests.helpers import make_node, make_edge
+
+
+def chain_workflow(second_prompt: str = "Expand {{input}}"):
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("llm-1", "llm", prompt="Summarize {{input}}"),
+        make_node("llm-2", "llm", prompt=second_prompt),
+        make_node("output-1", "output"),
+    ]
+    edges = [
+        make_edge("input-1", "llm-1"),
+        make_edge("llm-1", "llm-2"),
+        make_edge("llm-2", "output-1"),
+    ]
+    return nodes, edges
+
+
+def flaky_claude() -> AsyncMock:
+    """Fails the first call for the second prompt, succeeds otherwise."""
+    failed = []
+    
+    async def complete(prompt: str, **kwargs) -> str:
+        if prompt.startswith("Expand") and not failed:
+            failed.append(prompt)
+            raise ClaudeAPIError("Claude API error: invalid request")
+        return f"done: {prompt}"
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    return mock_instance
+
+
+def test_changed_node_invalidates_itself_and_downstream():
+    """Checkpoints survive only while a node and everything upstream are unchanged."""
+    nodes, edges = chain_workflow()
+    plan = compile_plan(nodes, edges)
+    saved = {node_id: (plan.node_hashes[node_id], node_id) for node_id in plan.node_ids}
+    assert restorable_outputs(plan, saved) == {node_id: node_id for node_id in plan.node_ids}
+    
+    changed = compile_plan(*chain_workflow(second_prompt="Rewrite {{input}}"))
+    assert restorable_outputs(changed, saved) == {"input-1": "input-1", "llm-1": "llm-1"}
+
+
+def test_fingerprints_follow_inputs():
+    plan = compile_plan(*chain_workflow())
+    base = node_fingerprints(plan, "doc")
+    assert base == node_fingerprints(compile_plan(*chain_workflow()), "doc")
+    
+    edited = node_fingerprints(compile_plan(*chain_workflow(second_prompt="Rewrite {{input}}")), "doc")
+    assert [base[n] == edited[n] for n in plan.node_ids] == [True, True, False, False]
+    
+    other_input = node_fingerprints(plan, "other doc")
+    assert not any(base[n] == other_input[n] for n in plan.node_ids)
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_memoized_rerun_executes_only_changed_nodes(mock_claude_class):
+    """After an edit, nodes upstream of it reuse their stored outputs."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = lambda prompt, **kwargs: f"done: {prompt}"
+    mock_claude_class.return_value = mock_instance
+    store = CheckpointStore(":memory:")
+    options = ExecutionOptions(memoize=True)
+    
+    async def run(plan):
+        executor, initial_input, completed = await prepare_execution(plan, options, "doc", store)
+        return await executor.execute(initial_input, completed=completed, report_completed=True)
+    
+    await run(compile_plan(*chain_workflow()))
+    assert mock_instance.complete.await_count == 2
+    
+    results = await run(compile_plan(*chain_workflow(second_prompt="Rewrite {{input}}")))
+    
+    assert mock_instance.complete.await_count == 3
+    by_id = {r.nodeId: r for r in results}
+    assert by_id["llm-1"].metadata == {"memo": "reused"}
+    assert by_id["output-1"].output == "done: Rewrite done: Summarize doc"
+    
+    await run(compile_plan(*chain_workflow(second_prompt="Rewrite {{input}}")))
+    assert mock_instance.complete.await_count == 3
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_resume_reruns_only_failed_nodes(mock_claude_class):
+    """A resumed execution reuses checkpointed outputs and reruns the rest."""
+    mock_instance = flaky_claude()
+    mock_claude_class.return_value = mock_instance
+    store = CheckpointStore(":memory:")
+    plan = compile_plan(*chain_workflow())
+    
+    executor, initial_input, completed = await prepare_execution(
+        plan, ExecutionOptions(executionId="run-1"), "doc", store
+    )
+    results = await executor.execute(initial_input, completed=completed)
+    assert [r.status for r in results] == ["success", "success", "error", "success"]
+    assert mock_instance.complete.await_count == 2
+    
+    options = ExecutionOptions(executionId="run-1", resume=True)
+    executor, initial_input, completed = await prepare_execution(plan, options, None, store)
+    results = await executor.execute(initial_input, completed=completed, report_completed=True)
+    
+    assert initial_input == "doc"
+    assert set(completed) == {"input-1", "llm-1"}
+    assert all(r.status == "success" for r in results)
+    assert mock_instance.complete.await_count == 3
+    assert executor.results["output-1"] == "done: Expand done: Summarize doc"
+
+
+def test_expired_executions_are_pruned(monkeypatch):
+    """Starting an execution drops executions older than the retention period."""
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.checkpoints.time.time", lambda: clock[0])
+    monkeypatch.setattr("app.services.checkpoints.CHECKPOINT_RETENTION_SECONDS", 10)
+    store = CheckpointStore(":memory:")
+    store.start("old", "a")
+    store.save("old", "node", "hash", "out")
+    
+    clock[0] += 5
+    store.start("recent", "b")
+    clock[0] += 8
+    store.start("new", "c")
+    
+    assert store.load("old") is None
+    assert store._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone() == (0,)
+    assert store.load("recent") == ("b", {})
+
+
+def test_reused_memos_stay_alive(monkeypatch):
+    """The memo TTL counts from the last reuse, so a memo in steady use never expires."""
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.checkpoints.time.time", lambda: clock[0])
+    monkeypatch.setattr("app.services.checkpoints.MEMO_TTL_SECONDS", 10)
+    store = CheckpointStore(":memory:")
+    store.save_memo("used", "a")
+    store.save_memo("idle", "b")
+    
+    clock[0] += 8
+    assert store.memos(["used"]) == {"used": "a"}
+    clock[0] += 8
+    assert store.memos(["used", "idle"]) == {"used": "a"}
+
+
+@pytest.mark.asyncio
+async def test_resume_of_unknown_execution_is_rejected():
+    plan = compile_plan(*chain_workflow())
+    options = ExecutionOptions(executionId="missing", resume=True)
+    with pytest.raises(ValueError):
+        await prepare_execution(plan, options, None, CheckpointStore(":memory:"))
+
+
+@patch('app.services.workflow_executor.ClaudeService')
+def test_execute_endpoint_resumes_by_execution_id(mock_claude_class):
+    """The API reports restored nodes when an execution is resumed."""
+    mock_claude_class.return_value = flaky_claude()
+    nodes, edges = chain_workflow()
+    body = {
+        "nodes": [n.model_dump() for n in nodes],
+        "edges": [e.model_dump() for e in edges],
+        "input": "doc",
+        "executionId": "api-run",
+    }
+    client = TestClient(app)
+    first = client.post("/api/v1/execute/", json=body).json()
+    second = client.post("/api/v1/execute/", json={**body, "input": None, "resume": True}).json()
+    
+    assert first["success"] is False
+    assert second["success"] is True
+    assert second["metadata"]["executionId"] == "api-run"
+    assert second["metadata"]["restored"] == 2
+    assert second["finalOutput"] == "done: Expand done: Summarize doc"
@@ -0,0 +1,82 @@
+"""Tests for the Claude service."""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services import claude_service
+from app.services.claude_service import (
+    ClaudeAPIError, ClaudeService, get_shared_client, close_shared_client,
+)
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    yield
+    claude_service._shared_client = None
+    claude_service._shared_loop = None
+
+
+@pytest.mark.asyncio
+async def test_complete_without_api_key(monkeypatch):
+    """Without an API key the call fails with a non-retryable error."""
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    with pytest.raises(ClaudeAPIError, match="not configured") as info:
+        await ClaudeService().complete("hello")
+    assert info.value.retryable is False
+
+
+@pytest.mark.asyncio
+async def test_services_share_one_client(api_key):
+    """Every ClaudeService in the process uses the same pooled client."""
+    first = ClaudeService().client
+    second = ClaudeService().client
+    assert first is not None
+    assert first is second
+    assert first is get_shared_client()
+    
+    await close_shared_client()
+    assert claude_service._shared_client is None
+
+
+@pytest.mark.asyncio
+async def test_complete_awaits_async_client(api_key):
+    """complete() awaits the async client instead of blocking the event loop."""
+    message = MagicMock()
+    message.content = [MagicMock(text="Hello there")]
+    client = MagicMock()
+    client.messages.create = AsyncMock(return_value=message)
+    claude_service._shared_client = client
+    claude_service._shared_loop = asyncio.get_running_loop()
+    
+    result = await ClaudeService().complete("hi", model="claude-4-haiku")
+    
+    assert result == "Hello there"
+    kwargs = client.messages.create.await_args.kwargs
+    assert kwargs["model"] == claude_service.MODEL_MAP["claude-4-haiku"]
+
+
+@pytest.mark.asyncio
+async def test_context_is_marked_for_prompt_caching(api_key):
+    """A shared context goes first in the system blocks with a cache breakpoint."""
+    message = MagicMock()
+    message.content = [MagicMock(text="ok")]
+    message.usage = MagicMock(
+        input_tokens=12, output_tokens=5, cache_read_input_tokens=3000, cache_creation_input_tokens=0,
+    )
+    client = MagicMock()
+    client.messages.create = AsyncMock(return_value=message)
+    claude_service._shared_client = client
+    claude_service._shared_loop = asyncio.get_running_loop()
+    usage = []
+    
+    await ClaudeService().complete("hi", system="Be brief.", context="policy " * 500, on_usage=usage.append)
+    
+    system = client.messages.create.await_args.kwargs["system"]
+    assert system[0] == {"type": "text", "text": "policy " * 500, "cache_control": {"type": "ephemeral"}}
+    assert system[1] == {"type": "text", "text": "Be brief."}
+    assert usage == [{"inputTokens": 12, "cachedInputTokens": 3000, "cacheWriteTokens": 0, "outputTokens": 5}]
+    
+    await ClaudeService().complete("hi", system="Be brief.")
+    assert client.messages.create.await_args.kwargs["system"] == "Be brief."
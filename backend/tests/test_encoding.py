@@ -0,0 +1,82 @@
+"""Tests for response and event encoding."""
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+
+from app.models.workflow import NodeResult
+from app.services.encoding import (
+    COMPRESS_MIN_BYTES, FastJSONResponse, accepts_gzip, coalesce, gzip_stream, sse_event,
+)
+
+
+def test_sse_event_encodes_models_directly():
+    result = NodeResult(nodeId="n", status="success", output={"text": "hi"})
+    event = sse_event(result, event_id=3)
+    assert event.startswith(b"id: 3\ndata: {")
+    assert event.endswith(b"\n\n")
+    payload = json.loads(event.split(b"data: ", 1)[1])
+    assert payload == result.model_dump()
+    assert sse_event('{"type":"complete"}') == b'data: {"type":"complete"}\n\n'
+
+
+def test_accept_encoding_parsing():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.8")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("br")
+    assert not accepts_gzip(None)
+
+
+@pytest.mark.asyncio
+async def test_coalesce_joins_events_that_are_ready_together():
+    async def events():
+        for i in range(3):
+            yield b"a%d" % i
+        await asyncio.sleep(0.01)
+        yield b"b"
+    
+    writes = [chunk async for chunk in coalesce(events())]
+    assert writes == [b"a0a1a2", b"b"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_closes_source_when_abandoned():
+    closed = asyncio.Event()
+    
+    async def events():
+        try:
+            while True:
+                yield b"x"
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+    
+    stream = coalesce(events())
+    await stream.__anext__()
+    await stream.aclose()
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_gzip_stream_flushes_each_chunk():
+    async def chunks():
+        yield b"data: one\n\n"
+        yield b"data: two\n\n"
+    
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoded = [decompressor.decompress(part) async for part in gzip_stream(chunks())]
+    assert decoded[:2] == [b"data: one\n\n", b"data: two\n\n"]
+
+
+def test_large_json_responses_are_gzipped_when_accepted():
+    small = FastJSONResponse({"a": 1}, accept_encoding="gzip")
+    assert "content-encoding" not in small.headers
+    
+    content = {"text": "x" * COMPRESS_MIN_BYTES}
+    large = FastJSONResponse(content, accept_encoding="gzip")
+    assert large.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(large.body)) == content
+    assert FastJSONResponse(content).body == json.dumps(content, separators=(",", ":")).encode()
@@ -1,8 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
+import json
+import time
 from unittest.mock import patch, AsyncMock
 
 from app.main import app
+from tests.helpers import slow_claude
 
 client = TestClient(app)
 
@@ -59,6 +62,33 @@ def test_validate_workflow_missing_input():
     assert any("Input node" in error for error in data["errors"])
 
 
+@pytest.mark.parametrize("condition, error", [
+    (r"'{{input}}\x' == 'a'", "Invalid string"),
+    ("not " * 50000 + "input", "nested too deeply"),
+])
+def test_uncompilable_condition_is_reported_not_raised(condition, error):
+    """Conditions that cannot even be parsed are validation errors, not server errors."""
+    request = {
+        "nodes": [
+            {"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}},
+            {"id": "router-1", "type": "router", "position": {"x": 0, "y": 0},
+             "data": {"label": "Route", "condition": condition}},
+        ],
+        "edges": [{"id": "e1", "source": "input-1", "target": "router-1"}],
+        "input": "x",
+    }
+    
+    response = client.post("/api/v1/execute/validate", json=request)
+    assert response.status_code == 200
+    assert response.json()["valid"] is False
+    
+    assert error in response.json()["errors"][0]
+    
+    # At run time an invalid condition takes the false branch, as before.
+    response = client.post("/api/v1/execute/", json=request)
+    assert response.json()["results"][-1]["output"]["branch"] == "false"
+
+
 def test_validate_workflow_missing_prompt():
     """Test validating a workflow with LLM missing prompt."""
     request = {
@@ -185,6 +215,55 @@ def test_execute_with_llm(mock_claude_class):
     assert len(data["results"]) == 3
 
 
+@patch('app.services.workflow_executor.ClaudeService')
+def test_execute_stream_sends_deltas(mock_claude_class):
+    """Test that the SSE endpoint streams LLM deltas before the node result."""
+    async def complete(prompt, on_delta=None, **kwargs):
+        for chunk in ["Hello", " World"]:
+            on_delta(chunk)
+        return "Hello World"
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    mock_claude_class.return_value = mock_instance
+    
+    request = {
+        "nodes": [
+            {
+                "id": "input-1",
+                "type": "input",
+                "position": {"x": 0, "y": 0},
+                "data": {"label": "Input", "inputType": "text"}
+            },
+            {
+                "id": "llm-1",
+                "type": "llm",
+                "position": {"x": 200, "y": 0},
+                "data": {"label": "LLM", "model": "claude-4-sonnet", "prompt": "{{input}}"}
+            }
+        ],
+        "edges": [
+            {"id": "e1", "source": "input-1", "target": "llm-1"}
+        ],
+        "input": "hi"
+    }
+    
+    response = client.post("/api/v1/execute/stream", json=request)
+    assert response.status_code == 200
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    deltas = [e for e in events if e.get("type") == "delta"]
+    assert [d["delta"] for d in deltas] == ["Hello", " World"]
+    assert all(d["nodeId"] == "llm-1" for d in deltas)
+    llm_result = next(e for e in events if e.get("nodeId") == "llm-1" and "status" in e)
+    assert events.index(llm_result) > events.index(deltas[-1])
+    assert llm_result["output"] == "Hello World"
+    assert events[-1]["type"] == "complete"
+
+
 def test_execute_with_calculator():
     """Test executing a workflow with calculator tool."""
     request = {
@@ -280,3 +359,92 @@ def test_execute_returns_duration():
     data = response.json()
     assert "totalDuration" in data
     assert data["totalDuration"] >= 0
+
+
+def cyclic_request() -> dict:
+    node = lambda node_id, node_type: {
+        "id": node_id, "type": node_type, "position": {"x": 0, "y": 0}, "data": {"label": node_id},
+    }
+    return {
+        "nodes": [node("input-1", "input"), node("a", "output"), node("b", "output")],
+        "edges": [
+            {"id": "e1", "source": "input-1", "target": "a"},
+            {"id": "e2", "source": "a", "target": "b"},
+            {"id": "e3", "source": "b", "target": "a"},
+        ],
+        "input": "test",
+    }
+
+
+def test_validate_workflow_reports_cycle():
+    """Cycles are reported with the nodes that form them."""
+    response = client.post("/api/v1/execute/validate", json=cyclic_request())
+    data = response.json()
+    assert data["valid"] == False
+    assert data["cycles"] == [["a", "b"]]
+
+
+def test_execute_rejects_cyclic_workflow():
+    """A cyclic workflow fails before any node runs."""
+    response = client.post("/api/v1/execute/", json=cyclic_request())
+    data = response.json()
+    assert data["success"] == False
+    assert "Cycle detected" in data["results"][0]["error"]
+
+
+def test_validate_workflow_rejects_unsafe_router_condition():
+    """Router conditions are checked against the expression sandbox."""
+    request = {
+        "nodes": [
+            {"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}},
+            {"id": "router-1", "type": "router", "position": {"x": 0, "y": 0},
+             "data": {"label": "Route", "condition": "__import__('os').system('true')"}},
+        ],
+        "edges": [{"id": "e1", "source": "input-1", "target": "router-1"}],
+        "input": "test",
+    }
+    
+    data = client.post("/api/v1/execute/validate", json=request).json()
+    assert data["valid"] == False
+    assert any("invalid condition" in error for error in data["errors"])
+
+
+def test_execute_with_payload_previews():
+    """Large payloads are previewed in results while finalOutput stays complete."""
+    request = {
+        "nodes": [
+            {"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}},
+            {"id": "output-1", "type": "output", "position": {"x": 0, "y": 0}, "data": {"label": "Output"}},
+        ],
+        "edges": [{"id": "e1", "source": "input-1", "target": "output-1"}],
+        "input": "y" * 100,
+        "maxPayloadChars": 10,
+        "includeInputs": False,
+        "releaseOutputs": True,
+    }
+    
+    data = client.post("/api/v1/execute/", json=request).json()
+    assert data["finalOutput"] == "y" * 100
+    assert data["results"][1]["output"]["preview"] == "y" * 10
+    assert data["results"][1]["input"] is None
+
+
+@patch('app.services.workflow_executor.ClaudeService')
+def test_llm_fan_out_runs_concurrently_by_default(mock_claude_class):
+    """With no rate limits configured, parallel LLM nodes are not spaced out."""
+    mock_claude_class.return_value = slow_claude(0.1)
+    nodes = [{"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}}]
+    edges = []
+    for i in range(10):
+        nodes.append({
+            "id": f"llm-{i}", "type": "llm", "position": {"x": 0, "y": 0},
+            "data": {"label": f"LLM {i}", "prompt": f"Part {i} of {{{{input}}}}"},
+        })
+        edges.append({"id": f"e{i}", "source": "input-1", "target": f"llm-{i}"})
+    
+    start = time.perf_counter()
+    response = client.post("/api/v1/execute/", json={"nodes": nodes, "edges": edges, "input": "doc"})
+    elapsed = time.perf_counter() - start
+    
+    assert response.json()["success"] is True
+    assert elapsed < 0.6
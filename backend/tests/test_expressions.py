@@ -0,0 +1,98 @@
+"""Tests for the sandboxed expression evaluator."""
+import pytest
+
+from app.services.expressions import ExpressionError, compile_arithmetic, compile_condition
+
+
+@pytest.mark.parametrize("source, value, expected", [
+    ("'urgent' in input.lower()", "URGENT: fix", True),
+    ("len(input) > 3 and input.startswith('a')", "abcd", True),
+    ("input['score'] >= 0.5", {"score": 0.4}, False),
+    ("input.get('tags', [])[0] == 'x'", {"tags": ["x"]}, True),
+    ("true", None, True),
+])
+def test_conditions_evaluate_against_input(source, value, expected):
+    assert compile_condition(source).evaluate({"input": value}) is expected
+
+
+def test_placeholders_are_bound_not_spliced():
+    condition = compile_condition("{{score}} > 5 and '{{label}}' == 'hot {{score}}'")
+    
+    assert condition.evaluate({"input": {"score": "7", "label": "hot 7"}}) is True
+    assert condition.evaluate({"input": {"score": "3", "label": "hot 3"}}) is False
+
+
+def test_same_source_compiles_once():
+    assert compile_condition("input == 1") is compile_condition("input == 1")
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os')",
+    "input.__class__",
+    "().__class__.__bases__",
+    "open('x')",
+    "[c for c in input]",
+    "lambda: 1",
+    "input.lower",
+    "_pow(2, 2)",
+])
+def test_unsafe_conditions_are_rejected(source):
+    with pytest.raises(ExpressionError):
+        compile_condition(source)
+
+
+def test_arithmetic_only_allows_numbers():
+    assert compile_arithmetic("2 * (3 + 4) / 7").evaluate() == 2
+    for source in ("'a' * 3", "input", "len(1)", "true"):
+        with pytest.raises(ExpressionError):
+            compile_arithmetic(source)
+
+
+def test_resource_limits():
+    with pytest.raises(ExpressionError, match="Exponent"):
+        compile_arithmetic("9 ** 9 ** 9").evaluate()
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_condition("'a' * 10000000").evaluate({})
+
+
+def test_chained_growth_is_bounded():
+    """Size limits hold for the result, not just for each operand."""
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_arithmetic("((10 ** 1000) ** 1000) ** 100").evaluate()
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_arithmetic("(10 ** 1000) * (10 ** 1000) * (10 ** 1000) * (10 ** 1000)").evaluate()
+    assert compile_arithmetic("2 ** 1000").evaluate() == 2 ** 1000
+    
+    chain = "{{input}}" + ".replace('a', 'aaaaaaaaaa')" * 8
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_condition(f"len({chain}) > 0").evaluate({"input": "a"})
+    assert compile_condition("{{input}}.replace('a', 'b') == 'bbc'").evaluate({"input": "abc"})
+
+
+def test_rounding_and_printing_are_bounded():
+    """round cannot be asked for huge powers of ten, nor str for aliased nested lists."""
+    with pytest.raises(ExpressionError, match="digits"):
+        compile_condition("round(5, -30000000) == 0").evaluate()
+    assert compile_condition("round(1234, -2) == 1200").evaluate()
+    assert compile_condition("round(2.5) == 2").evaluate()
+    
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_condition("len(str([[[0] * 1000] * 1000] * 10)) > 0").evaluate()
+    big = "[0] * 50000"
+    with pytest.raises(ExpressionError, match="too large"):
+        compile_condition(f"len(str([{big}, {big}, {big}])) > 0").evaluate()
+    assert compile_condition("str([1, 2]) == '[1, 2]'").evaluate()
+    assert compile_condition("str() == ''").evaluate()
+
+
+@pytest.mark.parametrize("source", [
+    r"'{{input}}\x' == 'a'",
+    "'-' * 0 == " + "-" * 100000 + "1",
+    "not " * 50000 + "input",
+    "input == '\0'",
+    "(" * 300 + "1" + ")" * 300,
+])
+def test_malformed_and_deep_expressions_are_expression_errors(source):
+    """Every way an expression can fail to compile surfaces as ExpressionError."""
+    with pytest.raises(ExpressionError):
+        compile_condition(source)
@@ -0,0 +1,118 @@
+"""Tests for workflow graph validation."""
+import pytest
+
+from app.models.workflow import WorkflowNode, WorkflowEdge
+from app.services.graph_validator import validate_graph
+
+
+def make_node(node_id: str, node_type: str = "output") -> WorkflowNode:
+    return WorkflowNode(id=node_id, type=node_type, position={"x": 0, "y": 0}, data={"label": node_id})
+
+
+def make_edge(source: str, target: str) -> WorkflowEdge:
+    return WorkflowEdge(id=f"{source}->{target}", source=source, target=target)
+
+
+def test_reports_each_cycle_and_self_loop():
+    nodes = [make_node("in", "input")] + [make_node(n) for n in "abcde"]
+    edges = [
+        make_edge("in", "a"),
+        make_edge("a", "b"), make_edge("b", "a"),
+        make_edge("b", "c"), make_edge("c", "d"), make_edge("d", "e"), make_edge("e", "c"),
+        make_edge("e", "e"),
+    ]
+    
+    report = validate_graph(nodes, edges)
+    
+    assert sorted(report.cycles) == [["a", "b"], ["c", "d", "e"]]
+    assert len(report.errors) == 2
+
+
+def test_self_loop_is_a_cycle():
+    report = validate_graph([make_node("in", "input"), make_node("a")], [make_edge("in", "a"), make_edge("a", "a")])
+    
+    assert report.cycles == [["a"]]
+
+
+def test_duplicates_dangling_edges_and_unreachable_nodes():
+    nodes = [make_node("in", "input"), make_node("a"), make_node("a"), make_node("island")]
+    edges = [make_edge("in", "a"), make_edge("a", "ghost")]
+    
+    report = validate_graph(nodes, edges)
+    
+    assert report.duplicate_ids == ["a"]
+    assert report.unreachable == ["island"]
+    assert any("ghost" in error for error in report.errors)
+    assert report.cycles == []
+
+
+def test_deep_chain_does_not_recurse():
+    ids = [f"n{i}" for i in range(20000)]
+    nodes = [make_node(ids[0], "input")] + [make_node(n) for n in ids[1:]]
+    edges = [make_edge(a, b) for a, b in zip(ids, ids[1:])]
+    edges.append(make_edge(ids[-1], ids[0]))
+    
+    report = validate_graph(nodes, edges)
+    
+    assert report.cycles == [ids]
+
+
+def test_node_inside_two_loops_is_rejected():
+    """A node reached from two unrelated loops cannot belong to either body."""
+    from app.services.execution_plan import compile_plan
+    from app.services.graph_validator import WorkflowValidationError
+    
+    nodes = [make_node("in", "input"), make_node("loop-a", "loop"), make_node("loop-b", "loop"), make_node("shared")]
+    edges = [make_edge("in", "loop-a"), make_edge("in", "loop-b"), make_edge("loop-a", "shared"), make_edge("loop-b", "shared")]
+    
+    report = validate_graph(nodes, edges)
+    
+    assert report.loop_conflicts == ["Node 'shared' is inside both loop 'loop-a' and loop 'loop-b'"]
+    assert report.errors == report.loop_conflicts
+    with pytest.raises(WorkflowValidationError):
+        compile_plan(nodes, edges)
+
+
+def nested_loops(depth: int) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    nodes, edges, previous = [make_node("in", "input")], [], "in"
+    for i in range(depth):
+        nodes.append(make_node(f"loop-{i}", "loop"))
+        edges.append(make_edge(previous, f"loop-{i}"))
+        previous = f"loop-{i}"
+    nodes.append(make_node("leaf"))
+    edges.append(make_edge(previous, "leaf"))
+    return nodes, edges
+
+
+def test_loop_nesting_depth_is_capped(monkeypatch):
+    from app.services.execution_plan import compile_plan
+    from app.services.graph_validator import WorkflowValidationError
+    
+    monkeypatch.setattr("app.services.execution_plan.MAX_LOOP_DEPTH", 3)
+    compile_plan(*nested_loops(3))
+    with pytest.raises(WorkflowValidationError, match="nested more than 3 deep"):
+        compile_plan(*nested_loops(4))
+
+
+def test_nested_body_plans_reuse_the_enclosing_hashes():
+    """Body plans carry node hashes over instead of rehashing, with the same result."""
+    from app.services.execution_plan import _node_hashes, compile_plan
+    
+    plan = compile_plan(*nested_loops(3))
+    body = plan.loops["loop-0"].plan
+    inner = body.loops["loop-1"].plan
+    
+    assert body.node_hashes["leaf"] == plan.node_hashes["leaf"] == inner.node_hashes["leaf"]
+    for level in (body, inner):
+        assert dict(level.node_hashes) == _node_hashes(list(level.nodes), list(level.edges), {})
+
+
+def test_loops_sharing_a_node_inside_a_body_are_rejected():
+    from app.services.execution_plan import compile_plan
+    from app.services.graph_validator import WorkflowValidationError
+    
+    nodes = [make_node("in", "input"), make_node("outer", "loop"), make_node("a", "loop"), make_node("b", "loop"), make_node("x")]
+    edges = [make_edge("in", "outer"), make_edge("outer", "a"), make_edge("outer", "b"), make_edge("a", "x"), make_edge("b", "x")]
+    
+    with pytest.raises(WorkflowValidationError, match="inside both loop"):
+        compile_plan(nodes, edges)
@@ -0,0 +1,155 @@
+"""Tests for background execution jobs."""
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.main import app
+from app.models.workflow import ExecuteRequest
+from app.services.jobs import JobQueue, JobStore, get_job_store, stop_job_queue
+
+WORKFLOW = {
+    "nodes": [
+        {"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}},
+        {"id": "transform-1", "type": "transform", "position": {"x": 0, "y": 0},
+         "data": {"label": "Format", "transformType": "format-text", "config": {"template": "Hi {{input}}"}}},
+        {"id": "output-1", "type": "output", "position": {"x": 0, "y": 0}, "data": {"label": "Output"}},
+    ],
+    "edges": [
+        {"id": "e1", "source": "input-1", "target": "transform-1"},
+        {"id": "e2", "source": "transform-1", "target": "output-1"},
+    ],
+    "input": "Ada",
+}
+
+
+@pytest_asyncio.fixture
+async def job_store():
+    store = JobStore(":memory:")
+    app.dependency_overrides[get_job_store] = lambda: store
+    yield store
+    app.dependency_overrides.pop(get_job_store, None)
+    await stop_job_queue()
+
+
+def api_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str) -> dict:
+    for _ in range(100):
+        job = (await client.get(f"/api/v1/jobs/{job_id}")).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def parse_sse(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields.get("id"), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_job_runs_in_background_and_persists_response(job_store):
+    async with api_client() as client:
+        response = await client.post("/api/v1/jobs/", json=WORKFLOW)
+        assert response.status_code == 202
+        job = await wait_for_job(client, response.json()["jobId"])
+    
+    assert job["status"] == "succeeded"
+    assert job["response"]["finalOutput"] == "Hi Ada"
+
+
+@pytest.mark.asyncio
+async def test_job_events_replay_and_resume_from_last_event_id(job_store):
+    async with api_client() as client:
+        job_id = (await client.post("/api/v1/jobs/", json=WORKFLOW)).json()["jobId"]
+        await wait_for_job(client, job_id)
+        
+        full = parse_sse((await client.get(f"/api/v1/jobs/{job_id}/events")).text)
+        resumed = parse_sse((await client.get(
+            f"/api/v1/jobs/{job_id}/events", headers={"Last-Event-ID": "1"},
+        )).text)
+    
+    assert [event.get("nodeId") for _, event in full[:3]] == ["input-1", "transform-1", "output-1"]
+    assert full[-1] == ("3", {"type": "complete", "success": True})
+    assert [event_id for event_id, _ in resumed] == ["2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_is_404(job_store):
+    async with api_client() as client:
+        assert (await client.get("/api/v1/jobs/missing")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_a_lost_worker_are_requeued():
+    """A running job is picked up again once its worker stops renewing the lease."""
+    store = JobStore(":memory:")
+    store.create("job-1", ExecuteRequest(**WORKFLOW))
+    assert store.claim("job-1", worker="crashed")
+    
+    queue = JobQueue(store, workers=1, lease=0.05)
+    queue.start()
+    try:
+        assert store.get("job-1")["status"] == "running"
+        events = await asyncio.wait_for(_collect(queue.subscribe("job-1")), timeout=2)
+        events = [event for _, event in events]
+    finally:
+        await queue.stop()
+    
+    assert store.get("job-1")["status"] == "succeeded"
+    assert json.loads(events[-1])["type"] == "complete"
+
+
+@pytest.mark.asyncio
+async def test_events_of_a_job_in_another_process_are_polled(monkeypatch):
+    """A subscriber follows a job that another worker runs, through the shared store."""
+    monkeypatch.setattr("app.services.jobs.JOB_EVENT_POLL_SECONDS", 0.01)
+    store = JobStore(":memory:")
+    store.create("job-1", ExecuteRequest(**WORKFLOW))
+    assert store.claim("job-1", worker="elsewhere")
+    other = JobQueue(store, workers=1)
+    
+    async def run_elsewhere():
+        await asyncio.sleep(0.05)
+        store.add_event("job-1", 0, '{"nodeId":"input-1","status":"success"}')
+        store.add_event("job-1", 1, json.dumps({"type": "complete", "success": True}))
+    
+    runner = asyncio.create_task(run_elsewhere())
+    events = await asyncio.wait_for(_collect(other.subscribe("job-1")), timeout=1)
+    await runner
+    assert [seq for seq, _ in events] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_a_job_whose_request_cannot_load_fails_and_the_worker_lives_on():
+    """A poison job is marked failed with its error instead of being silently skipped."""
+    store = JobStore(":memory:")
+    store.create("poison", ExecuteRequest(**WORKFLOW))
+    store._conn.execute("UPDATE jobs SET request = '{not json' WHERE job_id = 'poison'")
+    store.create("healthy", ExecuteRequest(**WORKFLOW))
+    
+    queue = JobQueue(store, workers=1)
+    queue.start()
+    try:
+        events = await asyncio.wait_for(_collect(queue.subscribe("poison")), timeout=2)
+        await asyncio.wait_for(_collect(queue.subscribe("healthy")), timeout=2)
+    finally:
+        await queue.stop()
+    
+    poison = store.get("poison")
+    assert poison["status"] == "failed"
+    assert "Invalid JSON" in poison["response"]["results"][-1]["error"]
+    assert json.loads(events[-1][1]) == {"type": "complete", "success": False}
+    assert store.get("healthy")["status"] == "succeeded"
+
+
+async def _collect(stream):
+    return [item async for item in stream]
@@ -0,0 +1,108 @@
+"""Tests for the LLM response cache."""
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.services.claude_service import ClaudeAPIError
+from app.services.llm_cache import LLMCache, make_cache_key
+from app.services.workflow_executor import WorkflowExecutor
+from tests.helpers import llm_workflow
+
+
+def test_cache_key_covers_request_parameters():
+    """Changing any request parameter changes the key."""
+    base = make_cache_key("prompt", "model", 0.0, 1024, None)
+    assert base == make_cache_key("prompt", "model", 0.0, 1024, None)
+    assert base != make_cache_key("prompt!", "model", 0.0, 1024, None)
+    assert base != make_cache_key("prompt", "other", 0.0, 1024, None)
+    assert base != make_cache_key("prompt", "model", 0.5, 1024, None)
+    assert base != make_cache_key("prompt", "model", 0.0, 512, None)
+    assert base != make_cache_key("prompt", "model", 0.0, 1024, "system")
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_evicts_least_recently_used():
+    """The memory tier keeps at most max_entries, dropping the oldest."""
+    cache = LLMCache(max_entries=2, ttl=60)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.set("c", "3")
+    
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert await cache.get("c") == "3"
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl():
+    """Expired entries are treated as misses."""
+    cache = LLMCache(max_entries=10, ttl=-1)
+    await cache.set("a", "1")
+    assert await cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_sqlite_tier_survives_restart(tmp_path):
+    """Entries written to the SQLite tier are visible to a new cache instance."""
+    db_path = str(tmp_path / "cache.db")
+    await LLMCache(db_path=db_path).set("a", "persisted")
+    
+    assert await LLMCache(db_path=db_path).get("a") == "persisted"
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_executor_reuses_cached_response(mock_claude_class):
+    """A repeated run with caching enabled skips the Claude call."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.return_value = "summary"
+    mock_claude_class.return_value = mock_instance
+    cache = LLMCache(max_entries=10, ttl=60)
+    nodes, edges = llm_workflow()
+    
+    first = WorkflowExecutor(nodes, edges, use_cache=True, cache=cache)
+    await first.execute("doc")
+    second = WorkflowExecutor(nodes, edges, use_cache=True, cache=cache)
+    results = await second.execute("doc")
+    
+    assert mock_instance.complete.await_count == 1
+    assert results[-1].output == "summary"
+    assert results[-1].metadata == {"cache": "hit"}
+    assert first.cache_stats == {"hits": 0, "misses": 1}
+    assert second.cache_stats == {"hits": 1, "misses": 0}
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_node_policy_overrides_execution_setting(mock_claude_class):
+    """Per-node cache policies bypass or force the cache."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.return_value = "summary"
+    mock_claude_class.return_value = mock_instance
+    cache = LLMCache(max_entries=10, ttl=60)
+    
+    nodes, edges = llm_workflow(cache="deterministic", temperature=0.7)
+    for _ in range(2):
+        await WorkflowExecutor(nodes, edges, use_cache=True, cache=cache).execute("doc")
+    assert mock_instance.complete.await_count == 2
+    
+    nodes, edges = llm_workflow(cache="always", temperature=0.7)
+    for _ in range(2):
+        await WorkflowExecutor(nodes, edges, cache=cache).execute("doc")
+    assert mock_instance.complete.await_count == 3
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_error_responses_are_not_cached(mock_claude_class):
+    """Failed requests are never stored in the cache."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = ClaudeAPIError("Claude API error: invalid request")
+    mock_claude_class.return_value = mock_instance
+    cache = LLMCache(max_entries=10, ttl=60)
+    nodes, edges = llm_workflow()
+    
+    await WorkflowExecutor(nodes, edges, use_cache=True, cache=cache).execute("doc")
+    
+    assert len(cache) == 0
@@ -0,0 +1,126 @@
+"""Tests for Message Batches mode, against a local stand-in for the batch API."""
+import asyncio
+import json
+
+import anthropic
+import httpx
+import pytest
+
+from app.services.batch import BatchRun, BatchStore
+from app.services.claude_service import ClaudeAPIError
+from app.services.execution_plan import compile_plan
+from app.services.message_batches import AnthropicBatchAPI, BatchOutcome, MessageBatchAPI, MessageBatcher
+from app.services.workflow_executor import WorkflowExecutor
+from tests.helpers import make_edge, make_node
+
+
+class LocalBatchAPI(MessageBatchAPI):
+    """Answers each request with its prompt upper-cased, after one in-progress poll."""
+    
+    def __init__(self):
+        self.submissions: list[list[dict]] = []
+        self.polls: dict[str, int] = {}
+    
+    async def create(self, requests):
+        self.submissions.append(requests)
+        return f"batch-{len(self.submissions) - 1}"
+    
+    async def ended(self, batch_id):
+        self.polls[batch_id] = self.polls.get(batch_id, 0) + 1
+        return self.polls[batch_id] > 1
+    
+    async def results(self, batch_id):
+        for request in self.submissions[int(batch_id.split("-")[1])]:
+            prompt = request["params"]["messages"][0]["content"]
+            if "fail" in prompt:
+                yield request["custom_id"], BatchOutcome(error=ClaudeAPIError("Claude API error: invalid"))
+            else:
+                yield request["custom_id"], BatchOutcome(text=prompt.upper())
+
+
+def chain_plan():
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("llm-1", "llm", prompt="draft {{input}}"),
+        make_node("llm-2", "llm", prompt="edit {{input}}"),
+    ]
+    return compile_plan(nodes, [make_edge("input-1", "llm-1"), make_edge("llm-1", "llm-2")])
+
+
+@pytest.mark.asyncio
+async def test_each_level_across_a_batch_run_is_one_submission():
+    """The LLM nodes all items reach together go to the provider as one batch."""
+    api = LocalBatchAPI()
+    batcher = MessageBatcher(api, window=0.05, poll_interval=0.01)
+    run = BatchRun("b1", chain_plan(), BatchStore(":memory:"), message_batcher=batcher)
+    
+    async def items():
+        for item in ["a", "b", "c", "d"]:
+            yield item
+    
+    lines = [json.loads(line) async for line in run.stream(items())]
+    
+    assert [len(requests) for requests in api.submissions] == [4, 4]
+    outputs = {line["index"]: line["finalOutput"] for line in lines}
+    assert outputs == {0: "EDIT DRAFT A", 1: "EDIT DRAFT B", 2: "EDIT DRAFT C", 3: "EDIT DRAFT D"}
+
+
+@pytest.mark.asyncio
+async def test_batch_size_cap_submits_early_and_errors_reach_the_node():
+    """A full batch is sent without waiting out the window; failed requests fail their node."""
+    api = LocalBatchAPI()
+    batcher = MessageBatcher(api, window=60, max_requests=2, poll_interval=0.01)
+    nodes = [make_node("input-1", "input"), make_node("llm-1", "llm", prompt="say {{input}}")]
+    plan = compile_plan(nodes, [make_edge("input-1", "llm-1")])
+    
+    ok, failed = await asyncio.wait_for(asyncio.gather(
+        WorkflowExecutor(plan=plan, message_batcher=batcher).execute("hi"),
+        WorkflowExecutor(plan=plan, message_batcher=batcher).execute("fail"),
+    ), timeout=2)
+    
+    assert len(api.submissions) == 1
+    assert ok[1].output == "SAY HI"
+    assert failed[1].status == "error"
+    assert failed[1].error == "Claude API error: invalid"
+
+
+@pytest.mark.asyncio
+async def test_anthropic_batch_api_speaks_the_batches_endpoints(monkeypatch):
+    """The provider API works with the pinned SDK, over its raw request methods."""
+    seen = []
+    results = [
+        {"custom_id": "req-0", "result": {"type": "succeeded", "message": {
+            "content": [{"type": "text", "text": "hi"}], "usage": {"input_tokens": 3, "output_tokens": 1},
+        }}},
+        {"custom_id": "req-1", "result": {"type": "errored", "error": {
+            "type": "error", "error": {"type": "overloaded_error", "message": "busy"},
+        }}},
+        {"custom_id": "req-2", "result": {"type": "expired"}},
+    ]
+    
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.method, request.url.path))
+        if request.method == "POST":
+            assert json.loads(request.content)["requests"][0]["custom_id"] == "req-0"
+            return httpx.Response(200, json={"id": "msgbatch_1", "processing_status": "in_progress"})
+        if request.url.path.endswith("/results"):
+            return httpx.Response(200, text="\n".join(json.dumps(entry) for entry in results) + "\n")
+        return httpx.Response(200, json={"id": "msgbatch_1", "processing_status": "ended"})
+    
+    client = anthropic.AsyncAnthropic(api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr("app.services.message_batches.get_shared_client", lambda: client)
+    api = AnthropicBatchAPI()
+    
+    batch_id = await api.create([{"custom_id": "req-0", "params": {"model": "m", "max_tokens": 1, "messages": []}}])
+    assert await api.ended(batch_id)
+    outcomes = {custom_id: outcome async for custom_id, outcome in api.results(batch_id)}
+    
+    assert seen == [
+        ("POST", "/v1/messages/batches"),
+        ("GET", "/v1/messages/batches/msgbatch_1"),
+        ("GET", "/v1/messages/batches/msgbatch_1/results"),
+    ]
+    assert outcomes["req-0"].text == "hi"
+    assert outcomes["req-0"].usage["inputTokens"] == 3
+    assert outcomes["req-1"].error.retryable and "busy" in str(outcomes["req-1"].error)
+    assert outcomes["req-2"].error.retryable
@@ -0,0 +1,50 @@
+"""Tests for the Prometheus metrics endpoint."""
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_execution_records_node_and_execution_metrics():
+    before_runs = sample("agentflow_executions_total", mode="sync", status="success")
+    before_nodes = sample(
+        "agentflow_node_duration_seconds_count",
+        node_type="tool", model="", tool="calculator", status="success",
+    )
+    request = {
+        "nodes": [
+            {"id": "input-1", "type": "input", "position": {"x": 0, "y": 0}, "data": {"label": "Input"}},
+            {"id": "calc", "type": "tool", "position": {"x": 0, "y": 0},
+             "data": {"label": "Calc", "toolType": "calculator"}},
+        ],
+        "edges": [{"id": "e1", "source": "input-1", "target": "calc"}],
+        "input": "6 * 7",
+    }
+    
+    data = client.post("/api/v1/execute/", json=request).json()
+    
+    assert data["finalOutput"] == 42
+    assert isinstance(data["totalDuration"], float)
+    assert sample("agentflow_executions_total", mode="sync", status="success") == before_runs + 1
+    assert sample(
+        "agentflow_node_duration_seconds_count",
+        node_type="tool", model="", tool="calculator", status="success",
+    ) == before_nodes + 1
+    assert sample(
+        "agentflow_node_phase_seconds_count",
+        node_type="tool", model="", tool="calculator", phase="queue_wait",
+    ) > 0
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE agentflow_node_duration_seconds histogram" in response.text
@@ -0,0 +1,92 @@
+"""Tests for the shared Claude rate limiter."""
+import asyncio
+import time
+
+import pytest
+
+from app.services.claude_service import MODEL_MAP
+from app.services.rate_limiter import ModelQueue, RateLimiter, estimate_tokens
+
+
+async def drain(queue: ModelQueue) -> None:
+    while await queue.state.take_tokens(queue._takes(0)) == 0:
+        pass
+
+
+async def grant_order(queue: ModelQueue, requests: list[tuple[str, str, str]]) -> list[str]:
+    """Queue ``(name, priority, flow)`` requests behind an exhausted bucket and record the grant order."""
+    order = []
+    
+    async def request(name: str, priority: str, flow: str) -> None:
+        await queue.acquire(10, priority, flow)
+        order.append(name)
+    
+    tasks = [asyncio.create_task(request(*r)) for r in requests]
+    await asyncio.wait_for(asyncio.gather(*tasks), timeout=2)
+    return order
+
+
+def test_estimate_counts_prompt_and_output_budget():
+    assert estimate_tokens("x" * 400, 100) == 200
+    assert estimate_tokens("x" * 400, 100, system="y" * 40) == 210
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_ahead_of_batch():
+    queue = ModelQueue("model", requests_per_minute=1200, tokens_per_minute=0)
+    await drain(queue)
+    
+    order = await grant_order(queue, [
+        ("batch-1", "batch", "b"),
+        ("batch-2", "batch", "b"),
+        ("stream-1", "interactive", "s"),
+    ])
+    
+    assert order == ["stream-1", "batch-1", "batch-2"]
+
+
+@pytest.mark.asyncio
+async def test_flows_at_one_priority_share_fairly():
+    """A flow that queued many requests does not hold back a later one."""
+    queue = ModelQueue("model", requests_per_minute=1200, tokens_per_minute=0)
+    await drain(queue)
+    
+    order = await grant_order(
+        queue,
+        [(f"a{i}", "normal", "a") for i in range(3)] + [(f"b{i}", "normal", "b") for i in range(2)],
+    )
+    
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_token_budget_limits_throughput():
+    """Requests wait for tokens as well as request slots."""
+    limiter = RateLimiter(requests_per_minute=60000, tokens_per_minute=60000)
+    await limiter.acquire("model", tokens=60000)
+    start = time.monotonic()
+    await limiter.acquire("model", tokens=100)
+    # The budget refills at 1000 tokens per second.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_model_limits_override_defaults():
+    limiter = RateLimiter(50, 40000, {"claude-4-haiku": {"rpm": 500}})
+    haiku = limiter.queue(MODEL_MAP["claude-4-haiku"])
+    assert haiku.requests_per_minute == 500
+    assert haiku.tokens_per_minute == 40000
+    assert limiter.queue(MODEL_MAP["claude-4-sonnet"]).requests_per_minute == 50
+
+
+@pytest.mark.asyncio
+async def test_a_burst_up_to_the_minute_budget_is_not_spaced_out():
+    limiter = RateLimiter(requests_per_minute=60)
+    start = time.monotonic()
+    await asyncio.wait_for(asyncio.gather(*(limiter.acquire("model") for _ in range(10))), timeout=1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_limiter_is_off_unless_configured():
+    assert not RateLimiter(0).configured
+    assert RateLimiter(0, model_limits={"claude-4-haiku": {"rpm": 10}}).configured
+    assert RateLimiter(0, tokens_per_minute=1000).configured
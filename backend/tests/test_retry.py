@@ -0,0 +1,160 @@
+"""Tests for retries, deadlines and hedged requests."""
+import asyncio
+
+import anthropic
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.models.workflow import ExecutionOptions
+from app.services import workflow_executor
+from app.services.claude_service import ClaudeAPIError
+from app.services.execution_plan import compile_plan
+from app.services.retry import RetryPolicy, call_with_retry, hedged
+from app.services.workflow_executor import WorkflowExecutor
+from tests.helpers import llm_workflow, slow_claude
+
+NO_WAIT = RetryPolicy(attempts=3, base_delay=0)
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried_until_success():
+    calls = []
+    
+    async def call():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ClaudeAPIError("overloaded", status_code=529, retryable=True)
+        return "ok"
+    
+    assert await call_with_retry(call, NO_WAIT) == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_and_exhausted_attempts_are_raised():
+    calls = []
+    
+    async def call():
+        calls.append(1)
+        raise ClaudeAPIError("bad request", status_code=400)
+    
+    with pytest.raises(ClaudeAPIError):
+        await call_with_retry(call, NO_WAIT)
+    assert len(calls) == 1
+    
+    async def overloaded():
+        calls.append(1)
+        raise ClaudeAPIError("overloaded", status_code=529, retryable=True)
+    
+    with pytest.raises(ClaudeAPIError):
+        await call_with_retry(overloaded, NO_WAIT)
+    assert len(calls) == 4
+
+
+def test_status_codes_are_classified():
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    
+    rate_limited = anthropic.RateLimitError(
+        "rate limited",
+        response=httpx.Response(429, headers={"retry-after": "2"}, request=request),
+        body=None,
+    )
+    error = ClaudeAPIError.from_exception(rate_limited)
+    assert error.retryable and error.status_code == 429 and error.retry_after == 2.0
+    
+    invalid = anthropic.BadRequestError("invalid", response=httpx.Response(400, request=request), body=None)
+    assert not ClaudeAPIError.from_exception(invalid).retryable
+    assert ClaudeAPIError.from_exception(anthropic.APIConnectionError(request=request)).retryable
+
+
+@pytest.mark.asyncio
+async def test_hedge_returns_the_faster_request():
+    delays = [1.0, 0.0]
+    
+    async def call():
+        await asyncio.sleep(delays.pop(0))
+        return "answer"
+    
+    result, from_hedge = await asyncio.wait_for(hedged(call, delay=0.01), timeout=0.5)
+    assert result == "answer"
+    assert from_hedge is True
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_hedged_llm_node_times_the_call_once(mock_claude_class, monkeypatch):
+    """The llm phase of a hedged node is the request's duration, not the sum of its copies."""
+    monkeypatch.setattr("app.services.retry.HEDGE_DELAY", 0.1)
+    delays = [0.3, 0.1]
+    
+    async def complete(**kwargs):
+        await asyncio.sleep(delays.pop(0))
+        return "answer"
+    
+    mock_claude_class.return_value = AsyncMock(complete=AsyncMock(side_effect=complete))
+    phases = {}
+    finish = workflow_executor.NodeTimer.finish
+    
+    def record(timer, status):
+        phases.update(timer.phases)
+        return finish(timer, status)
+    
+    monkeypatch.setattr(workflow_executor.NodeTimer, "finish", record)
+    results = await WorkflowExecutor(*llm_workflow(hedge=True)).execute("doc")
+    
+    assert results[-1].metadata["hedge"] == "won"
+    assert 0.18 < phases["llm"] < 0.28
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_llm_node_retries_transient_failures(mock_claude_class, monkeypatch):
+    monkeypatch.setattr(workflow_executor, "DEFAULT_RETRY_POLICY", NO_WAIT)
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = [
+        ClaudeAPIError("overloaded", status_code=529, retryable=True),
+        "summary",
+    ]
+    mock_claude_class.return_value = mock_instance
+    
+    results = await WorkflowExecutor(*llm_workflow()).execute("doc")
+    
+    assert results[-1].status == "success"
+    assert results[-1].output == "summary"
+    assert results[-1].metadata == {"attempts": 2}
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_llm_failure_is_a_node_error(mock_claude_class):
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = ClaudeAPIError("Claude API error: invalid request")
+    mock_claude_class.return_value = mock_instance
+    
+    results = await WorkflowExecutor(*llm_workflow()).execute("doc")
+    
+    assert results[-1].status == "error"
+    assert results[-1].output is None
+    assert "invalid request" in results[-1].error
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_node_and_execution_deadlines(mock_claude_class):
+    """A stalled call fails at the node's timeout or the execution's, whichever is first."""
+    mock_claude_class.return_value = slow_claude(5)
+    
+    results = await asyncio.wait_for(
+        WorkflowExecutor(*llm_workflow(timeout=0.05)).execute("doc"), timeout=1
+    )
+    assert results[-1].status == "error"
+    assert "Deadline exceeded" in results[-1].error
+    
+    plan = compile_plan(*llm_workflow())
+    executor = WorkflowExecutor.from_options(plan, ExecutionOptions(timeout=0.05))
+    results = await asyncio.wait_for(executor.execute("doc"), timeout=1)
+    assert results[-1].status == "error"
+    
+    results = await WorkflowExecutor(plan=plan, deadline=0).execute("doc")
+    assert results[0].error == "Execution deadline exceeded"
@@ -0,0 +1,106 @@
+"""Tests for coalescing identical in-flight calls."""
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+from unittest.mock import patch
+
+from app.services.single_flight import SingleFlight
+from app.services.workflow_executor import WorkflowExecutor
+from tests.helpers import llm_workflow, slow_claude
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call_and_its_error():
+    group = SingleFlight()
+    calls = 0
+    
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+    
+    outcomes = await asyncio.gather(*(group.do("k", call) for _ in range(3)), return_exceptions=True)
+    
+    assert calls == 1
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    assert len(group) == 0
+    
+    async def ok():
+        return "fresh"
+    
+    assert await group.do("k", ok) == ("fresh", False)
+
+
+@pytest.mark.asyncio
+async def test_a_caller_giving_up_does_not_cancel_the_call_for_others():
+    group = SingleFlight()
+    
+    async def call():
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    first = asyncio.create_task(group.do("k", call))
+    second = asyncio.create_task(group.do("k", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    
+    assert await second == ("done", True)
+
+
+CALL_SECONDS = 0.05
+
+
+async def run_twice(options: Optional[dict] = None, **data) -> tuple[list, list]:
+    nodes, edges = llm_workflow(**data)
+    return await asyncio.gather(
+        WorkflowExecutor(nodes, edges, **(options or {})).execute("caching"),
+        WorkflowExecutor(nodes, edges, **(options or {})).execute("caching"),
+    )
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_identical_llm_requests_in_flight_are_sent_once(mock_claude_class):
+    """Two executions asking the same deterministic thing at once share one Claude call."""
+    mock_claude_class.return_value = mock_instance = slow_claude(CALL_SECONDS)
+    
+    first, second = await run_twice(temperature=0)
+    
+    assert mock_instance.complete.await_count == 1
+    assert first[1].output == second[1].output == "done: Summarize caching"
+    assert [bool((r[1].metadata or {}).get("coalesced")) for r in (first, second)] == [False, True]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("options, data, calls", [
+    ({}, {}, 2),  # sampled output: each caller gets its own
+    ({}, {"temperature": 0, "cache": "never"}, 2),
+    ({}, {"temperature": 0, "coalesce": False}, 2),
+    ({"coalesce": False}, {"temperature": 0}, 2),
+    ({}, {"coalesce": True}, 1),
+])
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_coalescing_policy(mock_claude_class, options, data, calls):
+    mock_claude_class.return_value = mock_instance = slow_claude(CALL_SECONDS)
+    await run_twice(options, **data)
+    assert mock_instance.complete.await_count == calls
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_a_caller_with_more_time_outlives_the_call_it_joined(mock_claude_class):
+    """When the joined call hits its own deadline, the follower carries on by itself."""
+    mock_claude_class.return_value = mock_instance = slow_claude(CALL_SECONDS)
+    nodes, edges = llm_workflow(temperature=0)
+    
+    hurried, patient = await asyncio.gather(
+        WorkflowExecutor(nodes, edges, deadline=time.monotonic() + 0.02).execute("x"),
+        WorkflowExecutor(nodes, edges).execute("x"),
+    )
+    
+    assert hurried[1].status == "error"
+    assert patient[1].output == "done: Summarize x"
+    assert mock_instance.complete.await_count == 2
@@ -0,0 +1,58 @@
+"""Tests for the execution state shared between workers."""
+import time
+
+import pytest
+
+from app.services.state import InMemorySharedState, SQLiteSharedState, connect_sqlite, process_singleton
+
+
+@pytest.mark.asyncio
+async def test_takes_are_all_or_nothing():
+    state = InMemorySharedState()
+    takes = [("rpm", 1, 60, 2), ("tpm", 100, 600, 150)]
+    assert await state.take_tokens(takes) == 0
+    # One request slot is left, but not 100 tokens: nothing is taken.
+    wait = await state.take_tokens(takes)
+    assert wait == pytest.approx(5, abs=0.1)
+    assert await state.take_tokens([("rpm", 1, 60, 2)]) == 0
+    assert await state.take_tokens([("rpm", 1, 60, 2)]) > 0
+
+
+@pytest.mark.asyncio
+async def test_sqlite_buckets_are_shared_between_processes(tmp_path):
+    """Two workers on one database draw from the same budget."""
+    path = str(tmp_path / "state.db")
+    first, second = SQLiteSharedState(path), SQLiteSharedState(path)
+    take = [("rpm:model", 1, 60, 3)]
+    
+    granted = [await state.take_tokens(take) == 0 for state in (first, second, first, second)]
+    
+    assert granted == [True, True, True, False]
+
+
+def test_sqlite_state_provides_a_shared_cache_tier(tmp_path):
+    path = str(tmp_path / "state.db")
+    SQLiteSharedState(path).cache_tier.set("key", "cached", time.time() + 60)
+    assert SQLiteSharedState(path).cache_tier.get("key")[0] == "cached"
+    assert InMemorySharedState().cache_tier is None
+
+
+def test_store_connections_share_one_setup(tmp_path):
+    conn = connect_sqlite(str(tmp_path / "store.db"), isolation_level=None)
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert conn.execute("PRAGMA busy_timeout").fetchone() == (5000,)
+    assert conn.isolation_level is None
+
+
+def test_singleton_getter_builds_once():
+    built = []
+    
+    @process_singleton
+    def get_thing() -> object:
+        """The thing."""
+        built.append(object())
+        return built[-1]
+    
+    assert get_thing() is get_thing() is built[0]
+    assert len(built) == 1
+    assert get_thing.__doc__ == "The thing."
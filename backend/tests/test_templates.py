@@ -0,0 +1,50 @@
+"""Tests for compiled prompt templates."""
+import pytest
+
+from app.services.templates import Template, TemplateError, compile_template
+
+
+def test_renders_input_and_dict_keys():
+    template = Template("Q: {{input}} / {{a}}")
+    
+    assert template.render("hi") == "Q: hi / {{a}}"
+    assert Template("{{a}} and {{b}}").render({"a": "x", "b": 2}) == "x and 2"
+
+
+def test_dotted_paths_walk_dicts_and_lists():
+    data = {"node_a": {"summary": "short", "items": ["first", "second"]}}
+    
+    assert Template("{{node_a.summary}}").render(data) == "short"
+    assert Template("{{ node_a.items.1 }}").render(data) == "second"
+    assert Template("{{input.node_a.items.-1}}").render(data) == "second"
+
+
+def test_keys_containing_dots_win_over_paths():
+    assert Template("{{a.b}}").render({"a.b": "flat", "a": {"b": "nested"}}) == "flat"
+
+
+def test_single_pass_does_not_expand_substituted_values():
+    assert Template("{{a}} {{b}}").render({"a": "{{b}}", "b": "x"}) == "{{b}} x"
+
+
+def test_variables_are_looked_up_after_input():
+    template = Template("{{item}} {{a}}")
+    
+    assert template.render({"a": "from input"}, {"item": 3, "a": "from vars"}) == "3 from input"
+
+
+def test_missing_value_policies():
+    template = Template("[{{absent.path}}]")
+    
+    assert template.render({}) == "[{{absent.path}}]"
+    assert template.render({}, missing="empty") == "[]"
+    with pytest.raises(TemplateError, match="absent.path"):
+        template.render({}, missing="error")
+
+
+def test_none_renders_empty():
+    assert Template("[{{input}}]").render(None) == "[]"
+
+
+def test_compile_template_is_cached():
+    assert compile_template("{{input}}!") is compile_template("{{input}}!")
@@ -0,0 +1,369 @@
+"""Tests for the workflow executor."""
+import asyncio
+import time
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from app.models.workflow import WorkflowNode, WorkflowEdge, NodeDelta
+from app.services.graph_validator import WorkflowValidationError
+from app.services.workflow_executor import WorkflowExecutor
+from tests.helpers import make_node, make_edge, slow_claude
+
+
+def fan_out_workflow(width: int) -> tuple[list[WorkflowNode], list[WorkflowEdge]]:
+    nodes = [make_node("input-1", "input"), make_node("output-1", "output")]
+    edges = []
+    for i in range(width):
+        llm_id = f"llm-{i}"
+        nodes.append(make_node(llm_id, "llm", prompt=f"Task {i}: {{{{input}}}}"))
+        edges.append(make_edge("input-1", llm_id))
+        edges.append(make_edge(llm_id, "output-1"))
+    return nodes, edges
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_fan_out_runs_in_parallel(mock_claude_class):
+    """Independent branches run concurrently instead of one after another."""
+    mock_claude_class.return_value = slow_claude(0.1)
+    nodes, edges = fan_out_workflow(5)
+    
+    executor = WorkflowExecutor(nodes, edges)
+    start = time.monotonic()
+    results = await executor.execute("x")
+    elapsed = time.monotonic() - start
+    
+    assert len(results) == 7
+    assert all(r.status == "success" for r in results)
+    assert elapsed < 0.3
+    assert results[0].nodeId == "input-1"
+    assert results[-1].nodeId == "output-1"
+    assert set(results[-1].output) == {f"llm-{i}" for i in range(5)}
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_max_concurrency_limits_running_nodes(mock_claude_class):
+    """No more than max_concurrency nodes run at the same time."""
+    mock_claude_class.return_value = slow_claude(0.05)
+    nodes, edges = fan_out_workflow(4)
+    
+    executor = WorkflowExecutor(nodes, edges, max_concurrency=1)
+    start = time.monotonic()
+    results = await executor.execute("x")
+    elapsed = time.monotonic() - start
+    
+    assert len(results) == 6
+    assert elapsed >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_cyclic_graph_is_rejected_before_execution():
+    """A cycle fails compilation instead of leaving nodes waiting forever."""
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("a", "output"),
+        make_node("b", "output"),
+    ]
+    edges = [make_edge("input-1", "a"), make_edge("a", "b"), make_edge("b", "a")]
+    
+    with pytest.raises(WorkflowValidationError, match="a, b"):
+        WorkflowExecutor(nodes, edges)
+
+
+def streaming_claude(chunks: list[str]) -> AsyncMock:
+    async def complete(prompt: str, on_delta=None, **kwargs) -> str:
+        for chunk in chunks:
+            if on_delta:
+                on_delta(chunk)
+            await asyncio.sleep(0)
+        return "".join(chunks)
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    return mock_instance
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_deltas_stream_before_node_result(mock_claude_class):
+    """LLM deltas are yielded while the node runs, followed by its full result."""
+    mock_claude_class.return_value = streaming_claude(["Hel", "lo ", "world"])
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("llm-1", "llm", prompt="{{input}}"),
+        make_node("output-1", "output"),
+    ]
+    edges = [make_edge("input-1", "llm-1"), make_edge("llm-1", "output-1")]
+    
+    executor = WorkflowExecutor(nodes, edges)
+    events = [e async for e in executor.execute_stream("x", include_deltas=True)]
+    
+    kinds = [(type(e).__name__, e.nodeId) for e in events]
+    assert kinds == [
+        ("NodeResult", "input-1"),
+        ("NodeDelta", "llm-1"),
+        ("NodeDelta", "llm-1"),
+        ("NodeDelta", "llm-1"),
+        ("NodeResult", "llm-1"),
+        ("NodeResult", "output-1"),
+    ]
+    assert "".join(e.delta for e in events if isinstance(e, NodeDelta)) == "Hello world"
+    assert events[-1].output == "Hello world"
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_execute_does_not_collect_deltas(mock_claude_class):
+    """The buffered execute() call only returns node results."""
+    mock_claude_class.return_value = streaming_claude(["a", "b"])
+    nodes = [make_node("input-1", "input"), make_node("llm-1", "llm", prompt="{{input}}")]
+    edges = [make_edge("input-1", "llm-1")]
+    
+    results = await WorkflowExecutor(nodes, edges).execute("x")
+    
+    assert [r.nodeId for r in results] == ["input-1", "llm-1"]
+    assert "on_delta" not in mock_claude_class.return_value.complete.call_args.kwargs
+
+
+def test_compiled_plan_orders_nodes_topologically():
+    """The compiled plan numbers nodes in dependency order with integer adjacency."""
+    from app.services.execution_plan import compile_plan
+    
+    nodes = [make_node("output-1", "output"), make_node("llm-1", "llm", prompt="x"), make_node("input-1", "input")]
+    edges = [make_edge("input-1", "llm-1"), make_edge("llm-1", "output-1")]
+    
+    plan = compile_plan(nodes, edges)
+    
+    assert plan.node_ids == ("input-1", "llm-1", "output-1")
+    assert plan.successors == ((1,), (2,), ())
+    assert plan.in_degree == (0, 1, 1)
+    assert plan.start == (0,)
+
+
+def test_plan_cache_ignores_canvas_positions():
+    """Moving nodes on the canvas does not invalidate the cached plan."""
+    from app.services.execution_plan import PlanCache
+    
+    cache = PlanCache()
+    nodes = [make_node("input-1", "input"), make_node("output-1", "output")]
+    edges = [make_edge("input-1", "output-1")]
+    plan = cache.get_or_compile(nodes, edges)
+    
+    moved = [n.model_copy(update={"position": {"x": 50, "y": 50}}) for n in nodes]
+    assert cache.get_or_compile(moved, edges) is plan
+    
+    changed = [nodes[0], make_node("output-1", "output", format="json")]
+    assert cache.get_or_compile(changed, edges) is not plan
+
+
+def loop_workflow(**loop_data):
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("loop-1", "loop", iteratorVariable="doc", **loop_data),
+        make_node("llm-1", "llm", prompt="Summarize {{doc}}"),
+        make_node("output-1", "output"),
+        make_node("count-1", "output"),
+    ]
+    edges = [
+        make_edge("input-1", "loop-1"),
+        make_edge("loop-1", "llm-1"),
+        make_edge("llm-1", "output-1"),
+        make_edge("loop-1", "count-1", sourceHandle="done"),
+    ]
+    return nodes, edges
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_llm_context_is_sent_for_caching_and_usage_reported(mock_claude_class):
+    """Nodes send their resolved shared context and report cached input tokens."""
+    async def complete(prompt: str, on_usage=None, **kwargs) -> str:
+        on_usage({"inputTokens": 10, "cachedInputTokens": 2000, "cacheWriteTokens": 0, "outputTokens": 4})
+        return "ok"
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    mock_claude_class.return_value = mock_instance
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("llm-1", "llm", prompt="Summarize", context="Document: {{input}}", cacheSystemPrompt=True),
+    ]
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, [make_edge("input-1", "llm-1")]).execute("text")}
+    
+    kwargs = mock_instance.complete.await_args.kwargs
+    assert kwargs["context"] == "Document: text"
+    assert kwargs["cache_system"] is True
+    assert results["llm-1"].metadata["usage"]["cachedInputTokens"] == 2000
+    assert results["llm-1"].metadata["usage"]["inputTokens"] == 10
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_loop_runs_body_per_item_in_order(mock_claude_class):
+    """A loop runs its body once per element and collects outputs in input order."""
+    async def complete(prompt: str, **kwargs) -> str:
+        await asyncio.sleep(0.05 if "a" in prompt else 0)
+        return prompt.upper()
+    
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = complete
+    mock_claude_class.return_value = mock_instance
+    nodes, edges = loop_workflow()
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, edges).execute(["a", "b", "c"])}
+    
+    assert results["loop-1"].output == ["SUMMARIZE A", "SUMMARIZE B", "SUMMARIZE C"]
+    assert results["llm-1"].output == ["SUMMARIZE A", "SUMMARIZE B", "SUMMARIZE C"]
+    assert results["output-1"].output == ["SUMMARIZE A", "SUMMARIZE B", "SUMMARIZE C"]
+    assert results["count-1"].output == ["SUMMARIZE A", "SUMMARIZE B", "SUMMARIZE C"]
+    assert mock_instance.complete.await_count == 3
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_loop_respects_concurrency_cap(mock_claude_class):
+    """Iterations run concurrently, but never more than the loop's cap."""
+    mock_claude_class.return_value = slow_claude(0.05)
+    nodes, edges = loop_workflow(maxConcurrency=2)
+    
+    start = time.monotonic()
+    results = await WorkflowExecutor(nodes, edges).execute(list("abcd"))
+    elapsed = time.monotonic() - start
+    
+    assert all(r.status == "success" for r in results)
+    assert 0.1 <= elapsed < 0.2
+
+
+@pytest.mark.asyncio
+async def test_loop_enforces_max_iterations():
+    """A list longer than maxIterations fails the loop node."""
+    nodes, edges = loop_workflow(maxIterations=2)
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, edges).execute(list("abc"))}
+    
+    assert results["loop-1"].status == "error"
+    assert "maxIterations" in results["loop-1"].error
+    assert "llm-1" not in results
+
+
+@pytest.mark.asyncio
+async def test_loop_rejects_non_list_input():
+    """A loop over something that is not a list fails with a clear error."""
+    nodes, edges = loop_workflow()
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, edges).execute("plain text")}
+    
+    assert results["loop-1"].error == "Loop node expects a list input"
+
+
+def router_workflow(condition: str):
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("router-1", "router", condition=condition),
+        make_node("yes-llm", "llm", prompt="yes {{input}}"),
+        make_node("yes-out", "output"),
+        make_node("no-llm", "llm", prompt="no {{input}}"),
+        make_node("no-out", "output"),
+        make_node("join", "output"),
+    ]
+    edges = [
+        make_edge("input-1", "router-1"),
+        make_edge("router-1", "yes-llm", sourceHandle="true"),
+        make_edge("yes-llm", "yes-out"),
+        make_edge("router-1", "no-llm", sourceHandle="false"),
+        make_edge("no-llm", "no-out"),
+        make_edge("yes-out", "join"),
+        make_edge("no-out", "join"),
+    ]
+    return nodes, edges
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_router_prunes_untaken_branch(mock_claude_class):
+    """Only the chosen branch runs; the other is skipped transitively."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.side_effect = lambda prompt, **kwargs: prompt
+    mock_claude_class.return_value = mock_instance
+    nodes, edges = router_workflow("'long' in input")
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, edges).execute("long input")}
+    
+    assert results["router-1"].output["branch"] == "true"
+    assert results["yes-llm"].status == "success"
+    assert results["no-llm"].status == "skipped"
+    assert results["no-out"].status == "skipped"
+    assert results["join"].status == "success"
+    assert mock_instance.complete.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_router_false_branch_and_unlabelled_edges():
+    """Edges without a source handle are always followed."""
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("router-1", "router", condition="input == 'x'"),
+        make_node("yes-out", "output"),
+        make_node("always-out", "output"),
+    ]
+    edges = [
+        make_edge("input-1", "router-1"),
+        make_edge("router-1", "yes-out", sourceHandle="true"),
+        make_edge("router-1", "always-out"),
+    ]
+    
+    results = {r.nodeId: r for r in await WorkflowExecutor(nodes, edges).execute("y")}
+    
+    assert results["yes-out"].status == "skipped"
+    assert results["always-out"].status == "success"
+
+
+@pytest.mark.asyncio
+@patch('app.services.workflow_executor.ClaudeService')
+async def test_prompt_templates_use_dotted_paths_into_upstream_outputs(mock_claude_class):
+    """Prompts reach into upstream dict outputs and are compiled into the plan."""
+    mock_instance = AsyncMock()
+    mock_instance.complete.return_value = "ok"
+    mock_claude_class.return_value = mock_instance
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("parse", "transform", transformType="json-parse"),
+        make_node("other", "transform", transformType="format-text", config={"template": "extra"}),
+        make_node("llm-1", "llm", prompt="{{parse.title}} / {{other}} / {{missing}}", missingVariables="empty"),
+    ]
+    edges = [make_edge("input-1", "parse"), make_edge("input-1", "other"),
+             make_edge("parse", "llm-1"), make_edge("other", "llm-1")]
+    
+    executor = WorkflowExecutor(nodes, edges)
+    await executor.execute('{"title": "Report"}')
+    
+    assert "llm-1" in executor.plan.templates
+    assert mock_instance.complete.call_args.kwargs["prompt"] == "Report / extra / "
+
+
+@pytest.mark.asyncio
+async def test_release_outputs_frees_consumed_results():
+    """With release_outputs only sink outputs survive, and previews stand in for large payloads."""
+    nodes = [
+        make_node("input-1", "input"),
+        make_node("a", "transform", transformType="format-text", config={"template": "{{input}}" * 50}),
+        make_node("b", "transform", transformType="format-text", config={"template": "{{input}}!"}),
+        make_node("output-1", "output"),
+    ]
+    edges = [make_edge("input-1", "a"), make_edge("a", "b"), make_edge("b", "output-1")]
+    
+    executor = WorkflowExecutor(
+        nodes, edges, release_outputs=True, include_inputs=False, max_payload_chars=20,
+    )
+    results = await executor.execute("x")
+    
+    assert set(executor.results) == {"__input__", "output-1"}
+    by_id = {r.nodeId: r for r in results}
+    assert by_id["input-1"].output == "x"
+    assert by_id["a"].output["truncated"] is True
+    assert by_id["a"].output["size"] == 50
+    assert all(r.input is None for r in results)
+    assert executor.final_output(results) == "x" * 50 + "!"
@@ -2,17 +2,18 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
-from app.routers.workflows import workflows_db
+from app.services.workflow_store import SQLiteWorkflowStore, get_workflow_store
 
 client = TestClient(app)
 
 
 @pytest.fixture(autouse=True)
-def clear_db():
-    """Clear the database before each test."""
-    workflows_db.clear()
-    yield
-    workflows_db.clear()
+def workflow_store():
+    """Use a fresh in-memory SQLite store for each test."""
+    store = SQLiteWorkflowStore(":memory:")
+    app.dependency_overrides[get_workflow_store] = lambda: store
+    yield store
+    app.dependency_overrides.pop(get_workflow_store, None)
 
 
 def test_list_workflows_empty():
@@ -163,3 +164,117 @@ def test_list_workflows_pagination():
     data = response.json()
     assert len(data["workflows"]) == 2
     assert data["offset"] == 2
+
+
+def test_list_workflows_cursor_pagination():
+    """Test paging through workflows with the keyset cursor."""
+    for i in range(5):
+        client.post("/api/v1/workflows/", json={"name": f"Workflow {i}", "nodes": [], "edges": []})
+    
+    names = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/api/v1/workflows/", params=params).json()
+        names.extend(w["name"] for w in data["workflows"])
+        cursor = data["nextCursor"]
+        if not cursor:
+            break
+    
+    assert names == [f"Workflow {i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("query, status", [
+    ("limit=0", 422),
+    ("limit=-1", 422),
+    ("limit=101", 422),
+    ("offset=-1", 422),
+    ("cursor=abc", 400),
+    ("cursor=-5", 400),
+    ("limit=100&cursor=0", 200),
+])
+def test_list_workflows_validates_paging(query, status):
+    """Bad paging parameters are client errors, never a crash or the whole table."""
+    response = client.get(f"/api/v1/workflows/?{query}")
+    assert response.status_code == status
+
+
+def test_list_workflows_by_name_omits_graph():
+    """Test filtering the listing by name; summaries leave out nodes and edges."""
+    client.post("/api/v1/workflows/", json={"name": "Alpha", "nodes": [], "edges": []})
+    client.post("/api/v1/workflows/", json={"name": "Beta", "nodes": [], "edges": []})
+    
+    data = client.get("/api/v1/workflows/?name=Beta").json()
+    assert data["total"] == 1
+    assert data["workflows"][0]["name"] == "Beta"
+    assert "nodes" not in data["workflows"][0]
+
+
+def test_sqlite_store_persists_across_instances(tmp_path):
+    """Test that a file-backed store keeps workflows after reopening."""
+    from app.models.workflow import Workflow
+    
+    path = str(tmp_path / "workflows.db")
+    workflow = Workflow(
+        id="wf-1",
+        name="Persisted",
+        nodes=[{
+            "id": "llm-1",
+            "type": "llm",
+            "position": {"x": 0, "y": 0},
+            "data": {"label": "LLM", "prompt": "hi", "temperature": 0.2},
+        }],
+        edges=[],
+    )
+    SQLiteWorkflowStore(path).save(workflow)
+    
+    reopened = SQLiteWorkflowStore(path)
+    assert reopened.get("wf-1") == workflow
+    assert reopened.count() == 1
+    assert reopened.delete("wf-1")
+    assert reopened.count() == 0
+
+
+def test_execute_stored_workflow_reuses_plan():
+    """Test executing a saved workflow by id, reusing its plan until it changes."""
+    from app.services.execution_plan import get_plan_cache
+    
+    workflow = {
+        "name": "Echo",
+        "nodes": [
+            {
+                "id": "input-1",
+                "type": "input",
+                "position": {"x": 0, "y": 0},
+                "data": {"label": "Input", "inputType": "text"}
+            },
+            {
+                "id": "output-1",
+                "type": "output",
+                "position": {"x": 200, "y": 0},
+                "data": {"label": "Output", "outputType": "display"}
+            }
+        ],
+        "edges": [{"id": "e1", "source": "input-1", "target": "output-1"}]
+    }
+    workflow_id = client.post("/api/v1/workflows/", json=workflow).json()["id"]
+    get_plan_cache().clear()
+    
+    for text in ["first", "second"]:
+        response = client.post(f"/api/v1/execute/workflows/{workflow_id}", json={"input": text})
+        assert response.status_code == 200
+        assert response.json()["finalOutput"] == text
+    assert len(get_plan_cache()) == 1
+    
+    client.put(f"/api/v1/workflows/{workflow_id}", json={**workflow, "edges": []})
+    response = client.post(f"/api/v1/execute/workflows/{workflow_id}", json={"input": "third"})
+    assert len(response.json()["results"]) == 2
+    assert len(get_plan_cache()) == 2
+
+
+def test_execute_stored_workflow_not_found():
+    """Test executing a workflow id that does not exist."""
+    response = client.post("/api/v1/execute/workflows/missing", json={"input": "x"})
+    assert response.status_code == 404